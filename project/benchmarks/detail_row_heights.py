@@ -0,0 +1,75 @@
+"""
+采购明细表格拖动列宽耗时
+
+offscreen 打开 DetailWidget，填入指定行数的长文本，模拟拖动“采购标的”列宽，
+对比 RowHeightCache 与 QHeaderView.ResizeToContents 每一步（一次 resize + 一轮事件循环）的耗时。
+60 fps 对应每步不超过约 16.7 ms。
+
+用法：
+    python benchmarks/detail_row_heights.py [--rows 1000] [--steps 30]
+"""
+import argparse
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication, QHeaderView, QTableWidget, QTableWidgetItem  # noqa: E402
+
+
+def _fill(table, rows: int):
+    table.setRowCount(rows)
+    for r in range(rows):
+        for c in (1, 2, 14):
+            table.setItem(r, c, QTableWidgetItem("长文本描述 " * (r % 7 + 1) + str(r)))
+
+
+def _drag_ms(app, table, steps: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(steps):
+        table.setColumnWidth(1, 100 + i * 3)
+        app.processEvents()
+    return round((time.perf_counter() - t0) * 1000 / steps, 2)
+
+
+def run(rows: int, steps: int) -> dict:
+    app = QApplication.instance() or QApplication([])
+    from ui_detail import DetailWidget, HEADERS
+
+    w = DetailWidget("2601", "MP", "", lambda yymm, cat: f"{yymm}{cat}-1")
+    w.resize(1400, 800)
+    w.show()
+    _fill(w.table, rows)
+    t0 = time.perf_counter()
+    w.row_heights.refresh_now()
+    report = {"initial_ms": round((time.perf_counter() - t0) * 1000, 2)}
+    report["cache_step_ms"] = _drag_ms(app, w.table, steps)
+
+    t = QTableWidget(0, len(HEADERS))
+    t.setWordWrap(True)
+    t.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+    t.resize(1400, 800)
+    t.show()
+    _fill(t, rows)
+    app.processEvents()
+    report["resize_to_contents_step_ms"] = _drag_ms(app, t, steps)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="明细表格拖动列宽耗时")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=30)
+    args = parser.parse_args(argv)
+    report = run(args.rows, args.steps)
+    print(f"{args.rows} 行: 首次计算 {report['initial_ms']} ms")
+    print(f"拖动每步: RowHeightCache {report['cache_step_ms']} ms, "
+          f"ResizeToContents {report['resize_to_contents_step_ms']} ms")
+    return report
+
+
+if __name__ == "__main__":
+    main()
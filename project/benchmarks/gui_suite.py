@@ -0,0 +1,286 @@
+"""
+界面性能基准（offscreen）
+
+以 QT_QPA_PLATFORM=offscreen 驱动各页面，对 synth_data 生成的数据库计时：
+  MainWindow.startup            构造主窗口并完成首次绘制
+  MainWindow.order_list         切换到采购计划页（构造页面 + load_history + 绘制）
+  DetailWidget.open             打开明细最多的主单
+  PlanExportWidget.load_data    计划导出页加载订单最多的月份
+  PlanExportWidget.filter       计划导出页按关键词筛选（输入 → 表格重绘）
+  PlanReleaseForm.load_data     计划发放列表加载
+  PlanReleaseForm.filter        计划发放列表按主单编号筛选
+每项耗时均包含到目标控件收到下一次 Paint 事件为止。
+
+预算在 gui_budgets.json（用例名 → 毫秒）中配置，中位数超出预算时退出码为 1。
+默认预算对应未指定 --db 时临时生成的小数据集（2000 主单）；大数据集请另备预算文件。
+
+用法：
+    python benchmarks/gui_suite.py [--db big.db] [--repeat 3] [--budgets benchmarks/gui_budgets.json]
+        [--only DetailWidget.open,PlanExportWidget.filter] [--out result.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QEvent, QObject  # noqa: E402
+from PySide6.QtWidgets import QApplication, QMessageBox  # noqa: E402
+
+import database  # noqa: E402
+import suite  # noqa: E402
+import synth_data  # noqa: E402
+
+DEFAULT_BUDGETS = os.path.join(BENCH_DIR, "gui_budgets.json")
+PAINT_TIMEOUT_S = 30
+FILTER_TERMS = ["轴承", "螺栓0", "阀门01", "不存在的物料"]
+
+
+class _PaintProbe(QObject):
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.painted = False
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            self.painted = True
+        return False
+
+
+def wait_painted(widget):
+    """处理事件直到 widget 收到下一次 Paint 事件。"""
+    app = QApplication.instance()
+    probe = _PaintProbe(widget)
+    widget.update()
+    deadline = time.perf_counter() + PAINT_TIMEOUT_S
+    while not probe.painted and time.perf_counter() < deadline:
+        app.processEvents()
+    widget.removeEventFilter(probe)
+    probe.deleteLater()
+
+
+def _dispose(widget):
+    widget.close()
+    widget.deleteLater()
+    QApplication.instance().processEvents()
+
+
+@contextmanager
+def _quiet_message_boxes():
+    # Pages report load results in modal boxes, which would block an offscreen run
+    saved = {name: getattr(QMessageBox, name) for name in ("information", "warning", "critical", "question")}
+    for name in saved:
+        setattr(QMessageBox, name, staticmethod(lambda *a, **kw: QMessageBox.Ok))
+    try:
+        yield
+    finally:
+        for name, fn in saved.items():
+            setattr(QMessageBox, name, fn)
+
+
+def _elapsed_ms(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000
+
+
+def _main_window():
+    import main
+    w = main.MainWindow()
+    w.resize(1400, 900)
+    return w
+
+
+def case_startup(ctx):
+    t0 = time.perf_counter()
+    w = _main_window()
+    w.show()
+    wait_painted(w)
+    ms = _elapsed_ms(t0)
+    _dispose(w)
+    return ms
+
+
+def case_order_list(ctx):
+    w = _main_window()
+    w.show()
+    wait_painted(w)
+    t0 = time.perf_counter()
+    w.sidebar.setCurrentRow(2)
+    wait_painted(w.form.table.viewport())
+    ms = _elapsed_ms(t0)
+    _dispose(w)
+    return ms
+
+
+def case_detail_open(ctx):
+    from ui_detail import DetailWidget
+    info = database.fetch_order_by_number(ctx["order"])
+    yymm, cat_code, unit, date_str, task_name = info
+    header = {"number": ctx["order"], "task_name": task_name, "unit": unit,
+              "category": database.category_display_from_code(cat_code), "date": date_str, "yymm": yymm}
+    t0 = time.perf_counter()
+    w = DetailWidget(yymm, cat_code, ctx["order"], database.next_detail_number, header)
+    w.resize(1400, 900)
+    w.show()
+    wait_painted(w.table.viewport())
+    ms = _elapsed_ms(t0)
+    _dispose(w)
+    return ms
+
+
+def _export_page(ctx):
+    from ui_plan_export import PlanExportWidget
+    w = PlanExportWidget()
+    w.resize(1400, 900)
+    w.combo_month.setCurrentText(ctx["month"])
+    w.show()
+    wait_painted(w)
+    return w
+
+
+def case_export_load(ctx):
+    w = _export_page(ctx)
+    t0 = time.perf_counter()
+    w.load_data()
+    wait_painted(w.table.viewport())
+    ms = _elapsed_ms(t0)
+    _dispose(w)
+    return ms
+
+
+def case_export_filter(ctx):
+    w = ctx.get("export_page")
+    if w is None:
+        w = ctx["export_page"] = _export_page(ctx)
+        w.load_data()
+        wait_painted(w.table.viewport())
+    term = FILTER_TERMS[ctx["round"] % len(FILTER_TERMS)]
+    t0 = time.perf_counter()
+    w.filter_item.setText(term)
+    wait_painted(w.table.viewport())
+    return _elapsed_ms(t0)
+
+
+def _release_page():
+    from ui_plan_release import PlanReleaseForm
+    w = PlanReleaseForm(None)
+    w.resize(1400, 900)
+    return w
+
+
+def case_release_load(ctx):
+    t0 = time.perf_counter()
+    w = _release_page()
+    w.show()
+    wait_painted(w.table.viewport())
+    ms = _elapsed_ms(t0)
+    _dispose(w)
+    return ms
+
+
+def case_release_filter(ctx):
+    w = ctx.get("release_page")
+    if w is None:
+        w = ctx["release_page"] = _release_page()
+        w.show()
+        wait_painted(w.table.viewport())
+    w.search_number.setText(ctx["order"] if ctx["round"] % 2 == 0 else "")
+    t0 = time.perf_counter()
+    w.load_data()
+    wait_painted(w.table.viewport())
+    return _elapsed_ms(t0)
+
+
+CASES = {
+    "MainWindow.startup": case_startup,
+    "MainWindow.order_list": case_order_list,
+    "DetailWidget.open": case_detail_open,
+    "PlanExportWidget.load_data": case_export_load,
+    "PlanExportWidget.filter": case_export_filter,
+    "PlanReleaseForm.load_data": case_release_load,
+    "PlanReleaseForm.filter": case_release_filter,
+}
+
+
+def run(db_path: str, repeat: int = 3, only=None) -> dict:
+    QApplication.instance() or QApplication([])
+    database.DB_PATH = db_path
+    ctx = {"month": suite.busiest_month(), "order": suite.largest_order()}
+    results = {}
+    with _quiet_message_boxes():
+        for name, case in CASES.items():
+            if only and name not in only:
+                continue
+            samples = []
+            for i in range(repeat):
+                ctx["round"] = i
+                samples.append(case(ctx))
+            results[name] = {
+                "runs": repeat,
+                "median_ms": round(statistics.median(samples), 1),
+                "min_ms": round(min(samples), 1),
+                "max_ms": round(max(samples), 1),
+            }
+        for key in ("export_page", "release_page"):
+            if ctx.get(key) is not None:
+                _dispose(ctx.pop(key))
+    return {"meta": {"db": os.path.abspath(db_path), "month": ctx["month"], "order": ctx["order"],
+                     "time": time.strftime("%Y-%m-%d %H:%M:%S")},
+            "results": results}
+
+
+def check_budgets(report: dict, budgets: dict) -> list:
+    """返回超出预算的 [(用例名, 中位数, 预算)]。"""
+    over = []
+    for name, res in report["results"].items():
+        budget = budgets.get(name)
+        if budget is not None and res["median_ms"] > budget:
+            over.append((name, res["median_ms"], budget))
+    return over
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="界面性能基准（offscreen）")
+    parser.add_argument("--db", help="synth_data 生成的数据库；不指定时临时生成小数据集")
+    parser.add_argument("--orders", type=int, default=2000, help="未指定 --db 时生成的主单数")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="逗号分隔的用例名")
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS, help="预算 JSON（用例名 → 毫秒），传空字符串则不检查")
+    parser.add_argument("--out", help="结果 JSON 输出路径")
+    args = parser.parse_args(argv)
+    only = set(args.only.split(",")) if args.only else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp, "purchase.db")
+            synth_data.generate(db_path, orders=args.orders)
+        report = run(db_path, args.repeat, only)
+
+    budgets = {}
+    if args.budgets:
+        with open(args.budgets, encoding="utf-8") as f:
+            budgets = json.load(f)
+    report["budgets"] = budgets
+    over = check_budgets(report, budgets)
+    for name, res in report["results"].items():
+        budget = budgets.get(name)
+        mark = "" if budget is None else (f"  预算 {budget} ms" + ("  <-- 超出" if res["median_ms"] > budget else ""))
+        print(f"  {name:30s} 中位数 {res['median_ms']:>10.1f} ms  (最小 {res['min_ms']:.1f}, 最大 {res['max_ms']:.1f}){mark}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
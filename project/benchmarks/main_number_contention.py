@@ -0,0 +1,108 @@
+"""
+主单编号并发生成
+
+多个进程同时对同一临时数据库的同一 (月份, 类别) 取号，统计耗时、失败次数与重复编号。
+--mode single 逐个调用 next_main_number；--mode block 每次 reserve_main_numbers 预留一批；
+--mode legacy 为改造前的 SELECT + UPDATE（默认延迟事务）写法，用于对照。
+
+用法：
+    python benchmarks/main_number_contention.py [--procs 4] [--numbers 200] [--mode single|block|legacy] [--block 50]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import database  # noqa: E402
+
+YYMM, CATEGORY = "2601", "MP"
+
+
+def _legacy_next(db_path: str) -> str:
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT seq FROM counter WHERE yymm=? AND category=?", (YYMM, CATEGORY))
+        row = cur.fetchone()
+        seq = 1 if row is None else int(row[0]) + 1
+        if row is None:
+            cur.execute("INSERT INTO counter(yymm, category, seq) VALUES(?,?,?)", (YYMM, CATEGORY, seq))
+        else:
+            cur.execute("UPDATE counter SET seq=? WHERE yymm=? AND category=?", (seq, YYMM, CATEGORY))
+        conn.commit()
+        return f"CG-{YYMM}{CATEGORY}{seq:04d}"
+    finally:
+        conn.close()
+
+
+def _worker(db_path: str, mode: str, numbers: int, block: int, start, out):
+    database.DB_PATH = db_path
+    got, errors = [], 0
+    start.wait()
+    remaining = numbers
+    while remaining > 0:
+        try:
+            if mode == "block":
+                n = min(block, remaining)
+                got.extend(database.reserve_main_numbers(YYMM, CATEGORY, n))
+            elif mode == "legacy":
+                n = 1
+                got.append(_legacy_next(db_path))
+            else:
+                n = 1
+                got.append(database.next_main_number(YYMM, CATEGORY))
+            remaining -= n
+        except sqlite3.OperationalError:
+            errors += 1
+            remaining -= 1
+    out.put((got, errors))
+
+
+def run(procs: int, numbers: int, mode: str, block: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "purchase.db")
+        database.DB_PATH = db_path
+        database.init_db()
+        ctx = multiprocessing.get_context("spawn")
+        start, out = ctx.Event(), ctx.Queue()
+        workers = [ctx.Process(target=_worker, args=(db_path, mode, numbers, block, start, out)) for _ in range(procs)]
+        for p in workers:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        results = [out.get() for _ in workers]
+        elapsed = time.perf_counter() - t0
+        for p in workers:
+            p.join()
+    all_numbers = [n for got, _ in results for n in got]
+    return {
+        "mode": mode,
+        "numbers": len(all_numbers),
+        "duplicates": len(all_numbers) - len(set(all_numbers)),
+        "errors": sum(e for _, e in results),
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "per_number_ms": round(elapsed * 1000 / max(len(all_numbers), 1), 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="主单编号并发生成")
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--numbers", type=int, default=200, help="每个进程取号数量")
+    parser.add_argument("--mode", choices=["single", "block", "legacy"], default="single")
+    parser.add_argument("--block", type=int, default=50)
+    args = parser.parse_args(argv)
+    r = run(args.procs, args.numbers, args.mode, args.block)
+    print(f"{r['mode']}: {r['numbers']} 个编号, 重复 {r['duplicates']}, 失败 {r['errors']}, "
+          f"总耗时 {r['elapsed_ms']} ms, 平均 {r['per_number_ms']} ms/个")
+    return r
+
+
+if __name__ == "__main__":
+    main()
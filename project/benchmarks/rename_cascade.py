@@ -0,0 +1,69 @@
+"""
+基础数据重命名级联耗时
+
+在临时数据库中生成指定规模的数据，统计 dry-run 计数与实际重命名的耗时。
+
+用法：
+    python benchmarks/rename_cascade.py [--rows 200000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import database  # noqa: E402
+
+
+def _populate(rows: int, purchasers: int = 20):
+    names = [f"采购员{i:02d}" for i in range(purchasers)]
+    conn = database._connect()
+    try:
+        cur = conn.cursor()
+        cur.executemany("INSERT OR IGNORE INTO purchasers(name) VALUES(?)", [(n,) for n in names])
+        orders = max(rows // 10, 1)
+        cur.executemany(
+            "INSERT INTO orders(number, yymm, category, unit, date, task_name) VALUES(?,?,?,?,?,?)",
+            [(f"CG-2601MP{i:06d}", "2601", "MP", "生产部", "2026-01-01", "bench") for i in range(orders)],
+        )
+        cur.executemany(
+            "INSERT INTO order_details(order_number, detail_no, demand_unit, plan_release) VALUES(?,?,?,?)",
+            [(f"CG-2601MP{i % orders:06d}", f"2601MP-{i + 1}", "生产部", names[i % purchasers]) for i in range(rows)],
+        )
+        cur.executemany(
+            "INSERT OR IGNORE INTO release_orders(source_order_number, purchaser, status, record_count) VALUES(?,?,?,?)",
+            [(f"CG-2601MP{i:06d}", names[i % purchasers], "未发放", 10) for i in range(orders)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return names
+
+
+def run(rows: int):
+    names = _populate(rows)
+    report = {}
+    for kind, old, new in [("purchasers", names[0], "采购员-改名"), ("units", "生产部", "生产一部")]:
+        preview = database.rename_reference(kind, old, new, dry_run=True)
+        result = database.rename_reference(kind, old, new)
+        report[kind] = {"rows": result["total"], "dry_run_ms": preview["elapsed_ms"], "rename_ms": result["elapsed_ms"]}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="重命名级联耗时")
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "purchase.db")
+        database.init_db()
+        report = run(args.rows)
+    for kind, r in report.items():
+        print(f"{kind}: {r['rows']} 行, dry-run {r['dry_run_ms']} ms, 重命名 {r['rename_ms']} ms")
+    return report
+
+
+if __name__ == "__main__":
+    main()
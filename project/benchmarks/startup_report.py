@@ -0,0 +1,116 @@
+"""
+启动耗时报告
+
+1. `python -X importtime -c "import main"`：汇总模块导入耗时（按累计耗时排序）
+2. 以 offscreen 方式启动 main.py，读取首帧绘制时间戳 (first_paint_ms)
+
+用法：
+    python benchmarks/startup_report.py [--top 20] [--runs 3] [--json out.json]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+_FIRST_PAINT = re.compile(r"\[startup\] first_paint_ms=([\d.]+)")
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return env
+
+
+def import_time_summary(top: int = 20):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=PROJECT_DIR, env=_env(), capture_output=True, text=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORT_LINE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        modules.append({"module": name, "self_us": self_us, "cumulative_us": cum_us, "depth": (len(indent) - 1) // 2})
+
+    # Aggregate self time by top-level package, so nothing is counted twice
+    packages = {}
+    for m in modules:
+        pkg = m["module"].split(".")[0]
+        packages[pkg] = packages.get(pkg, 0) + m["self_us"]
+    total_us = sum(packages.values())
+
+    modules.sort(key=lambda m: m["cumulative_us"], reverse=True)
+    top_packages = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "total_import_ms": round(total_us / 1000, 1),
+        "top_modules": modules[:top],
+        "top_packages": [{"package": k, "self_ms": round(v / 1000, 1)} for k, v in top_packages],
+    }
+
+
+def first_paint(runs: int = 3, timeout: float = 60.0):
+    env = _env()
+    env["PPOMS_STARTUP_REPORT"] = "1"
+    env["PPOMS_STARTUP_EXIT"] = "1"
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "main.py"],
+            cwd=PROJECT_DIR, env=env, capture_output=True, text=True, timeout=timeout,
+        )
+        wall_ms = (time.perf_counter() - t0) * 1000
+        m = _FIRST_PAINT.search(proc.stdout)
+        samples.append({
+            "first_paint_ms": float(m.group(1)) if m else None,
+            "process_wall_ms": round(wall_ms, 1),
+            "returncode": proc.returncode,
+        })
+    valid = sorted(s["first_paint_ms"] for s in samples if s["first_paint_ms"] is not None)
+    median = valid[len(valid) // 2] if valid else None
+    return {"runs": samples, "median_first_paint_ms": median}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PPOMS 启动耗时报告")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", default="")
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": sys.version.split()[0],
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "imports": import_time_summary(args.top),
+        "first_paint": first_paint(args.runs),
+    }
+
+    imp = report["imports"]
+    print(f"导入总耗时: {imp['total_import_ms']} ms")
+    print("按顶层包（自身耗时）:")
+    for p in imp["top_packages"]:
+        print(f"  {p['self_ms']:>9.1f} ms  {p['package']}")
+    print("按模块（累计）:")
+    for m in imp["top_modules"]:
+        print(f"  {m['cumulative_us'] / 1000:>9.1f} ms  {m['module']}")
+    fp = report["first_paint"]
+    print(f"首帧绘制(中位数): {fp['median_first_paint_ms']} ms")
+    for i, s in enumerate(fp["runs"], 1):
+        print(f"  #{i}: first_paint={s['first_paint_ms']} ms, 进程总耗时={s['process_wall_ms']} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
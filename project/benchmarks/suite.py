@@ -0,0 +1,221 @@
+"""
+数据层性能基准
+
+对 synth_data 生成的数据库逐项计时，结果写成 JSON，便于与上一次运行对比：
+  fetch_orders / fetch_orders_month          主单列表（全部 / 按月份筛选）
+  get_workbench_stats                        工作台统计
+  fetch_monthly_plans_with_stats_cold/warm   月度计划执行统计（清空汇总缓存后 / 缓存命中）
+  save_order_details_transaction             原样重存明细最多的主单（会改写该主单的明细 id）
+  OrderExporter.export                       计划导出 Excel（--export-rows 行）
+  OrderPrinter.paginate                      计划打印分页 + 绘制到 PDF（--print-rows 行）
+
+未指定 --db 时在临时目录生成一个小数据集（--orders 主单）。
+--compare 与基线 JSON 比较中位数，任一项变慢超过 --threshold 时退出码为 1。
+
+用法：
+    python benchmarks/suite.py [--db big.db] [--repeat 5] [--out result.json]
+        [--compare baseline.json] [--threshold 0.2] [--only fetch_orders,get_workbench_stats]
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import database  # noqa: E402
+import synth_data  # noqa: E402
+
+
+def busiest_month() -> str:
+    conn = database._connect()
+    try:
+        row = conn.execute("SELECT yymm FROM orders GROUP BY yymm ORDER BY COUNT(1) DESC LIMIT 1").fetchone()
+        return row[0] if row else ""
+    finally:
+        conn.close()
+
+
+def largest_order() -> str:
+    conn = database._connect()
+    try:
+        row = conn.execute(
+            "SELECT order_number FROM order_details GROUP BY order_number ORDER BY COUNT(1) DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else ""
+    finally:
+        conn.close()
+
+
+def _clear_execution_cache():
+    conn = database._connect()
+    try:
+        conn.execute("DELETE FROM plan_exec_agg")
+        conn.execute("DELETE FROM plan_exec_agg_months")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def build_cases(export_rows: int, print_rows: int) -> dict:
+    """name -> (setup, fn)；setup 每次计时前调用且不计入耗时，返回值传给 fn。"""
+    import export_source
+    month = busiest_month()
+    order_number = largest_order()
+
+    def export_rows_list():
+        rows = []
+        for row in export_source.iter_plan_export_rows({"month": month}):
+            rows.append(row)
+            if len(rows) >= max(export_rows, print_rows):
+                break
+        return rows
+
+    def run_export(rows):
+        from export import OrderExporter
+        with tempfile.TemporaryDirectory() as tmp:
+            OrderExporter({}, export_source.PLAN_EXPORT_COLUMNS, rows[:export_rows]).export(
+                os.path.join(tmp, "export.xlsx"))
+
+    def run_print(rows):
+        from PySide6.QtWidgets import QApplication
+        from PySide6.QtPrintSupport import QPrinter
+        from PySide6.QtGui import QPageLayout, QPageSize
+        from print import OrderPrinter
+        QApplication.instance() or QApplication([])
+        columns = [c for c in export_source.PLAN_EXPORT_COLUMNS if c != "主单编号"]
+        rows = [[v for i, v in enumerate(r) if i != 1] for r in rows[:print_rows]]
+        with tempfile.TemporaryDirectory() as tmp:
+            printer = QPrinter(QPrinter.HighResolution)
+            printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
+            printer.setOutputFileName(os.path.join(tmp, "print.pdf"))
+            printer.setPageSize(QPageSize(QPageSize.A4))
+            printer.setPageOrientation(QPageLayout.Landscape)
+            OrderPrinter({"category": "民品"}, columns, rows)._paint_request(printer)
+
+    def details_payload():
+        return [(r[0], list(r[1:])) for r in database.fetch_order_details(order_number)]
+
+    return {
+        "fetch_orders": (None, lambda _: database.fetch_orders()),
+        "fetch_orders_month": (None, lambda _: database.fetch_orders(month_filter=month)),
+        "get_workbench_stats": (None, lambda _: database.get_workbench_stats(month)),
+        "fetch_monthly_plans_with_stats_cold": (_clear_execution_cache,
+                                                lambda _: database.fetch_monthly_plans_with_stats(month)),
+        "fetch_monthly_plans_with_stats_warm": (None, lambda _: database.fetch_monthly_plans_with_stats(month)),
+        "save_order_details_transaction": (details_payload,
+                                           lambda rows: database.save_order_details_transaction(order_number, rows)),
+        "OrderExporter.export": (export_rows_list, run_export),
+        "OrderPrinter.paginate": (export_rows_list, run_print),
+    }
+
+
+def time_case(setup, fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        fn(arg)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(samples), 2),
+        "min_ms": round(min(samples), 2),
+        "max_ms": round(max(samples), 2),
+        "mean_ms": round(statistics.fmean(samples), 2),
+    }
+
+
+def _table_counts() -> dict:
+    conn = database._connect()
+    try:
+        return {t: conn.execute(f"SELECT COUNT(1) FROM {t}").fetchone()[0]
+                for t in ("orders", "order_details", "release_orders", "recommendations", "monthly_plans")}
+    finally:
+        conn.close()
+
+
+def run(db_path: str, repeat: int = 5, only=None, export_rows: int = 5000, print_rows: int = 500) -> dict:
+    database.DB_PATH = db_path
+    cases = build_cases(export_rows, print_rows)
+    names = [n for n in cases if not only or n in only]
+    results = {}
+    for name in names:
+        setup, fn = cases[name]
+        results[name] = time_case(setup, fn, repeat)
+    return {
+        "meta": {
+            "db": os.path.abspath(db_path),
+            "counts": _table_counts(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> list:
+    """返回 [(名称, 基线中位数, 本次中位数, 变化比例, 是否超过阈值)]，只包含两边都有的项。"""
+    rows = []
+    for name, res in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("median_ms"):
+            continue
+        change = res["median_ms"] / base["median_ms"] - 1
+        rows.append((name, base["median_ms"], res["median_ms"], round(change, 3), change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数据层性能基准")
+    parser.add_argument("--db", help="synth_data 生成的数据库；不指定时临时生成小数据集")
+    parser.add_argument("--orders", type=int, default=2000, help="未指定 --db 时生成的主单数")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="逗号分隔的用例名")
+    parser.add_argument("--export-rows", type=int, default=5000)
+    parser.add_argument("--print-rows", type=int, default=500)
+    parser.add_argument("--out", help="结果 JSON 输出路径")
+    parser.add_argument("--compare", help="基线结果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="中位数变慢超过该比例视为退步")
+    args = parser.parse_args(argv)
+    only = set(args.only.split(",")) if args.only else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp, "purchase.db")
+            synth_data.generate(db_path, orders=args.orders)
+        report = run(db_path, args.repeat, only, args.export_rows, args.print_rows)
+
+    counts = report["meta"]["counts"]
+    print(f"主单 {counts['orders']}, 明细 {counts['order_details']}, 重复 {args.repeat} 次")
+    for name, res in report["results"].items():
+        print(f"  {name:40s} 中位数 {res['median_ms']:>10.2f} ms  (最小 {res['min_ms']:.2f}, 最大 {res['max_ms']:.2f})")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    regressed = False
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"与基线对比 ({args.compare}):")
+        for name, base, now, change, slower in compare(report, baseline, args.threshold):
+            flag = "  <-- 变慢" if slower else ""
+            print(f"  {name:40s} {base:>10.2f} -> {now:>10.2f} ms ({change:+.1%}){flag}")
+            regressed = regressed or slower
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+合成大规模测试数据
+
+向指定数据库写入主单、明细、计划发放记录、推荐与月度计划，用于性能测试。
+分布可调：
+  - 每主单明细数服从对数正态分布，均值 --details，--spread 控制离散程度；
+  - 类别占比 --mix（如 MP:60,MPJ:25,MPB:15）；
+  - 物料与采购员的使用频率按 Zipf 偏斜（--zipf，越大越集中在少数热门项）；
+  - --released 为计划发放记录中已发放的比例。
+相同 --seed 生成的数据完全一致。生成的数据满足 database.scan_integrity 的全部检查。
+
+用法：
+    python benchmarks/synth_data.py --db big.db [--orders 100000] [--details 20] [--months 12]
+        [--start 2601] [--mix MP:60,MPJ:25,MPB:15] [--purchasers 30] [--items 5000]
+        [--plans 2000] [--zipf 1.1] [--released 0.6] [--seed 1] [--force]
+"""
+import argparse
+import bisect
+import itertools
+import math
+import os
+import random
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import database  # noqa: E402
+
+UNITS = ["生产部", "采购部", "仓储部", "一车间", "二车间", "三车间", "四车间", "质检部"]
+ITEM_WORDS = ["轴承", "螺栓", "密封圈", "垫片", "电缆", "接头", "阀门", "法兰", "滤芯", "传感器", "电机", "胶木板"]
+MATERIALS = ["碳钢", "不锈钢", "丁腈橡胶", "铜", "铝合金", "尼龙", "夹布胶木"]
+QTY_UNITS = ["件", "个", "套", "米", "千克", "箱"]
+METHODS = ["询比采购", "公开招标", "集中采购", "框架协议"]
+CHANNELS = ["能建商城", "采购平台", "线下采购"]
+DEFAULT_MIX = "MP:60,MPJ:25,MPB:15"
+BATCH = 20000
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        cat, _, weight = part.partition(":")
+        mix[cat.strip()] = float(weight or 1)
+    return mix
+
+
+def months_from(start: str, count: int) -> list:
+    yy, mm = int(start[:2]), int(start[2:])
+    result = []
+    for _ in range(count):
+        result.append(f"{yy:02d}{mm:02d}")
+        mm += 1
+        if mm > 12:
+            yy, mm = yy + 1, 1
+    return result
+
+
+class _Zipf:
+    """在 items 上按 1/rank^s 加权抽样。"""
+
+    def __init__(self, items, s: float, rng: random.Random):
+        self.items = list(items)
+        self.cum = list(itertools.accumulate(1.0 / (k ** s) for k in range(1, len(self.items) + 1)))
+        self.rng = rng
+
+    def pick(self):
+        return self.items[bisect.bisect_left(self.cum, self.rng.random() * self.cum[-1])]
+
+
+def _catalog(items: int, rng: random.Random) -> list:
+    catalog = []
+    for i in range(items):
+        name = f"{ITEM_WORDS[i % len(ITEM_WORDS)]}{i // len(ITEM_WORDS):04d}"
+        spec = f"{rng.choice(MATERIALS)} {rng.choice(['M', 'Φ', 'DN'])}{rng.randint(4, 200)}"
+        price = round(math.exp(rng.uniform(math.log(2), math.log(20000))), 2)
+        catalog.append((name, spec, rng.choice(QTY_UNITS), price))
+    return catalog
+
+
+def _chunks(rows, size: int = BATCH):
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate(db_path: str, orders: int = 100000, details: float = 20, months: int = 12, start: str = "2601",
+             mix: str = DEFAULT_MIX, purchasers: int = 30, items: int = 5000, plans: int = 2000,
+             zipf: float = 1.1, released: float = 0.6, spread: float = 0.8, seed: int = 1) -> dict:
+    """生成数据并返回各表行数与耗时；db_path 须为不存在的文件。"""
+    if os.path.exists(db_path):
+        raise FileExistsError(db_path)
+    t0 = time.perf_counter()
+    rng = random.Random(seed)
+    database.DB_PATH = db_path
+    database.init_db()
+
+    month_list = months_from(start, months)
+    categories = parse_mix(mix)
+    cat_names, cat_weights = list(categories), list(categories.values())
+    purchaser_names = [f"采购员{i:02d}" for i in range(1, purchasers + 1)]
+    catalog = _catalog(items, rng)
+    item_dist = _Zipf(catalog, zipf, rng)
+    purchaser_dist = _Zipf(purchaser_names, zipf, rng)
+    mu = math.log(max(details, 1)) - spread ** 2 / 2
+
+    main_seq, detail_seq = {}, {}
+    release_groups = {}
+    counts = {"orders": 0, "order_details": 0}
+
+    def order_rows():
+        for i in range(orders):
+            yymm = month_list[i * len(month_list) // orders]
+            cat = rng.choices(cat_names, cat_weights)[0]
+            seq = main_seq[(yymm, cat)] = main_seq.get((yymm, cat), 0) + 1
+            date = f"20{yymm[:2]}-{yymm[2:]}-{rng.randint(1, 28):02d}"
+            counts["orders"] += 1
+            yield (f"CG-{yymm}{cat}{seq:04d}", yymm, cat, rng.choice(UNITS), date, f"{yymm}月{rng.choice(ITEM_WORDS)}采购任务")
+
+    def detail_rows(order_batch):
+        for number, yymm, cat, unit, date, _ in order_batch:
+            n = max(1, min(500, int(round(rng.lognormvariate(mu, spread)))))
+            for _ in range(n):
+                seq = detail_seq[(yymm, cat)] = detail_seq.get((yymm, cat), 0) + 1
+                name, spec, qty_unit, price = item_dist.pick()
+                qty = rng.randint(1, 200)
+                amount = round(qty * price, 2)
+                purchaser = purchaser_dist.pick() if rng.random() < 0.9 else ""
+                if purchaser:
+                    release_groups[(number, purchaser)] = release_groups.get((number, purchaser), 0) + 1
+                counts["order_details"] += 1
+                yield (
+                    number, f"{yymm}{cat}-{seq}", name, name, spec, f"{rng.randint(7, 90)}天", "",
+                    str(qty), qty_unit, f"{price:.2f}", f"{amount / 10000:.4f}", rng.choice(METHODS),
+                    rng.choice(CHANNELS), date, unit, purchaser, "", "", f"{amount:,.2f}", "13%", "", "", "", "",
+                    database.match_key(name), database.match_key(spec),
+                )
+
+    conn = database._connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("PRAGMA synchronous=OFF")
+        cur.execute("PRAGMA journal_mode=MEMORY")
+        cur.execute("BEGIN")
+        cur.executemany("INSERT OR IGNORE INTO units(name) VALUES(?)", [(u,) for u in UNITS])
+        cur.executemany("INSERT OR IGNORE INTO purchasers(name) VALUES(?)", [(p,) for p in purchaser_names])
+        cur.executemany("INSERT OR IGNORE INTO plan_months(name) VALUES(?)", [(m,) for m in month_list])
+
+        for order_batch in _chunks(order_rows(), 2000):
+            cur.executemany(
+                "INSERT INTO orders(number, yymm, category, unit, date, task_name) VALUES(?,?,?,?,?,?)",
+                order_batch,
+            )
+            for detail_batch in _chunks(detail_rows(order_batch)):
+                cur.executemany(
+                    """
+                    INSERT INTO order_details(
+                        order_number, detail_no, item_name, purchase_item, spec_model, purchase_cycle, stock_count,
+                        purchase_qty, unit, unit_price, budget_wan, purchase_method, purchase_channel, plan_time,
+                        demand_unit, plan_release, progress_req, supplier, inquiry_price, tax_rate, actual_status,
+                        purchase_body, add_adjust, remark, item_key, spec_key
+                    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                    """,
+                    detail_batch,
+                )
+
+        released_seq = itertools.count(1)
+        release_rows = []
+        for (number, purchaser), count in release_groups.items():
+            date = f"20{number[3:5]}-{number[5:7]}-28"
+            if rng.random() < released:
+                release_rows.append((number, purchaser, date, "已发放", count, next(released_seq), f"{date} 10:00:00"))
+            else:
+                release_rows.append((number, purchaser, date, "未发放", count, None, None))
+        for batch in _chunks(release_rows):
+            cur.executemany(
+                """
+                INSERT INTO release_orders(source_order_number, purchaser, release_date, status, record_count,
+                                           released_seq, released_at)
+                VALUES(?,?,?,?,?,?,?)
+                """,
+                batch,
+            )
+
+        cur.executemany(
+            "INSERT INTO recommendations(item_name, plan_release, weight, is_active, purchase_method, purchase_channel) "
+            "VALUES(?,?,?,?,?,?)",
+            [(name, purchaser_dist.pick(), rng.randint(1, 100), 1, rng.choice(METHODS), rng.choice(CHANNELS))
+             for name, _, _, _ in catalog],
+        )
+
+        plan_rows = []
+        for yymm in month_list:
+            for name, spec, qty_unit, price in rng.sample(catalog, min(plans, len(catalog))):
+                qty = rng.randint(10, 2000)
+                plan_rows.append(database._plan_row_keys(
+                    (yymm, name, spec, qty_unit, qty, round(qty * price / 10000, 4), rng.choice(UNITS), "")
+                ))
+        for batch in _chunks(plan_rows):
+            cur.executemany(
+                "INSERT INTO monthly_plans(plan_month, item_name, spec_model, unit, plan_qty, plan_budget, "
+                "department, remarks, item_key, spec_key) VALUES(?,?,?,?,?,?,?,?,?,?)",
+                batch,
+            )
+
+        cur.executemany(
+            "INSERT OR REPLACE INTO counter(yymm, category, seq) VALUES(?,?,?)",
+            [(yymm, cat, seq) for (yymm, cat), seq in main_seq.items()],
+        )
+        cur.executemany(
+            "INSERT OR REPLACE INTO detail_counter(yymm, category, seq) VALUES(?,?,?)",
+            [(yymm, cat, seq) for (yymm, cat), seq in detail_seq.items()],
+        )
+        # A freshly generated database has no clients to notify
+        cur.execute("DELETE FROM change_log")
+        conn.commit()
+    finally:
+        conn.close()
+
+    counts.update({
+        "release_orders": len(release_rows),
+        "recommendations": len(catalog),
+        "monthly_plans": len(plan_rows),
+        "months": month_list,
+        "elapsed_s": round(time.perf_counter() - t0, 1),
+    })
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成大规模测试数据")
+    parser.add_argument("--db", required=True, help="输出数据库文件")
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--details", type=float, default=20, help="每主单平均明细数")
+    parser.add_argument("--spread", type=float, default=0.8, help="明细数对数正态分布的 sigma")
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--start", default="2601", help="起始计划月份 (yymm)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="类别占比")
+    parser.add_argument("--purchasers", type=int, default=30)
+    parser.add_argument("--items", type=int, default=5000, help="物料种类数")
+    parser.add_argument("--plans", type=int, default=2000, help="每月计划条数")
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--released", type=float, default=0.6, help="已发放比例")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--force", action="store_true", help="覆盖已存在的数据库文件")
+    args = parser.parse_args(argv)
+    if args.force and os.path.exists(args.db):
+        os.remove(args.db)
+    r = generate(args.db, orders=args.orders, details=args.details, months=args.months, start=args.start,
+                 mix=args.mix, purchasers=args.purchasers, items=args.items, plans=args.plans, zipf=args.zipf,
+                 released=args.released, spread=args.spread, seed=args.seed)
+    print(f"{args.db}: 主单 {r['orders']}, 明细 {r['order_details']}, 发放记录 {r['release_orders']}, "
+          f"推荐 {r['recommendations']}, 月度计划 {r['monthly_plans']}, 耗时 {r['elapsed_s']} s")
+    return r
+
+
+if __name__ == "__main__":
+    main()
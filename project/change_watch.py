@@ -0,0 +1,91 @@
+"""
+跨客户端数据变更通知
+
+database 的 trg_change_* 触发器把每次写入记入 change_log(tbl, row_key)。
+ChangeWatcher 持有一个长连接，定时读取 PRAGMA data_version：只有其他连接
+（本进程其他 _connect() 打开的连接，或另一个 PPOMS 实例）提交过写入时该值才会变化，
+所以空闲时每次轮询只是一条不读表的 PRAGMA。值变化后读取上次位置之后的
+change_log，按表归并受影响的键，经 changed 信号发出。
+
+设置环境变量 PPOMS_NO_CHANGE_WATCH=1 可关闭轮询，页面退回每次切换都重新加载。
+"""
+import sqlite3
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+import database
+
+POLL_INTERVAL_MS = 1000
+
+
+class ChangeWatcher(QObject):
+    """
+    changed(dict)：{"last_id": int, "tables": {表名: {键}}, "truncated": bool}。
+    truncated 为 True 表示无法得知具体变更（变更记录已被清理、数据库被还原或切换），
+    接收方应整页重新加载。
+    """
+    changed = Signal(object)
+
+    def __init__(self, parent=None, interval_ms: int = POLL_INTERVAL_MS):
+        super().__init__(parent)
+        self.interval_ms = interval_ms
+        self._conn = None
+        self._db_path = None
+        self._data_version = None
+        self._last_id = None
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.poll)
+
+    def start(self):
+        if self._conn is None:
+            self._open()
+        if not self._timer.isActive():
+            self._timer.start(self.interval_ms)
+
+    def stop(self):
+        self._timer.stop()
+
+    def is_running(self) -> bool:
+        return self._timer.isActive()
+
+    def close(self):
+        self.stop()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _open(self):
+        database.ensure_db()
+        # Plain connection: polling should not show up in db_profile statistics
+        conn = sqlite3.connect(database.DB_PATH)
+        self._db_path = database.DB_PATH
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        self._last_id = database._change_log_position(conn.cursor())
+        self._conn = conn
+
+    def poll(self) -> bool:
+        """检查一次；发出了 changed 时返回 True。"""
+        if self._conn is not None and self._db_path != database.DB_PATH:
+            self._conn.close()
+            self._conn = None
+            self._open()
+            self.changed.emit({"last_id": self._last_id, "tables": {}, "truncated": True})
+            return True
+        if self._conn is None:
+            self._open()
+            return False
+        try:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return False
+            result = database._changes_since(self._conn.cursor(), self._last_id)
+        except sqlite3.Error as e:
+            # Usually a writer holding the lock; data_version is unchanged so the next tick retries
+            print(f"变更轮询失败: {e}")
+            return False
+        self._data_version = version
+        self._last_id = result["last_id"]
+        if not result["tables"] and not result["truncated"]:
+            return False
+        self.changed.emit(result)
+        return True
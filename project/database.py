@@ -2,6 +2,7 @@ import os
 import sys
 import sqlite3
 import shutil
+import unicodedata
 from datetime import datetime
 
 
@@ -24,7 +25,15 @@ def _bundled_db_path():
     return None
 
 
+# DB_PATH whose schema ensure_db() has already checked in this process; _connect() runs
+# on every database call and should not repeat the DDL. Cleared by forget_schema_check().
+_checked_db_path = None
+
+
 def ensure_db():
+    global _checked_db_path
+    if _checked_db_path == DB_PATH and os.path.exists(DB_PATH):
+        return
     created = False
     if not os.path.exists(DB_PATH):
         bundled = _bundled_db_path()
@@ -38,6 +47,13 @@ def ensure_db():
         _migrate_schema(conn)
     finally:
         conn.close()
+    _checked_db_path = DB_PATH
+
+
+def forget_schema_check():
+    """数据库文件被整体替换（如从备份还原）后调用，下次访问时重新检查并迁移表结构。"""
+    global _checked_db_path
+    _checked_db_path = None
 
 
 def _init_schema(conn: sqlite3.Connection):
@@ -471,96 +487,554 @@ def _migrate_schema(conn: sqlite3.Connection):
         cur.executemany("INSERT INTO plan_months(name) VALUES(?)", [("2601",), ("2602",), ("2603",)])
         conn.commit()
 
+    cur.execute("PRAGMA user_version")
+    version = cur.fetchone()[0]
+    if version < 1:
+        _migrate_to_v1(conn)
+    if version < 2:
+        _migrate_to_v2(conn)
+
+
+# PRAGMA user_version once every step below has been applied. The steps are idempotent
+# (IF NOT EXISTS / table_info checks) so a half-migrated database is simply redone; add a new
+# _migrate_to_vN and bump this instead of putting more DDL into the unconditional part above.
+SCHEMA_VERSION = 2
+
+
+def _migrate_to_v1(conn: sqlite3.Connection):
+    """发放水位、推荐同步与改名级联索引、执行汇总缓存、计划匹配键、明细序号索引。"""
+    cur = conn.cursor()
+    # Release watermark: released_seq increases each time a release is marked 已发放,
+    # sync_logs.release_watermark remembers the highest one a sync has consumed
+    cur.execute("PRAGMA table_info(release_orders)")
+    cols = [r[1] for r in cur.fetchall()]
+    if "released_seq" not in cols:
+        cur.execute("ALTER TABLE release_orders ADD COLUMN released_seq INTEGER")
+        cur.execute("UPDATE release_orders SET released_seq=id WHERE status='已发放'")
+    if "released_at" not in cols:
+        cur.execute("ALTER TABLE release_orders ADD COLUMN released_at TEXT")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_time TEXT,
+            end_time TEXT,
+            total_candidates INTEGER,
+            inserted INTEGER,
+            skipped INTEGER,
+            failed INTEGER,
+            details TEXT
+        )
+        """
+    )
+    cur.execute("PRAGMA table_info(sync_logs)")
+    cols = [r[1] for r in cur.fetchall()]
+    if "release_watermark" not in cols:
+        cur.execute("ALTER TABLE sync_logs ADD COLUMN release_watermark INTEGER")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_release_orders_released_seq ON release_orders(released_seq)")
+    conn.commit()
+
+    # Recommendation sync: anti-join on item_name, released-detail lookup by order
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recommendations_item_name ON recommendations(item_name)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_order_details_order_number ON order_details(order_number)")
+
+    # Indexes backing the reference-data rename cascade
+    for _, refs in REFERENCE_CASCADES.values():
+        for table, column in refs:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column})")
+    conn.commit()
+
+    # Per-month execution aggregates keyed like monthly_plans; a month is cached
+    # once it appears in plan_exec_agg_months and dropped again on any detail write
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS plan_exec_agg (
+            yymm TEXT,
+            item_key TEXT,
+            spec_key TEXT,
+            exec_qty REAL,
+            exec_amt REAL,
+            detail_count INTEGER,
+            PRIMARY KEY(yymm, item_key, spec_key)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS plan_exec_agg_months (
+            yymm TEXT PRIMARY KEY,
+            built_at TEXT
+        )
+        """
+    )
+    conn.commit()
+
+    # Normalized match keys for plan-vs-execution stats (see match_key)
+    added_keys = False
+    for table in ("monthly_plans", "order_details"):
+        cur.execute(f"PRAGMA table_info({table})")
+        cols = [r[1] for r in cur.fetchall()]
+        for column in ("item_key", "spec_key"):
+            if column not in cols:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+                added_keys = True
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_monthly_plans_month_keys ON monthly_plans(plan_month, item_key, spec_key)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_order_details_keys ON order_details(item_key, spec_key)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_yymm ON orders(yymm)")
+    # Detail sequence: prefix range scan for max_detail_seq, conflict check on save
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_order_details_detail_no ON order_details(detail_no)")
+    if added_keys:
+        _fill_match_keys(conn)
+    cur.execute("PRAGMA user_version = 1")
+    conn.commit()
+
+
+def _migrate_to_v2(conn: sqlite3.Connection):
+    """change_log 表及各跟踪表的 trg_change_* 触发器。"""
+    cur = conn.cursor()
+    # Cross-client change notification: every write to a tracked table appends
+    # (table, key) here; clients poll PRAGMA data_version and read the new rows
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            row_key TEXT,
+            op TEXT NOT NULL,
+            changed_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    for table, key in CHANGE_TRACKED_TABLES.items():
+        for op, ref in (("INSERT", "NEW"), ("DELETE", "OLD")):
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_change_{table}_{op.lower()} AFTER {op} ON {table}
+                BEGIN
+                    INSERT INTO change_log(tbl, row_key, op) VALUES('{table}', {ref}.{key}, '{op[0]}');
+                END
+                """
+            )
+        # A key change (renumbered order, moved plan month) touches both the old and the new key
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_change_{table}_update AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO change_log(tbl, row_key, op) VALUES('{table}', OLD.{key}, 'U');
+                INSERT INTO change_log(tbl, row_key, op)
+                    SELECT '{table}', NEW.{key}, 'U' WHERE NEW.{key} IS NOT OLD.{key};
+            END
+            """
+        )
+    cur.execute("PRAGMA user_version = 2")
+    conn.commit()
+
+
+# Invisible characters that survive NFKC and commonly come from copy/paste (zero-width, BOM, soft hyphen)
+_INVISIBLE_CHARS = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff\u00ad"))
+
+
+def match_key(text) -> str:
+    """
+    计划与执行明细匹配用的规范化键：NFKC（全角转半角等）、去掉零宽等不可见字符、
+    连续空白合并为一个空格并去掉首尾空白。None 视为 ""。
+    """
+    if text is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(text)).translate(_INVISIBLE_CHARS)
+    return " ".join(text.split())
+
+
+def _match_keys_missing(conn: sqlite3.Connection) -> bool:
+    # Read-only probe so that readers only take the write lock when there is something to backfill
+    for table in ("monthly_plans", "order_details"):
+        if conn.execute(f"SELECT 1 FROM {table} WHERE item_key IS NULL LIMIT 1").fetchone():
+            return True
+    return False
+
+
+def _fill_match_keys(conn: sqlite3.Connection):
+    """补齐 item_key/spec_key 为空的行（迁移前的旧数据，或绕过本模块直接写库的行）。"""
+    if not _match_keys_missing(conn):
+        return
+    conn.create_function("match_key", 1, match_key, deterministic=True)
+    conn.execute(
+        "UPDATE monthly_plans SET item_key=match_key(item_name), spec_key=match_key(spec_model) "
+        "WHERE item_key IS NULL"
+    )
+    cur = conn.execute(
+        "UPDATE order_details SET item_key=match_key(purchase_item), spec_key=match_key(spec_model) "
+        "WHERE item_key IS NULL"
+    )
+    if cur.rowcount > 0:
+        # Details that bypassed the write paths may belong to already aggregated months
+        conn.execute("DELETE FROM plan_exec_agg_months")
+
+
+def _plan_row_keys(row) -> tuple:
+    """(plan_month, item_name, spec_model, ...) -> 行尾追加 (item_key, spec_key)"""
+    return tuple(row) + (match_key(row[1]), match_key(row[2]))
+
+
+def _invalidate_execution_cache(cur: sqlite3.Cursor, months=None, order_number: str = None):
+    """
+    执行汇总缓存失效：months 指定月份；order_number 指定主单所在月份；都不传时清空全部。
+    与明细写入在同一事务内调用。
+    """
+    if order_number is not None:
+        cur.execute("SELECT yymm FROM orders WHERE number=?", (order_number,))
+        months = [r[0] for r in cur.fetchall()]
+    if months is None:
+        cur.execute("DELETE FROM plan_exec_agg")
+        cur.execute("DELETE FROM plan_exec_agg_months")
+        return
+    for yymm in set(months):
+        cur.execute("DELETE FROM plan_exec_agg WHERE yymm=?", (yymm,))
+        cur.execute("DELETE FROM plan_exec_agg_months WHERE yymm=?", (yymm,))
+
+
+def _cached_execution_months(cur: sqlite3.Cursor, months) -> set:
+    placeholders = ",".join(["?"] * len(months))
+    cur.execute(f"SELECT yymm FROM plan_exec_agg_months WHERE yymm IN ({placeholders})", months)
+    return {r[0] for r in cur.fetchall()}
+
+
+def _ensure_execution_aggregates(conn: sqlite3.Connection, months) -> list:
+    """
+    先补齐规范化键，再为尚未缓存的月份一次性汇总执行数量/金额，返回本次新建的月份。
+    缓存已齐且无需补键时只有读操作，不会等待其他客户端的写锁。
+    """
+    months = sorted(set(m for m in months if m))
+    if not months:
+        return []
+    cur = conn.cursor()
+    if not _match_keys_missing(conn) and _cached_execution_months(cur, months) == set(months):
+        return []
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        _fill_match_keys(conn)
+        # Re-read under the lock: another client may have built (or invalidated) months meanwhile
+        cached = _cached_execution_months(cur, months)
+        missing = [m for m in months if m not in cached]
+        if missing:
+            placeholders = ",".join(["?"] * len(missing))
+            cur.execute(f"DELETE FROM plan_exec_agg WHERE yymm IN ({placeholders})", missing)
+            cur.execute(
+                f"""
+                INSERT INTO plan_exec_agg(yymm, item_key, spec_key, exec_qty, exec_amt, detail_count)
+                SELECT
+                    o.yymm, od.item_key, od.spec_key,
+                    SUM(CAST(REPLACE(IFNULL(od.purchase_qty, '0'), ',', '') AS REAL)),
+                    SUM(CAST(REPLACE(IFNULL(od.inquiry_price, '0'), ',', '') AS REAL)),
+                    COUNT(1)
+                FROM order_details od
+                JOIN orders o ON od.order_number = o.number
+                WHERE o.yymm IN ({placeholders})
+                GROUP BY o.yymm, od.item_key, od.spec_key
+                """,
+                missing
+            )
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cur.executemany(
+                "INSERT OR REPLACE INTO plan_exec_agg_months(yymm, built_at) VALUES(?,?)",
+                [(m, now) for m in missing]
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return missing
+
 
 def init_db():
     ensure_db()
+    prune_change_log()
+
+
+# db_profile installs an instrumented sqlite3.Connection subclass here while profiling is enabled
+_connection_factory = None
 
 
 def _connect():
     ensure_db()
+    if _connection_factory is not None:
+        return sqlite3.connect(DB_PATH, factory=_connection_factory)
     return sqlite3.connect(DB_PATH)
 
 
-def _get_and_inc(cur: sqlite3.Cursor, table: str, yymm: str, category: str) -> int:
-    cur.execute(
-        f"SELECT seq FROM {table} WHERE yymm=? AND category=?",
-        (yymm, category),
-    )
+# Reference data (units / purchasers / purchase_statuses / plan_months) change hooks.
+# add_* / rename_* call _notify_reference_changed(kind) after a successful commit.
+_reference_listeners = []
+
+
+def add_reference_listener(fn):
+    if fn not in _reference_listeners:
+        _reference_listeners.append(fn)
+
+
+def remove_reference_listener(fn):
+    if fn in _reference_listeners:
+        _reference_listeners.remove(fn)
+
+
+def _notify_reference_changed(kind: str):
+    for fn in list(_reference_listeners):
+        try:
+            fn(kind)
+        except Exception as e:
+            print(f"基础数据变更通知失败({kind}): {e}")
+
+
+# table -> key column recorded in change_log by the trg_change_* triggers.
+# order_details and release_orders are keyed by their order so a client can
+# refresh the affected order rows without knowing detail ids.
+CHANGE_TRACKED_TABLES = {
+    "orders": "number",
+    "order_details": "order_number",
+    "release_orders": "source_order_number",
+    "monthly_plans": "plan_month",
+    "recommendations": "item_name",
+    "units": "name",
+    "purchasers": "name",
+    "purchase_status": "name",
+    "plan_months": "name",
+}
+CHANGE_LOG_KEEP = 200000
+
+
+def _change_log_position(cur: sqlite3.Cursor) -> int:
+    # sqlite_sequence survives pruning, unlike MAX(id)
+    cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
     row = cur.fetchone()
-    if row is None:
-        seq = 1
-        cur.execute(
-            f"INSERT INTO {table}(yymm, category, seq) VALUES(?, ?, ?)",
-            (yymm, category, seq),
-        )
-    else:
-        seq = int(row[0]) + 1
-        cur.execute(
-            f"UPDATE {table} SET seq=? WHERE yymm=? AND category=?",
-            (seq, yymm, category),
-        )
-    return seq
+    return row[0] if row else 0
 
 
-def next_main_number(yymm: str, category_code: str) -> str:
+def change_log_position() -> int:
+    conn = _connect()
+    try:
+        return _change_log_position(conn.cursor())
+    finally:
+        conn.close()
+
+
+def _changes_since(cur: sqlite3.Cursor, last_id: int) -> dict:
+    """
+    读取 id > last_id 的变更记录，按表归并为 {表名: {键}}。
+    last_id 之后的记录已被清理、或数据库被还原成更早的版本时 truncated 为 True，
+    此时 tables 为空，调用方应整页重新加载。
+    """
+    last = _change_log_position(cur)
+    if last == last_id:
+        return {"last_id": last, "tables": {}, "truncated": False}
+    cur.execute("SELECT MIN(id) FROM change_log")
+    first = cur.fetchone()[0]
+    if last < last_id or first is None or first > last_id + 1:
+        return {"last_id": last, "tables": {}, "truncated": True}
+    cur.execute("SELECT DISTINCT tbl, row_key FROM change_log WHERE id > ? AND id <= ?", (last_id, last))
+    tables = {}
+    for tbl, key in cur.fetchall():
+        tables.setdefault(tbl, set()).add(key)
+    return {"last_id": last, "tables": tables, "truncated": False}
+
+
+def fetch_changes_since(last_id: int) -> dict:
+    conn = _connect()
+    try:
+        return _changes_since(conn.cursor(), last_id)
+    finally:
+        conn.close()
+
+
+def prune_change_log(keep: int = CHANGE_LOG_KEEP) -> int:
+    """只保留最近 keep 条变更记录，返回删除条数。"""
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM change_log WHERE id <= ?", (_change_log_position(cur) - keep,))
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+# kind -> (lookup table, [(table, column) storing the name by value]).
+# The schema has no foreign keys, so renames are cascaded explicitly.
+REFERENCE_CASCADES = {
+    "units": ("units", [("orders", "unit"), ("order_details", "demand_unit"), ("monthly_plans", "department")]),
+    "purchasers": ("purchasers", [("order_details", "plan_release"), ("release_orders", "purchaser"), ("recommendations", "plan_release")]),
+    "purchase_statuses": ("purchase_status", [("release_orders", "status")]),
+}
+
+# Names the code itself compares against (release marking, recommendation sync,
+# workbench counts); renaming them, or renaming another entry onto them, is refused
+BUILTIN_REFERENCE_NAMES = {
+    "purchase_statuses": ("未发放", "待发放", "已发放"),
+}
+
+
+def rename_reference(kind: str, old_name: str, new_name: str, dry_run: bool = False) -> dict:
+    """
+    在一个事务内重命名基础数据，并同步更新所有引用该名称的列。
+
+    dry_run=True 时只统计受影响行数，不做修改。
+    返回 {"success", "msg", "counts": {"表.列": 行数}, "total", "elapsed_ms"}。
+    """
+    import time
+    t0 = time.perf_counter()
+    lookup, refs = REFERENCE_CASCADES[kind]
+    old_name = old_name.strip()
+    new_name = new_name.strip()
+    result = {"success": False, "msg": "", "counts": {}, "total": 0, "elapsed_ms": 0.0}
+
+    def done(success, msg):
+        result["success"] = success
+        result["msg"] = msg
+        result["total"] = sum(result["counts"].values())
+        result["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return result
+
+    if not old_name or not new_name or old_name == new_name:
+        return done(False, "名称无效")
+    builtin = BUILTIN_REFERENCE_NAMES.get(kind, ())
+    if old_name in builtin or new_name in builtin:
+        return done(False, f"内置名称不可重命名: {old_name if old_name in builtin else new_name}")
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(f"SELECT 1 FROM {lookup} WHERE name=?", (new_name,))
+        if cur.fetchone():
+            conn.rollback()
+            return done(False, f"名称已存在: {new_name}")
+        cur.execute(f"SELECT 1 FROM {lookup} WHERE name=?", (old_name,))
+        if not cur.fetchone():
+            conn.rollback()
+            return done(False, f"名称不存在: {old_name}")
+        try:
+            for table, column in refs:
+                if dry_run:
+                    cur.execute(f"SELECT COUNT(1) FROM {table} WHERE {column}=?", (old_name,))
+                    n = cur.fetchone()[0]
+                else:
+                    cur.execute(f"UPDATE {table} SET {column}=? WHERE {column}=?", (new_name, old_name))
+                    n = cur.rowcount
+                result["counts"][f"{table}.{column}"] = n
+            if dry_run:
+                conn.rollback()
+                return done(True, "预览")
+            cur.execute(f"UPDATE {lookup} SET name=? WHERE name=?", (new_name, old_name))
+            conn.commit()
+        except sqlite3.IntegrityError as e:
+            # e.g. release_orders already holds (order, new_name)
+            conn.rollback()
+            result["counts"] = {}
+            return done(False, f"重命名冲突: {e}")
+    finally:
+        conn.close()
+    _notify_reference_changed(kind)
+    return done(True, "重命名成功")
+
+
+# UPDATE/INSERT ... RETURNING needs SQLite 3.35; older builds read the value back in the same transaction
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def _reserve_seq(cur: sqlite3.Cursor, table: str, yymm: str, category: str, count: int = 1) -> int:
+    """
+    在调用方已开启的写事务（BEGIN IMMEDIATE）内把 (yymm, category) 的计数器前进 count，
+    返回预留区间的最后一个序号。单条 upsert 语句，不存在先读后写的竞争窗口。
+    """
+    sql = (
+        f"INSERT INTO {table}(yymm, category, seq) VALUES(?, ?, ?) "
+        "ON CONFLICT(yymm, category) DO UPDATE SET seq = seq + excluded.seq"
+    )
+    if _HAS_RETURNING:
+        cur.execute(sql + " RETURNING seq", (yymm, category, count))
+        return int(cur.fetchone()[0])
+    cur.execute(sql, (yymm, category, count))
+    cur.execute(f"SELECT seq FROM {table} WHERE yymm=? AND category=?", (yymm, category))
+    return int(cur.fetchone()[0])
+
+
+def _format_main_number(yymm: str, category_code: str, seq: int) -> str:
+    return f"CG-{yymm}{category_code}{seq:04d}"
+
+
+def reserve_main_numbers(yymm: str, category_code: str, count: int) -> list:
+    """
+    一次预留 count 个连续主单编号（批量建单用），一个连接、一个 BEGIN IMMEDIATE 事务。
+    多个客户端共用同一数据库时也不会拿到重复编号。
+    """
+    if count <= 0:
+        return []
     conn = _connect()
     try:
         cur = conn.cursor()
         # 使用 (yymm, category_code) 联合主键作为计数器的 key
         # 这样不同类别的单据会分别计数
-        
-        seq = _get_and_inc(cur, "counter", yymm, category_code)
+        cur.execute("BEGIN IMMEDIATE")
+        last = _reserve_seq(cur, "counter", yymm, category_code, count)
         conn.commit()
-        return f"CG-{yymm}{category_code}{seq:04d}"
+        return [_format_main_number(yymm, category_code, seq) for seq in range(last - count + 1, last + 1)]
+    finally:
+        conn.close()
+
+
+def next_main_number(yymm: str, category_code: str) -> str:
+    return reserve_main_numbers(yymm, category_code, 1)[0]
+
+
+def _max_detail_seq(cur: sqlite3.Cursor, yymm: str, category_code: str) -> int:
+    prefix = f"{yymm}{category_code}-"
+    start = len(prefix) + 1
+    cur.execute(
+        """
+        SELECT MAX(CAST(SUBSTR(detail_no, ?) AS INTEGER))
+        FROM order_details
+        WHERE detail_no >= ? AND detail_no < ?
+          AND SUBSTR(detail_no, ?) <> '' AND SUBSTR(detail_no, ?) NOT GLOB '*[^0-9]*'
+        """,
+        (start, prefix, prefix[:-1] + ".", start, start),
+    )
+    row = cur.fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def max_detail_seq(yymm: str, category_code: str) -> int:
+    """
+    (yymm, 类别) 下已保存明细的最大序号；只统计后缀为纯数字的序号。
+    用 detail_no 上的索引做前缀区间查询（"2601MP-" <= detail_no < "2601MP."）。
+    """
+    conn = _connect()
+    try:
+        return _max_detail_seq(conn.cursor(), yymm, category_code)
     finally:
         conn.close()
 
 
 def next_detail_number(yymm: str, category_code: str) -> str:
+    # Always max(existing) + 1: deleting the newest detail and adding again reuses its number
+    return f"{yymm}{category_code}-{max_detail_seq(yymm, category_code) + 1}"
+
+
+def _detail_number_conflicts(cur: sqlite3.Cursor, order_number: str, detail_nos) -> list:
+    import json
+    cur.execute(
+        """
+        SELECT DISTINCT detail_no FROM order_details
+        WHERE detail_no IN (SELECT value FROM json_each(?)) AND order_number <> ?
+        ORDER BY detail_no
+        """,
+        (json.dumps([str(d) for d in detail_nos if d]), order_number),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def find_detail_number_conflicts(order_number: str, detail_nos) -> list:
+    """detail_nos 中已被其他主单保存的序号（一次索引查询）。"""
     conn = _connect()
     try:
-        cur = conn.cursor()
-        
-        # Instead of using a separate counter table, query the current max sequence from order_details
-        # The detail_no format is expected to be like "2601MP-1", "2601MP-2", etc.
-        # We need to parse the suffix integer.
-        
-        prefix = f"{yymm}{category_code}-"
-        cur.execute(
-            "SELECT detail_no FROM order_details WHERE detail_no LIKE ?",
-            (prefix + "%",),
-        )
-        max_seq = 0
-        for (dn,) in cur.fetchall():
-            try:
-                if not dn: continue
-                # Split by '-' and take the last part
-                # Format: 2601MP-1 -> parts ["2601MP", "1"]
-                # Handle cases where prefix might appear multiple times or other formats?
-                # Assuming standard format.
-                # The prefix logic in recalc_detail_counter uses split("-")[-1]
-                
-                # If dn doesn't start with prefix, ignore? Query uses LIKE prefix% so it should be safe.
-                
-                part = str(dn).split("-")[-1]
-                n = int(part)
-                if n > max_seq:
-                    max_seq = n
-            except Exception:
-                pass
-        
-        seq = max_seq + 1
-        
-        # We don't need to update detail_counter table anymore if we strictly follow "max existing + 1"
-        # But for consistency or if detail_counter is used elsewhere?
-        # The requirement says: "start from current valid records... if deleted... still +1"
-        # Wait: "如果删除了新记录再重新添加，还是35" -> If max was 34, new is 35. If I delete 35, max is 34. Next new is 35 again.
-        # This means we should NOT persist a counter that remembers 35 was used.
-        # We should ALWAYS calculate Max(Existing) + 1.
-        
-        # So we ignore detail_counter table logic here and just return calculated seq.
-        
-        return f"{yymm}{category_code}-{seq}"
+        return _detail_number_conflicts(conn.cursor(), order_number, detail_nos)
     finally:
         conn.close()
 
@@ -573,6 +1047,7 @@ def save_order(number: str, yymm: str, category_code: str, unit: str, date_str:
             "INSERT OR REPLACE INTO orders(number, yymm, category, unit, date, task_name) VALUES(?,?,?,?,?,?)",
             (number, yymm, category_code, unit, date_str, task_name),
         )
+        _invalidate_execution_cache(cur, [yymm])
         conn.commit()
     finally:
         conn.close()
@@ -648,6 +1123,120 @@ def validate_detail_sequence(order_number: str):
         conn.close()
 
 
+# One pass over order_details: each detail with its order's prefix and the parsed sequence number.
+# scan_integrity runs every check against this temp table instead of re-reading order_details.
+_INTEGRITY_PARSED_SQL = """
+    CREATE TEMP TABLE integrity_parsed AS
+    SELECT
+        od.id, od.order_number, od.detail_no, od.plan_release,
+        o.number IS NULL AS order_missing,
+        o.yymm || o.category || '-' AS prefix,
+        CASE
+            WHEN o.number IS NOT NULL
+             AND SUBSTR(od.detail_no, 1, LENGTH(o.yymm || o.category) + 1) = o.yymm || o.category || '-'
+             AND SUBSTR(od.detail_no, LENGTH(o.yymm || o.category) + 2) <> ''
+             AND SUBSTR(od.detail_no, LENGTH(o.yymm || o.category) + 2) NOT GLOB '*[^0-9]*'
+            THEN CAST(SUBSTR(od.detail_no, LENGTH(o.yymm || o.category) + 2) AS INTEGER)
+        END AS seq
+    FROM order_details od
+    LEFT JOIN orders o ON o.number = od.order_number
+"""
+
+
+def scan_integrity() -> dict:
+    """
+    全库数据完整性检查（只读）。明细序号在同一 (yymm, 类别) 前缀下跨主单连续编号，
+    因此重复与缺号按前缀统计：
+      duplicates:       [(detail_no, 出现次数, 涉及主单(逗号分隔))]
+      gaps:             [(前缀, 缺号起, 缺号止)]
+      malformed:        [(明细id, 主单编号, detail_no)]  不符合所属主单 "yymm类别-数字" 格式
+      orphan_details:   [(主单编号, 明细条数)]  主单已不存在
+      orphan_releases:  [(id, 主单编号, 采购员)]  主单不存在，或该采购员在主单中已无明细
+      count_mismatches: [(主单编号, 采购员, record_count, 实际明细数)]
+    另含 elapsed_ms。order_details 只读一遍（写入连接私有的临时表），
+    各项检查都在同一读事务内完成，结果对应同一时刻的数据。
+    """
+    t0 = datetime.now()
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        report = {}
+        cur.execute("BEGIN")
+        cur.execute(_INTEGRITY_PARSED_SQL)
+        cur.execute(
+            """
+            SELECT detail_no, cnt, GROUP_CONCAT(DISTINCT order_number)
+            FROM (
+                SELECT detail_no, order_number, COUNT(1) OVER (PARTITION BY detail_no) AS cnt
+                FROM integrity_parsed WHERE detail_no IS NOT NULL AND detail_no <> ''
+            )
+            WHERE cnt > 1
+            GROUP BY detail_no, cnt
+            ORDER BY detail_no
+            """
+        )
+        report["duplicates"] = cur.fetchall()
+        cur.execute(
+            """
+            SELECT prefix, prev + 1, seq - 1
+            FROM (
+                SELECT prefix, seq, LAG(seq, 1, 0) OVER (PARTITION BY prefix ORDER BY seq) AS prev
+                FROM (SELECT DISTINCT prefix, seq FROM integrity_parsed WHERE seq IS NOT NULL)
+            )
+            WHERE seq > prev + 1
+            ORDER BY prefix, seq
+            """
+        )
+        report["gaps"] = cur.fetchall()
+        cur.execute(
+            """
+            SELECT id, order_number, detail_no FROM integrity_parsed
+            WHERE seq IS NULL AND prefix IS NOT NULL
+            ORDER BY order_number, id
+            """
+        )
+        report["malformed"] = cur.fetchall()
+        cur.execute(
+            """
+            SELECT order_number, COUNT(1)
+            FROM integrity_parsed
+            WHERE order_missing
+            GROUP BY order_number
+            ORDER BY order_number
+            """
+        )
+        report["orphan_details"] = cur.fetchall()
+        cur.execute(
+            """
+            WITH actual AS (
+                SELECT order_number, plan_release, COUNT(1) AS cnt
+                FROM integrity_parsed
+                WHERE plan_release IS NOT NULL AND plan_release <> ''
+                GROUP BY order_number, plan_release
+            )
+            SELECT r.id, r.source_order_number, r.purchaser, o.number IS NULL, r.record_count, IFNULL(a.cnt, 0)
+            FROM release_orders r
+            LEFT JOIN orders o ON o.number = r.source_order_number
+            LEFT JOIN actual a ON a.order_number = r.source_order_number AND a.plan_release = r.purchaser
+            ORDER BY r.source_order_number, r.purchaser
+            """
+        )
+        orphans, mismatches = [], []
+        for rid, order_number, purchaser, missing_order, record_count, actual in cur.fetchall():
+            if missing_order or actual == 0:
+                orphans.append((rid, order_number, purchaser))
+            elif (record_count or 0) != actual:
+                mismatches.append((order_number, purchaser, record_count, actual))
+        report["orphan_releases"] = orphans
+        report["count_mismatches"] = mismatches
+        report["elapsed_ms"] = round((datetime.now() - t0).total_seconds() * 1000, 1)
+        return report
+    finally:
+        # Ends the read transaction; the temp table goes with the connection
+        conn.rollback()
+        conn.close()
+
+
 def reset_test_data():
     conn = _connect()
     try:
@@ -657,75 +1246,115 @@ def reset_test_data():
         cur.execute("DELETE FROM counter")
         cur.execute("DELETE FROM detail_counter")
         cur.execute("DELETE FROM release_orders")
+        _invalidate_execution_cache(cur)
         conn.commit()
     finally:
         conn.close()
 
 
+def _recalc_detail_counter(cur: sqlite3.Cursor, yymm: str, category_code: str):
+    cur.execute(
+        "INSERT INTO detail_counter(yymm, category, seq) VALUES(?,?,?) "
+        "ON CONFLICT(yymm, category) DO UPDATE SET seq = excluded.seq",
+        (yymm, category_code, _max_detail_seq(cur, yymm, category_code)),
+    )
+
+
 def recalc_detail_counter(yymm: str, category_code: str):
-    prefix = f"{yymm}{category_code}-"
     conn = _connect()
     try:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT detail_no FROM order_details WHERE detail_no LIKE ?",
-            (prefix + "%",),
-        )
-        max_seq = 0
-        for (dn,) in cur.fetchall():
-            try:
-                part = str(dn).split("-")[-1]
-                n = int(part)
-                if n > max_seq:
-                    max_seq = n
-            except Exception:
-                pass
-        # ensure a row exists in detail_counter
-        cur.execute(
-            "SELECT seq FROM detail_counter WHERE yymm=? AND category=?",
-            (yymm, category_code),
-        )
-        row = cur.fetchone()
-        if row is None:
-            cur.execute(
-                "INSERT INTO detail_counter(yymm, category, seq) VALUES(?,?,?)",
-                (yymm, category_code, max_seq),
-            )
-        else:
-            cur.execute(
-                "UPDATE detail_counter SET seq=? WHERE yymm=? AND category=?",
-                (max_seq, yymm, category_code),
-            )
+        _recalc_detail_counter(conn.cursor(), yymm, category_code)
         conn.commit()
     finally:
         conn.close()
 
 
+def _order_filters(number_filter=None, task_filter=None, unit_filter=None, month_filter=None):
+    """fetch_orders 系列的模糊筛选条件 -> (" AND ..." 片段, 参数)"""
+    sql, params = "", []
+    for column, value in (("number", number_filter), ("task_name", task_filter),
+                          ("unit", unit_filter), ("yymm", month_filter)):
+        if value:
+            sql += f" AND {column} LIKE ?"
+            params.append(f"%{value}%")
+    return sql, params
+
+
+# Keeps IN (...) lists below SQLite's host-parameter limit (999 before 3.32)
+_IN_BATCH = 500
+
+
+def _batches(values):
+    values = list(values)
+    for i in range(0, len(values), _IN_BATCH):
+        yield values[i:i + _IN_BATCH]
+
+
 def fetch_orders(number_filter=None, task_filter=None, unit_filter=None, month_filter=None):
     conn = _connect()
     try:
         cur = conn.cursor()
-        sql = "SELECT yymm, category, unit, date, task_name, number, approval_doc FROM orders WHERE 1=1"
-        params = []
-        if number_filter:
-            sql += " AND number LIKE ?"
-            params.append(f"%{number_filter}%")
-        if task_filter:
-            sql += " AND task_name LIKE ?"
-            params.append(f"%{task_filter}%")
-        if unit_filter:
-            sql += " AND unit LIKE ?"
-            params.append(f"%{unit_filter}%")
-        if month_filter:
-            sql += " AND yymm LIKE ?"
-            params.append(f"%{month_filter}%")
-            
+        where, params = _order_filters(number_filter, task_filter, unit_filter, month_filter)
+        sql = "SELECT yymm, category, unit, date, task_name, number, approval_doc FROM orders WHERE 1=1" + where
         sql += " ORDER BY orders.rowid DESC"
         cur.execute(sql, params)
         return cur.fetchall()
     finally:
         conn.close()
 
+
+def fetch_orders_by_numbers(numbers, number_filter=None, task_filter=None, unit_filter=None, month_filter=None) -> dict:
+    """
+    按编号精确读取主单（number IN (...)），列同 fetch_orders，并同样应用其余筛选条件。
+    返回 {编号: 行}；不存在或不符合筛选的编号不出现在结果中。
+    """
+    result = {}
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        where, params = _order_filters(number_filter, task_filter, unit_filter, month_filter)
+        for batch in _batches(set(numbers)):
+            placeholders = ",".join(["?"] * len(batch))
+            cur.execute(
+                "SELECT yymm, category, unit, date, task_name, number, approval_doc FROM orders "
+                f"WHERE number IN ({placeholders})" + where,
+                batch + params
+            )
+            result.update((row[5], row) for row in cur.fetchall())
+        return result
+    finally:
+        conn.close()
+
+
+def fetch_order_stats(numbers) -> dict:
+    """
+    批量读取主单列表的统计列：{编号: (明细数, 询价合计, 发放状态)}，
+    与 count_details / get_order_inquiry_total / get_order_processing_status 的结果一致。
+    """
+    numbers = set(numbers)
+    counts = dict.fromkeys(numbers, 0)
+    totals = dict.fromkeys(numbers, 0.0)
+    statuses = {number: [] for number in numbers}
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        for batch in _batches(numbers):
+            placeholders = ",".join(["?"] * len(batch))
+            cur.execute(f"SELECT order_number, inquiry_price FROM order_details WHERE order_number IN ({placeholders})", batch)
+            for number, price_str in cur.fetchall():
+                counts[number] += 1
+                totals[number] += _inquiry_amount(price_str)
+            cur.execute(
+                f"SELECT source_order_number, status FROM release_orders WHERE source_order_number IN ({placeholders})",
+                batch
+            )
+            for number, status in cur.fetchall():
+                statuses[number].append(status)
+    finally:
+        conn.close()
+    return {number: (counts[number], totals[number], _processing_status(statuses[number])) for number in numbers}
+
+
 def fetch_order_by_number(number: str):
     conn = _connect()
     try:
@@ -807,43 +1436,83 @@ def get_order_processing_status(order_number: str) -> str:
             "SELECT status FROM release_orders WHERE source_order_number=?",
             (order_number,)
         )
-        rows = [r[0] for r in cur.fetchall()]
-        if not rows:
-            return "未发放"
-        for s in rows:
-            if s in ("未发放", "待发放"):
-                return "未发放"
-        return "已发放"
+        return _processing_status([r[0] for r in cur.fetchall()])
     finally:
         conn.close()
 
 
-def save_order_details_transaction(order_number: str, rows_data_list: list):
+def _processing_status(statuses) -> str:
+    """主单下各发放记录的状态 -> 主单发放状态：没有记录或仍有未发放/待发放时为“未发放”。"""
+    if not statuses:
+        return "未发放"
+    for s in statuses:
+        if s in ("未发放", "待发放"):
+            return "未发放"
+    return "已发放"
+
+
+def save_order_details_transaction(order_number: str, rows_data_list: list) -> list:
+    """
+    用 rows_data_list [(detail_no, row_data), ...] 整体替换该主单的明细。
+    若有序号已被其他主单（如另一客户端）保存，则不写入任何数据并返回这些序号；成功时返回 []。
+    """
     conn = _connect()
     try:
         cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        conflicts = _detail_number_conflicts(cur, order_number, [dn for dn, _ in rows_data_list])
+        if conflicts:
+            conn.rollback()
+            return conflicts
+        released_before = _release_fingerprints(cur, order_number)
         # First delete existing details for this order to prevent duplicates and handle deletions
         cur.execute("DELETE FROM order_details WHERE order_number=?", (order_number,))
+        _invalidate_execution_cache(cur, order_number=order_number)
         
         # Then insert all current rows
         for detail_no, row_data in rows_data_list:
             cur.execute(
                 """
                 INSERT INTO order_details(
-                    order_number, detail_no, item_name, purchase_item, spec_model, purchase_cycle, stock_count, purchase_qty, unit, unit_price, budget_wan, purchase_method, purchase_channel, plan_time, demand_unit, plan_release, progress_req, supplier, inquiry_price, tax_rate, actual_status, purchase_body, add_adjust, remark
-                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                    order_number, detail_no, item_name, purchase_item, spec_model, purchase_cycle, stock_count, purchase_qty, unit, unit_price, budget_wan, purchase_method, purchase_channel, plan_time, demand_unit, plan_release, progress_req, supplier, inquiry_price, tax_rate, actual_status, purchase_body, add_adjust, remark, item_key, spec_key
+                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
                 """,
-                [order_number, detail_no] + row_data,
+                [order_number, detail_no] + row_data + [match_key(row_data[1]), match_key(row_data[2])],
             )
-        conn.commit()
         
-        # Sync with release_orders
-        _sync_release_orders(cur, order_number)
+        # Sync with release_orders in the same transaction, so a re-stamped release is never lost
+        _sync_release_orders(cur, order_number, released_before)
         conn.commit()
+        return []
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
-def _sync_release_orders(cur: sqlite3.Cursor, order_number: str):
+def _release_fingerprints(cur: sqlite3.Cursor, order_number: str) -> dict:
+    # purchaser -> the detail fields recommendation sync reads, for purchasers already released
+    cur.execute(
+        """
+        SELECT d.plan_release, d.purchase_item, d.purchase_method, d.purchase_channel
+        FROM order_details d
+        JOIN release_orders r ON r.source_order_number = d.order_number AND r.purchaser = d.plan_release
+        WHERE d.order_number=? AND r.status='已发放'
+        """,
+        (order_number,)
+    )
+    result = {}
+    for purchaser, *fields in cur.fetchall():
+        result.setdefault(purchaser, []).append(tuple(str(v or "").strip() for v in fields))
+    return {p: sorted(v) for p, v in result.items()}
+
+
+def _sync_release_orders(cur: sqlite3.Cursor, order_number: str, released_before: dict = None):
+    """
+    按当前明细同步该主单的发放记录。released_before 为保存前的 _release_fingerprints；
+    已发放记录的明细有变化时重新取得 released_seq 并更新 released_at，让增量推荐同步再扫描一次该记录，
+    推荐权重也按这次变化计算新近程度。
+    """
     # 1. Find all purchasers in current details
     cur.execute(
         "SELECT plan_release, COUNT(1) FROM order_details WHERE order_number=? AND plan_release IS NOT NULL AND plan_release != '' GROUP BY plan_release",
@@ -854,11 +1523,12 @@ def _sync_release_orders(cur: sqlite3.Cursor, order_number: str):
     current_purchasers = set()
     today = today_str()
     
+    released_after = _release_fingerprints(cur, order_number) if released_before is not None else {}
     for purchaser, count in groups:
         current_purchasers.add(purchaser)
         # Check if exists
         cur.execute(
-            "SELECT id FROM release_orders WHERE source_order_number=? AND purchaser=?",
+            "SELECT id, status FROM release_orders WHERE source_order_number=? AND purchaser=?",
             (order_number, purchaser)
         )
         row = cur.fetchone()
@@ -868,6 +1538,13 @@ def _sync_release_orders(cur: sqlite3.Cursor, order_number: str):
                 "UPDATE release_orders SET record_count=? WHERE id=?",
                 (count, row[0])
             )
+            if row[1] == "已发放" and released_before is not None \
+                    and released_after.get(purchaser) != released_before.get(purchaser):
+                cur.execute(
+                    "UPDATE release_orders SET released_seq=(SELECT COALESCE(MAX(released_seq), 0) + 1 FROM release_orders), "
+                    "released_at=? WHERE id=?",
+                    (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), row[0])
+                )
         else:
             # Insert new
             cur.execute(
@@ -894,11 +1571,12 @@ def save_detail_row(order_number: str, detail_no: str, row_data: list):
         cur.execute(
             """
             INSERT INTO order_details(
-                order_number, detail_no, item_name, purchase_item, spec_model, purchase_cycle, stock_count, purchase_qty, unit, unit_price, budget_wan, purchase_method, purchase_channel, plan_time, demand_unit, plan_release, progress_req, supplier, inquiry_price, tax_rate, actual_status, purchase_body, add_adjust, remark
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                order_number, detail_no, item_name, purchase_item, spec_model, purchase_cycle, stock_count, purchase_qty, unit, unit_price, budget_wan, purchase_method, purchase_channel, plan_time, demand_unit, plan_release, progress_req, supplier, inquiry_price, tax_rate, actual_status, purchase_body, add_adjust, remark, item_key, spec_key
+            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
             """,
-            [order_number, detail_no] + row_data,
+            [order_number, detail_no] + row_data + [match_key(row_data[1]), match_key(row_data[2])],
         )
+        _invalidate_execution_cache(cur, order_number=order_number)
         conn.commit()
     finally:
         conn.close()
@@ -948,6 +1626,7 @@ def add_unit(name: str) -> bool:
         try:
             cur.execute("INSERT INTO units(name) VALUES(?)", (name,))
             conn.commit()
+            _notify_reference_changed("units")
             return True
         except sqlite3.IntegrityError:
             return False
@@ -956,21 +1635,7 @@ def add_unit(name: str) -> bool:
 
 
 def rename_unit(old_name: str, new_name: str) -> bool:
-    old_name = old_name.strip()
-    new_name = new_name.strip()
-    if not old_name or not new_name or old_name == new_name:
-        return False
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT 1 FROM units WHERE name=?", (new_name,))
-        if cur.fetchone():
-            return False
-        cur.execute("UPDATE units SET name=? WHERE name=?", (new_name, old_name))
-        conn.commit()
-        return cur.rowcount > 0
-    finally:
-        conn.close()
+    return rename_reference("units", old_name, new_name)["success"]
 
 
 def get_detail_column_widths():
@@ -1062,6 +1727,59 @@ def get_layout_version(layout_name: str) -> str:
         conn.close()
 
 
+LAYOUT_TABLES = {
+    "main": "main_layout",
+    "detail": "detail_layout",
+    "plan_release": "plan_release_layout",
+}
+
+
+def fetch_all_layouts():
+    """
+    Returns (widths, versions):
+      widths   -> {layout_name: {col_index: width}} for every table in LAYOUT_TABLES
+      versions -> {layout_name: version}
+    """
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        widths = {}
+        for name, table in LAYOUT_TABLES.items():
+            cur.execute(f"SELECT col_index, width FROM {table} ORDER BY col_index")
+            widths[name] = {int(c): int(w) for c, w in cur.fetchall()}
+        cur.execute("SELECT layout_name, version FROM layout_versions")
+        versions = {n: v for n, v in cur.fetchall() if v}
+        return widths, versions
+    finally:
+        conn.close()
+
+
+def save_layouts(widths: dict, versions: dict):
+    """
+    widths: {layout_name: {col_index: width}}, versions: {layout_name: version}
+    Written in a single transaction.
+    """
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        for name, cols in widths.items():
+            table = LAYOUT_TABLES[name]
+            cur.executemany(
+                f"INSERT OR REPLACE INTO {table}(col_index, width) VALUES(?,?)",
+                [(int(c), int(w)) for c, w in cols.items()],
+            )
+        cur.executemany(
+            "INSERT OR REPLACE INTO layout_versions(layout_name, version) VALUES(?,?)",
+            list(versions.items()),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
 def fetch_purchasers():
     conn = _connect()
     try:
@@ -1082,6 +1800,7 @@ def add_purchaser(name: str) -> bool:
         try:
             cur.execute("INSERT INTO purchasers(name) VALUES(?)", (name,))
             conn.commit()
+            _notify_reference_changed("purchasers")
             return True
         except sqlite3.IntegrityError:
             return False
@@ -1090,21 +1809,7 @@ def add_purchaser(name: str) -> bool:
 
 
 def rename_purchaser(old_name: str, new_name: str) -> bool:
-    old_name = old_name.strip()
-    new_name = new_name.strip()
-    if not old_name or not new_name or old_name == new_name:
-        return False
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT 1 FROM purchasers WHERE name=?", (new_name,))
-        if cur.fetchone():
-            return False
-        cur.execute("UPDATE purchasers SET name=? WHERE name=?", (new_name, old_name))
-        conn.commit()
-        return cur.rowcount > 0
-    finally:
-        conn.close()
+    return rename_reference("purchasers", old_name, new_name)["success"]
 
 def fetch_purchase_statuses():
     conn = _connect()
@@ -1125,6 +1830,7 @@ def add_purchase_status(name: str) -> bool:
         try:
             cur.execute("INSERT INTO purchase_status(name) VALUES(?)", (name,))
             conn.commit()
+            _notify_reference_changed("purchase_statuses")
             return True
         except sqlite3.IntegrityError:
             return False
@@ -1132,21 +1838,7 @@ def add_purchase_status(name: str) -> bool:
         conn.close()
 
 def rename_purchase_status(old_name: str, new_name: str) -> bool:
-    old_name = old_name.strip()
-    new_name = new_name.strip()
-    if not old_name or not new_name or old_name == new_name:
-        return False
-    conn = _connect()
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT 1 FROM purchase_status WHERE name=?", (new_name,))
-        if cur.fetchone():
-            return False
-        cur.execute("UPDATE purchase_status SET name=? WHERE name=?", (new_name, old_name))
-        conn.commit()
-        return cur.rowcount > 0
-    finally:
-        conn.close()
+    return rename_reference("purchase_statuses", old_name, new_name)["success"]
 
 def fetch_plan_months():
     conn = _connect()
@@ -1167,6 +1859,7 @@ def add_plan_month(name: str) -> bool:
         try:
             cur.execute("INSERT INTO plan_months(name) VALUES(?)", (name,))
             conn.commit()
+            _notify_reference_changed("plan_months")
             return True
         except sqlite3.IntegrityError:
             return False
@@ -1186,92 +1879,149 @@ def rename_plan_month(old_name: str, new_name: str) -> bool:
             return False
         cur.execute("UPDATE plan_months SET name=? WHERE name=?", (new_name, old_name))
         conn.commit()
-        return cur.rowcount > 0
+        changed = cur.rowcount > 0
+        if changed:
+            _notify_reference_changed("plan_months")
+        return changed
     finally:
         conn.close()
 
+_RELEASE_ORDERS_SQL = """
+    SELECT 
+        r.release_date, 
+        r.source_order_number, 
+        r.purchaser, 
+        o.task_name, 
+        o.unit, 
+        o.yymm, 
+        r.record_count, 
+        r.status
+    FROM release_orders r
+    LEFT JOIN orders o ON r.source_order_number = o.number
+    WHERE 1=1
+"""
+
+
+def _release_filters(number_filter=None, purchaser_filter=None, task_filter=None, month_filter=None, unit_filter=None):
+    """fetch_release_orders 系列的模糊筛选条件 -> (" AND ..." 片段, 参数)"""
+    sql, params = "", []
+    for column, value in (("r.source_order_number", number_filter), ("r.purchaser", purchaser_filter),
+                          ("o.task_name", task_filter), ("o.yymm", month_filter), ("o.unit", unit_filter)):
+        if value:
+            sql += f" AND {column} LIKE ?"
+            params.append(f"%{value}%")
+    return sql, params
+
+
 def fetch_release_orders(number_filter=None, purchaser_filter=None, task_filter=None, month_filter=None, unit_filter=None):
     conn = _connect()
     try:
         cur = conn.cursor()
         # Join release_orders with orders to get task_name, yymm, unit
-        sql = """
-            SELECT 
-                r.release_date, 
-                r.source_order_number, 
-                r.purchaser, 
-                o.task_name, 
-                o.unit, 
-                o.yymm, 
-                r.record_count, 
-                r.status
-            FROM release_orders r
-            LEFT JOIN orders o ON r.source_order_number = o.number
-            WHERE 1=1
-        """
-        params = []
-        if number_filter:
-            sql += " AND r.source_order_number LIKE ?"
-            params.append(f"%{number_filter}%")
-        if purchaser_filter:
-            sql += " AND r.purchaser LIKE ?"
-            params.append(f"%{purchaser_filter}%")
-        if task_filter:
-            sql += " AND o.task_name LIKE ?"
-            params.append(f"%{task_filter}%")
-        if month_filter:
-            sql += " AND o.yymm LIKE ?"
-            params.append(f"%{month_filter}%")
-        if unit_filter:
-            sql += " AND o.unit LIKE ?"
-            params.append(f"%{unit_filter}%")
-            
-        sql += " ORDER BY r.id ASC"
-        cur.execute(sql, params)
+        where, params = _release_filters(number_filter, purchaser_filter, task_filter, month_filter, unit_filter)
+        cur.execute(_RELEASE_ORDERS_SQL + where + " ORDER BY r.id ASC", params)
         return cur.fetchall()
     finally:
         conn.close()
 
-def fetch_release_details(order_number: str, purchaser: str):
+
+def fetch_release_orders_by_numbers(numbers, number_filter=None, purchaser_filter=None, task_filter=None,
+                                    month_filter=None, unit_filter=None) -> dict:
+    """
+    按主单编号精确读取发放记录（source_order_number IN (...)），列同 fetch_release_orders。
+    返回 {编号: [行, ...]}，每个编号的行按 id 升序；没有符合条件记录的编号不出现在结果中。
+    """
+    result = {}
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        where, params = _release_filters(number_filter, purchaser_filter, task_filter, month_filter, unit_filter)
+        for batch in _batches(set(numbers)):
+            placeholders = ",".join(["?"] * len(batch))
+            cur.execute(
+                _RELEASE_ORDERS_SQL + f" AND r.source_order_number IN ({placeholders})" + where + " ORDER BY r.id ASC",
+                batch + params
+            )
+            for row in cur.fetchall():
+                result.setdefault(row[1], []).append(row)
+        return result
+    finally:
+        conn.close()
+
+# Numeric suffix of a detail number ("2601MP-10" -> 10); non-numeric sorts last
+_DETAIL_SEQ_SQL = """
+    CASE WHEN substr({col}, instr({col}, '-') + 1) <> ''
+              AND substr({col}, instr({col}, '-') + 1) NOT GLOB '*[^0-9]*'
+         THEN CAST(substr({col}, instr({col}, '-') + 1) AS INTEGER)
+         ELSE 999999 END
+"""
+
+
+def iter_release_details(order_number: str, purchaser: str):
+    """逐行产出某主单下某采购员的明细，按序号升序（排序在 SQL 中完成）。"""
     conn = _connect()
     try:
         cur = conn.cursor()
         cur.execute(
-            """
+            f"""
             SELECT 
                 detail_no, purchase_item, spec_model, purchase_qty, 
                 unit, unit_price, budget_wan, purchase_method, purchase_channel, 
                 plan_release, progress_req, inquiry_price, tax_rate, remark
             FROM order_details 
             WHERE order_number=? AND plan_release=?
+            ORDER BY {_DETAIL_SEQ_SQL.format(col="detail_no")}, id
         """,
             (order_number, purchaser),
         )
-        rows = cur.fetchall()
-        
-        # Sort ASC by Detail No (Small to Large) for Plan Release
-        def sort_key(r):
-            dn = r[0]
-            try:
-                # 2601MP-10 -> 10
-                return int(dn.split("-")[-1])
-            except:
-                return 999999
-        
-        rows.sort(key=sort_key)
-        return rows
+        yield from cur
     finally:
         conn.close()
 
+
+def fetch_release_details(order_number: str, purchaser: str):
+    # Sort ASC by Detail No (Small to Large) for Plan Release
+    return list(iter_release_details(order_number, purchaser))
+
 def update_release_status(order_number: str, purchaser: str, new_status: str):
+    update_release_statuses([(order_number, purchaser)], new_status)
+
+
+def update_release_statuses(pairs, new_status: str) -> int:
+    """
+    pairs: 可迭代的 (主单编号, 采购员)；全部在一个事务内更新为 new_status。
+    标记为 已发放 时，此前未发放的记录按 pairs 顺序依次取得 released_seq 并记录发放时间。
+    返回更新的记录数。
+    """
+    pairs = list(dict.fromkeys((str(o), str(p)) for o, p in pairs))
+    if not pairs:
+        return 0
     conn = _connect()
     try:
         cur = conn.cursor()
-        cur.execute(
+        cur.execute("BEGIN IMMEDIATE")
+        if new_status == "已发放":
+            # Stamp the release so incremental recommendation sync can pick it up
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cur.executemany(
+                """
+                UPDATE release_orders
+                SET released_seq=(SELECT COALESCE(MAX(released_seq), 0) + 1 FROM release_orders),
+                    released_at=?
+                WHERE source_order_number=? AND purchaser=? AND COALESCE(status, '') <> '已发放'
+                """,
+                [(now, o, p) for o, p in pairs]
+            )
+        cur.executemany(
             "UPDATE release_orders SET status=? WHERE source_order_number=? AND purchaser=?",
-            (new_status, order_number, purchaser)
+            [(new_status, o, p) for o, p in pairs]
         )
+        updated = cur.rowcount
         conn.commit()
+        return updated
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
@@ -1457,47 +2207,100 @@ def get_released_items_for_recommendation() -> list:
         conn.close()
 
 
-def insert_recommendations_batch(items: list, timeout: float = 5.0, max_retries: int = 3) -> dict:
+# Distinct (item, purchaser, method, channel) taken from released details
+_RELEASED_CANDIDATES_SQL = """
+    SELECT
+        TRIM(d.purchase_item) AS item_name,
+        TRIM(COALESCE(d.plan_release, '')) AS plan_release,
+        TRIM(COALESCE(d.purchase_method, '')) AS purchase_method,
+        TRIM(COALESCE(d.purchase_channel, '')) AS purchase_channel,
+        d.id AS detail_id
+    FROM release_orders r
+    JOIN order_details d ON d.order_number = r.source_order_number AND d.plan_release = r.purchaser
+    WHERE r.status = '已发放' AND r.released_seq > :watermark
+      AND TRIM(COALESCE(d.purchase_item, '')) <> ''
+"""
+
+
+def get_release_watermark() -> int:
+    """最近一次成功同步处理到的 released_seq；从未同步时为 0。"""
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(release_watermark), 0) FROM sync_logs WHERE failed=0")
+        return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def sync_recommendations_from_releases(timeout: float = 5.0, max_retries: int = 3, full: bool = False) -> dict:
+    """
+    把已发放明细中推荐库还没有的标的一次性写入推荐库（INSERT ... SELECT ... WHERE NOT EXISTS）。
+    只考虑 released_seq 高于上次同步水位的发放记录（full=True 时全部重新扫描），
+    返回的 watermark 需随同步日志保存（save_sync_log）后才会推进。
+    同一标的有多种发放组合时取最近一条明细的采购员/方式/途径。
+    total 为候选组合数，inserted 为新增标的数，skipped = total - inserted。
+    """
     import time
-    inserted = 0
-    skipped = 0
-    failed = 0
-    failures = []
+    start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    since = 0 if full else get_release_watermark()
+    stats = {"start_time": start_time, "end_time": "", "total": 0, "inserted": 0, "skipped": 0, "failed": 0, "failures": [],
+             "since": since, "watermark": since}
+    ensure_db()
     conn = sqlite3.connect(DB_PATH, timeout=timeout)
     try:
         cur = conn.cursor()
-        existing = fetch_existing_recommendation_item_names()
-        to_insert = []
-        for item_name, plan_release, p_method, p_channel in items:
-            if item_name in existing:
-                skipped += 1
-                continue
-            to_insert.append((item_name, plan_release, 100, 1, p_method, p_channel))
-        if not to_insert:
-            return {"inserted": 0, "skipped": skipped, "failed": 0, "failures": []}
         tries = 0
         while True:
             try:
-                cur.executemany(
-                    "INSERT INTO recommendations(item_name, plan_release, weight, is_active, purchase_method, purchase_channel) VALUES(?,?,?,?,?,?)",
-                    to_insert,
+                cur.execute("BEGIN IMMEDIATE")
+                params = {"watermark": since}
+                cur.execute("SELECT COALESCE(MAX(released_seq), 0) FROM release_orders WHERE status='已发放'")
+                watermark = max(cur.fetchone()[0], since)
+                cur.execute(
+                    f"""
+                    SELECT COUNT(1) FROM (
+                        SELECT DISTINCT item_name, plan_release, purchase_method, purchase_channel
+                        FROM ({_RELEASED_CANDIDATES_SQL})
+                    )
+                    """,
+                    params,
                 )
+                total = cur.fetchone()[0]
+                # Bare columns with MAX() come from the row holding the max (SQLite)
+                cur.execute(
+                    f"""
+                    INSERT INTO recommendations(item_name, plan_release, weight, is_active, purchase_method, purchase_channel)
+                    SELECT item_name, plan_release, 100, 1, purchase_method, purchase_channel
+                    FROM (
+                        SELECT item_name, plan_release, purchase_method, purchase_channel, MAX(detail_id)
+                        FROM ({_RELEASED_CANDIDATES_SQL}) c
+                        WHERE NOT EXISTS (SELECT 1 FROM recommendations x WHERE x.item_name = c.item_name)
+                        GROUP BY item_name
+                    )
+                    """,
+                    params,
+                )
+                inserted = cur.rowcount
                 conn.commit()
-                inserted += len(to_insert)
+                stats.update(total=total, inserted=inserted, skipped=total - inserted, watermark=watermark)
                 break
             except sqlite3.OperationalError as e:
+                conn.rollback()
                 tries += 1
                 if tries > max_retries:
-                    failed += len(to_insert)
-                    failures.append(str(e))
+                    stats["failed"] = 1
+                    stats["failures"].append(str(e))
                     break
                 time.sleep(min(0.5 * tries, 2.0))
-        return {"inserted": inserted, "skipped": skipped, "failed": failed, "failures": failures}
     finally:
         conn.close()
+    stats["end_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return stats
 
 
-def save_sync_log(start_time: str, end_time: str, total: int, inserted: int, skipped: int, failed: int, details: str):
+def save_sync_log(start_time: str, end_time: str, total: int, inserted: int, skipped: int, failed: int, details: str,
+                  release_watermark: int = None):
     def ensure_sync_logs_table(cur: sqlite3.Cursor):
         cur.execute(
             """
@@ -1518,8 +2321,8 @@ def save_sync_log(start_time: str, end_time: str, total: int, inserted: int, ski
         cur = conn.cursor()
         ensure_sync_logs_table(cur)
         cur.execute(
-            "INSERT INTO sync_logs(start_time, end_time, total_candidates, inserted, skipped, failed, details) VALUES(?,?,?,?,?,?,?)",
-            (start_time, end_time, total, inserted, skipped, failed, details),
+            "INSERT INTO sync_logs(start_time, end_time, total_candidates, inserted, skipped, failed, details, release_watermark) VALUES(?,?,?,?,?,?,?,?)",
+            (start_time, end_time, total, inserted, skipped, failed, details, release_watermark),
         )
         conn.commit()
     finally:
@@ -1568,20 +2371,87 @@ def get_order_inquiry_total(order_number: str) -> float:
     try:
         cur = conn.cursor()
         cur.execute("SELECT inquiry_price FROM order_details WHERE order_number=?", (order_number,))
-        rows = cur.fetchall()
-        
-        total = 0.0
-        for (price_str,) in rows:
-            if not price_str:
-                continue
-            try:
-                # Handle potential thousand separators or currency symbols if any (though usually clean)
-                # Assuming simple float or int string
-                val = float(str(price_str).replace(",", "").strip())
-                total += val
-            except (ValueError, TypeError):
-                pass
-        return total
+        return sum(_inquiry_amount(price_str) for (price_str,) in cur.fetchall())
+    finally:
+        conn.close()
+
+
+def _inquiry_amount(price_str) -> float:
+    if not price_str:
+        return 0.0
+    try:
+        # Handle potential thousand separators or currency symbols if any (though usually clean)
+        # Assuming simple float or int string
+        return float(str(price_str).replace(",", "").strip())
+    except (ValueError, TypeError):
+        return 0.0
+
+
+# A release made today counts 1.0; one half_life_days old counts 0.5
+RECOMMENDATION_HALF_LIFE_DAYS = 90
+RECOMMENDATION_WEIGHT_SCALE = 100
+
+
+def recompute_recommendation_weights(half_life_days: float = RECOMMENDATION_HALF_LIFE_DAYS,
+                                     scale: int = RECOMMENDATION_WEIGHT_SCALE, since: int = None) -> dict:
+    """
+    按已发放明细中 (采购标的 -> 计划发放, 采购方式, 采购途径) 组合的出现次数与新近程度重算推荐权重。
+    每次发放贡献 1 / (1 + 距今天数 / half_life_days)，权重 = round(scale * 贡献之和)，
+    即一条当天的发放记为 scale（与同步新增时的默认权重一致）。
+    与推荐行完全匹配的组合才计分；没有发放记录的推荐行（如手工维护）保持原权重。
+    since 为发放水位时只重算 released_seq 高于它的发放涉及的标的（仍计入这些标的的全部发放），
+    增量同步后调用；为 None 时重算全部标的。
+    返回 {"updated": 改动的推荐行数}。
+    """
+    details = "order_details d"
+    if since is not None:
+        # Start from the releases past the watermark and their item keys, then every detail with
+        # those keys. "+tr.status" keeps the status index out so the releases come from released_seq,
+        # and CROSS JOIN pins the join order so nothing scans all released details
+        details = """(
+                    SELECT DISTINCT td.item_key
+                    FROM release_orders tr
+                    CROSS JOIN order_details td ON td.order_number = tr.source_order_number AND td.plan_release = tr.purchaser
+                    WHERE tr.released_seq > :since AND +tr.status = '已发放'
+                ) t
+                CROSS JOIN order_details d ON d.item_key = t.item_key"""
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        # Rows written around this module have no item_key yet
+        _fill_match_keys(conn)
+        cur.execute(
+            f"""
+            UPDATE recommendations SET weight = scores.weight
+            FROM (
+                SELECT
+                    TRIM(d.purchase_item) AS item_name,
+                    TRIM(COALESCE(d.plan_release, '')) AS plan_release,
+                    TRIM(COALESCE(d.purchase_method, '')) AS purchase_method,
+                    TRIM(COALESCE(d.purchase_channel, '')) AS purchase_channel,
+                    CAST(ROUND(:scale * SUM(1.0 / (1.0 + MAX(COALESCE(
+                        julianday('now', 'localtime') - julianday(COALESCE(r.released_at, r.release_date)), 365
+                    ), 0) / :half_life))) AS INTEGER) AS weight
+                FROM {details}
+                JOIN release_orders r ON r.source_order_number = d.order_number AND r.purchaser = d.plan_release
+                WHERE r.status = '已发放' AND TRIM(COALESCE(d.purchase_item, '')) <> ''
+                GROUP BY 1, 2, 3, 4
+            ) AS scores
+            WHERE TRIM(COALESCE(recommendations.item_name, '')) = scores.item_name
+              AND TRIM(COALESCE(recommendations.plan_release, '')) = scores.plan_release
+              AND TRIM(COALESCE(recommendations.purchase_method, '')) = scores.purchase_method
+              AND TRIM(COALESCE(recommendations.purchase_channel, '')) = scores.purchase_channel
+              AND recommendations.weight IS NOT scores.weight
+            """,
+            {"since": since, "scale": scale, "half_life": float(half_life_days)},
+        )
+        updated = cur.rowcount
+        conn.commit()
+        return {"updated": updated}
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
 
@@ -1615,15 +2485,50 @@ def save_monthly_plan(id: int, plan_month: str, item_name: str, spec_model: str,
         cur = conn.cursor()
         if id:
             cur.execute(
-                "UPDATE monthly_plans SET plan_month=?, item_name=?, spec_model=?, unit=?, plan_qty=?, plan_budget=?, department=?, remarks=? WHERE id=?",
-                (plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks, id)
+                "UPDATE monthly_plans SET plan_month=?, item_name=?, spec_model=?, unit=?, plan_qty=?, plan_budget=?, department=?, remarks=?, item_key=?, spec_key=? WHERE id=?",
+                (plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks,
+                 match_key(item_name), match_key(spec_model), id)
             )
         else:
             cur.execute(
-                "INSERT INTO monthly_plans(plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks) VALUES(?,?,?,?,?,?,?,?)",
-                (plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks)
+                "INSERT INTO monthly_plans(plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks, item_key, spec_key) VALUES(?,?,?,?,?,?,?,?,?,?)",
+                (plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks,
+                 match_key(item_name), match_key(spec_model))
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def upsert_monthly_plans(rows: list) -> dict:
+    """
+    rows: list of tuples (id, plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks)
+    id 为空的行插入，其余按 id 更新；全部在一个事务内完成。
+    """
+    updates = []
+    inserts = []
+    for row in rows:
+        if row[0]:
+            updates.append(_plan_row_keys(row[1:]) + (int(row[0]),))
+        else:
+            inserts.append(_plan_row_keys(row[1:]))
+    if not updates and not inserts:
+        return {"updated": 0, "inserted": 0}
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        if updates:
+            cur.executemany(
+                "UPDATE monthly_plans SET plan_month=?, item_name=?, spec_model=?, unit=?, plan_qty=?, plan_budget=?, department=?, remarks=?, item_key=?, spec_key=? WHERE id=?",
+                updates
+            )
+        if inserts:
+            cur.executemany(
+                "INSERT INTO monthly_plans(plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks, item_key, spec_key) VALUES(?,?,?,?,?,?,?,?,?,?)",
+                inserts
             )
         conn.commit()
+        return {"updated": len(updates), "inserted": len(inserts)}
     finally:
         conn.close()
 
@@ -1642,47 +2547,109 @@ def import_monthly_plans(rows_data: list):
     """
     rows_data: list of tuples (plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks)
     """
+    import_monthly_plans_batches([rows_data])
+
+
+def import_monthly_plans_batches(batches) -> int:
+    """
+    batches: 可迭代对象，每项为 import_monthly_plans 格式的行列表（可以是边读边产出的生成器）。
+    所有批次在一个事务内写入；迭代中抛出任何异常（包括取消）都会整体回滚并继续抛出。
+    返回插入的行数。
+    """
     conn = _connect()
     try:
         cur = conn.cursor()
-        cur.executemany(
-            "INSERT INTO monthly_plans(plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks) VALUES(?,?,?,?,?,?,?,?)",
-            rows_data
-        )
-        conn.commit()
+        total = 0
+        try:
+            for rows_data in batches:
+                if not rows_data:
+                    continue
+                cur.executemany(
+                    "INSERT INTO monthly_plans(plan_month, item_name, spec_model, unit, plan_qty, plan_budget, department, remarks, item_key, spec_key) VALUES(?,?,?,?,?,?,?,?,?,?)",
+                    [_plan_row_keys(r) for r in rows_data]
+                )
+                total += len(rows_data)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return total
     finally:
         conn.close()
 
 
 def fetch_monthly_plans_with_stats(plan_month: str):
+    """
+    计划行 + 当月执行数量/金额。计划与明细按规范化键 (item_key, spec_key) 等值匹配，
+    全角/半角、零宽字符、多余空格的差异不影响匹配（见 match_key）；
+    执行数取自按月缓存的 plan_exec_agg，明细变动后该月自动重算。
+    """
     conn = _connect()
     try:
+        _ensure_execution_aggregates(conn, [plan_month])
+        conn.commit()
         cur = conn.cursor()
-        # Join logic:
-        # 1. Subquery executed amounts from order_details + orders (filtered by yymm)
-        # 2. Left join monthly_plans with subquery on item_name AND spec_model
-        # NOTE: Using TRIM() to ignore whitespace differences
         sql = """
             SELECT
                 mp.id, mp.item_name, mp.spec_model, mp.unit, mp.plan_qty, mp.plan_budget, mp.department, mp.remarks,
-                COALESCE(sub.exec_qty, 0),
-                COALESCE(sub.exec_amt, 0)
+                COALESCE(a.exec_qty, 0),
+                COALESCE(a.exec_amt, 0)
             FROM monthly_plans mp
-            LEFT JOIN (
-                SELECT
-                    TRIM(od.purchase_item) as item_name,
-                    TRIM(od.spec_model) as spec_model,
-                    SUM(CAST(REPLACE(IFNULL(od.purchase_qty, '0'), ',', '') AS REAL)) as exec_qty,
-                    SUM(CAST(REPLACE(IFNULL(od.inquiry_price, '0'), ',', '') AS REAL)) as exec_amt
-                FROM order_details od
-                JOIN orders o ON od.order_number = o.number
-                WHERE o.yymm = ?
-                GROUP BY TRIM(od.purchase_item), TRIM(od.spec_model)
-            ) sub ON TRIM(mp.item_name) = sub.item_name AND TRIM(mp.spec_model) = sub.spec_model
+            LEFT JOIN plan_exec_agg a
+                ON a.yymm = mp.plan_month AND a.item_key = mp.item_key AND a.spec_key = mp.spec_key
             WHERE mp.plan_month = ?
             ORDER BY mp.id
         """
-        cur.execute(sql, (plan_month, plan_month))
+        cur.execute(sql, (plan_month,))
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+PLAN_ROLLUP_FIELDS = [
+    "plan_month", "department", "item_name", "spec_model", "unit",
+    "plan_qty", "plan_budget", "exec_qty", "exec_amt", "item_key", "spec_key",
+]
+
+
+def fetch_plan_rollup(months) -> list:
+    """
+    多个计划月份的计划/执行汇总，一条分组查询完成。
+    每行对应 (月份, 需求部门, 标的, 规格) 一组计划，字段顺序见 PLAN_ROLLUP_FIELDS；
+    执行数与 fetch_monthly_plans_with_stats 口径一致：按 (月份, item_key, spec_key) 匹配，
+    同月同标的的执行数出现在每个计划部门的行上，跨部门合计时只能计一次（见 plan_rollup）。
+    """
+    months = sorted(set(m for m in months if m))
+    if not months:
+        return []
+    conn = _connect()
+    try:
+        _ensure_execution_aggregates(conn, months)
+        conn.commit()
+        cur = conn.cursor()
+        placeholders = ",".join(["?"] * len(months))
+        cur.execute(
+            f"""
+            SELECT
+                p.plan_month, p.department, p.item_name, p.spec_model, p.unit,
+                p.plan_qty, p.plan_budget,
+                COALESCE(a.exec_qty, 0), COALESCE(a.exec_amt, 0),
+                p.item_key, p.spec_key
+            FROM (
+                SELECT
+                    plan_month, IFNULL(department, '') AS department, item_key, spec_key,
+                    MIN(item_name) AS item_name, MIN(spec_model) AS spec_model, MIN(unit) AS unit,
+                    SUM(IFNULL(plan_qty, 0)) AS plan_qty, SUM(IFNULL(plan_budget, 0)) AS plan_budget
+                FROM monthly_plans
+                WHERE plan_month IN ({placeholders})
+                GROUP BY plan_month, IFNULL(department, ''), item_key, spec_key
+            ) p
+            LEFT JOIN plan_exec_agg a
+                ON a.yymm = p.plan_month AND a.item_key = p.item_key AND a.spec_key = p.spec_key
+            ORDER BY p.plan_month, p.department, p.item_key, p.spec_key
+            """,
+            months
+        )
         return cur.fetchall()
     finally:
         conn.close()
@@ -1692,11 +2659,13 @@ def update_order_info(old_number: str, new_task: str, new_unit: str, new_categor
     conn = _connect()
     try:
         cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
         
         # 1. Fetch current info to compare
         cur.execute("SELECT yymm, category FROM orders WHERE number=?", (old_number,))
         row = cur.fetchone()
         if not row:
+            conn.rollback()
             return {"success": False, "msg": f"未找到单号 {old_number}"}
             
         old_yymm, old_cat = row
@@ -1711,87 +2680,52 @@ def update_order_info(old_number: str, new_task: str, new_unit: str, new_categor
             conn.commit()
             return {"success": True, "mode": "simple", "new_number": old_number, "msg": "更新成功"}
             
-        # 3. Regeneration needed
-        # Calculate new main number
-        # Note: We must call _get_and_inc inside this transaction context ideally, 
-        # but _get_and_inc commits its own transaction if we use next_main_number.
-        # So we should duplicate the logic here or reuse _get_and_inc with the current cursor?
-        # _get_and_inc takes a cursor and DOES NOT commit. next_main_number DOES commit.
-        # We should use _get_and_inc directly.
-        
-        seq = _get_and_inc(cur, "counter", new_yymm, new_category_code)
-        new_number = f"CG-{new_yymm}{new_category_code}{seq:04d}"
-        
-        # Prepare prefixes
+        # 3. Regeneration needed: new main number, then rewrite every reference in this transaction.
+        # No foreign keys are declared, so orders / release_orders / order_details are updated explicitly.
+        seq = _reserve_seq(cur, "counter", new_yymm, new_category_code)
+        new_number = _format_main_number(new_yymm, new_category_code, seq)
         old_prefix = f"{old_yymm}{old_cat}-"
         new_prefix = f"{new_yymm}{new_category_code}-"
-        
-        # Update orders table (primary key update)
-        # SQLite supports updating PK if cascades are enabled, but here we do it manually or via deferred FKs.
-        # Let's turn off foreign keys temporarily or just do it carefully? 
-        # SQLite usually cascades updates if defined. Let's check schema... NO foreign keys defined in CREATE TABLE.
-        # So we must update all manually.
-        
-        # 3.1 Update orders
+
+        _invalidate_execution_cache(cur, [old_yymm, new_yymm])
+
         cur.execute(
             "UPDATE orders SET number=?, yymm=?, category=?, task_name=?, unit=? WHERE number=?",
             (new_number, new_yymm, new_category_code, new_task, new_unit, old_number)
         )
-        
-        # 3.2 Update release_orders
         cur.execute(
             "UPDATE release_orders SET source_order_number=? WHERE source_order_number=?",
             (new_number, old_number)
         )
-        
-        # 3.3 Update order_details FK
+        # Move details to the new order and swap the detail_no prefix (2601MP-7 -> 2602MPJ-7) in one statement
         cur.execute(
-            "UPDATE order_details SET order_number=? WHERE order_number=?",
-            (new_number, old_number)
+            """
+            UPDATE order_details
+            SET order_number = :new_number,
+                detail_no = CASE
+                    WHEN SUBSTR(detail_no, 1, :prefix_len) = :old_prefix
+                    THEN :new_prefix || SUBSTR(detail_no, :prefix_len + 1)
+                    ELSE detail_no
+                END
+            WHERE order_number = :old_number
+            """,
+            {
+                "new_number": new_number, "old_number": old_number,
+                "old_prefix": old_prefix, "new_prefix": new_prefix, "prefix_len": len(old_prefix),
+            }
         )
-        
-        # 3.4 Update detail_no in order_details
-        # We need to fetch all details, update them in python, and push back? 
-        # Or use SQLite string functions. 
-        # detail_no format: 2601MP-1. We want to replace 2601MP- with 2602MPJ-
-        # SQLite replace: REPLACE(string, pattern, replacement)
-        # But we only want to replace the prefix.
-        
-        # Fetch affected detail_nos
-        cur.execute("SELECT id, detail_no FROM order_details WHERE order_number=?", (new_number,))
-        details = cur.fetchall()
-        
-        for did, dno in details:
-            if dno.startswith(old_prefix):
-                # Replace prefix
-                suffix = dno[len(old_prefix):]
-                new_dno = new_prefix + suffix
-                cur.execute("UPDATE order_details SET detail_no=? WHERE id=?", (new_dno, did))
-        
-        # 3.5 Recalc detail counter for the NEW category/month?
-        # The logic in recalc_detail_counter finds max(detail_no) for that prefix.
-        # We should update the detail_counter for the NEW category.
-        # And we might want to update the detail_counter for the OLD category? 
-        # Actually, detail_counter is just a cache of max seq.
-        # Let's just run recalc for both.
-        
-        # But wait, we are inside a transaction. We can't call functions that open new connections.
-        # We should replicate recalc logic or call it after commit.
-        # Let's do it after commit.
-        
+        moved = cur.rowcount
+
+        # detail_counter caches max(seq) per prefix; both prefixes changed
+        _recalc_detail_counter(cur, new_yymm, new_category_code)
+        _recalc_detail_counter(cur, old_yymm, old_cat)
         conn.commit()
-        
-        # Post-commit: recalc counters
-        try:
-            recalc_detail_counter(new_yymm, new_category_code)
-            recalc_detail_counter(old_yymm, old_cat)
-        except:
-            pass
             
         return {
             "success": True, 
             "mode": "regenerate", 
             "new_number": new_number, 
+            "details": moved,
             "msg": f"单号已变更为: {new_number}\n相关明细已自动重命名"
         }
         
@@ -1802,12 +2736,16 @@ def update_order_info(old_number: str, new_task: str, new_unit: str, new_categor
         conn.close()
 
 
-
-def fetch_monthly_details_for_export(yymm: str):
+def iter_monthly_details_for_export(yymm: str):
+    """
+    逐行产出某计划月份的全部明细（含主单信息），排序在 SQL 中完成：
+    1. 类别: MPB (半成品) -> MP (民品) -> MPJ (机加件)
+    2. 序号: 按 "-" 后的数字
+    """
     conn = _connect()
     try:
         cur = conn.cursor()
-        sql = """
+        sql = f"""
             SELECT 
                 o.number, o.task_name, o.category, o.unit, o.date,
                 od.detail_no, od.item_name, od.purchase_item, od.spec_model, 
@@ -1816,34 +2754,16 @@ def fetch_monthly_details_for_export(yymm: str):
             FROM order_details od
             JOIN orders o ON od.order_number = o.number
             WHERE o.yymm = ?
+            ORDER BY
+                CASE o.category WHEN 'MPB' THEN 1 WHEN 'MP' THEN 2 WHEN 'MPJ' THEN 3 ELSE 99 END,
+                {_DETAIL_SEQ_SQL.format(col="od.detail_no")},
+                od.id
         """
         cur.execute(sql, (yymm,))
-        rows = cur.fetchall()
-        
-        # Sort in Python
-        # Logic: 
-        # 1. Category Order: MPB (Semi) -> MP (Civil) -> MPJ (Machined)
-        # 2. Detail No: Alphanumeric sort (extract number from suffix)
-        
-        def sort_key(row):
-            # row[2] is category
-            cat = row[2]
-            cat_order = 99
-            if cat == "MPB": cat_order = 1
-            elif cat == "MP": cat_order = 2
-            elif cat == "MPJ": cat_order = 3
-            
-            # row[5] is detail_no, e.g., "2601MPB-1"
-            # Extract number after last '-'
-            detail_no = row[5]
-            try:
-                seq = int(detail_no.split("-")[-1])
-            except:
-                seq = 999999
-            
-            return (cat_order, seq)
-            
-        rows.sort(key=sort_key)
-        return rows
+        yield from cur
     finally:
         conn.close()
+
+
+def fetch_monthly_details_for_export(yymm: str):
+    return list(iter_monthly_details_for_export(yymm))
@@ -0,0 +1,333 @@
+"""
+database 调用耗时统计（默认关闭）
+
+enable() 之后：
+  - database 模块的每个公开函数记录耗时与返回行数（返回 list 时为其长度）；
+  - _connect()（含 ensure_db 的建表/迁移检查）按调用它的函数单独记为“打开连接”耗时；
+  - 经 _connect() 打开的连接上执行的每条 SQL 记录执行 + 取数耗时与返回行数。
+每个统计项只保留最近 WINDOW 个样本用于计算 p50/p95/p99，计数与累计耗时不受限制。
+单条 SQL 超过 slow_ms 时把语句、参数与 EXPLAIN QUERY PLAN 追加到慢查询日志
+（默认与数据库同目录的 slow_queries.log）。disable() 还原被替换的函数。
+
+启动时设置环境变量 PPOMS_DB_PROFILE=1 即自动开启，PPOMS_SLOW_QUERY_MS 调整慢查询阈值；
+也可在“工具 → 性能诊断”中随时开关。
+"""
+import functools
+import inspect
+import math
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime
+
+import database
+
+WINDOW = 500
+DEFAULT_SLOW_MS = 100.0
+SLOW_LOG_NAME = "slow_queries.log"
+MAX_CALLERS = 8
+_EXPLAIN_PREFIXES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+KINDS = ("func", "connect", "sql")
+
+_lock = threading.Lock()
+_local = threading.local()
+_series = {}
+_originals = {}
+_settings = {"slow_ms": DEFAULT_SLOW_MS, "log_path": None}
+
+
+class _Series:
+    __slots__ = ("samples", "count", "total_ms", "max_ms", "rows", "callers")
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.callers = []
+
+    def add(self, ms: float, rows: int, caller: str):
+        self.samples.append(ms)
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += rows
+        if caller and caller not in self.callers and len(self.callers) < MAX_CALLERS:
+            self.callers.append(caller)
+
+
+def percentile(samples, p: float) -> float:
+    """nearest-rank 百分位数；samples 为空时返回 0。"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered), max(1, math.ceil(p / 100.0 * len(ordered))))
+    return ordered[k - 1]
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _caller() -> str:
+    stack = _stack()
+    return stack[-1] if stack else ""
+
+
+def _record(kind: str, name: str, ms: float, rows: int = 0, caller: str = ""):
+    with _lock:
+        series = _series.get((kind, name))
+        if series is None:
+            series = _series[(kind, name)] = _Series()
+        series.add(ms, rows, caller)
+
+
+def _normalize_sql(sql: str) -> str:
+    return " ".join(str(sql).split())
+
+
+def _wrap_function(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        stack.append(name)
+        t0 = time.perf_counter()
+        rows = 0
+        try:
+            result = fn(*args, **kwargs)
+            if isinstance(result, list):
+                rows = len(result)
+            return result
+        finally:
+            stack.pop()
+            _record("func", name, (time.perf_counter() - t0) * 1000, rows)
+    return wrapper
+
+
+def _wrap_connect(fn):
+    @functools.wraps(fn)
+    def wrapper():
+        t0 = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            _record("connect", _caller() or "(直接调用)", (time.perf_counter() - t0) * 1000)
+    return wrapper
+
+
+def _slow_log_path() -> str:
+    return _settings["log_path"] or os.path.join(
+        os.path.dirname(os.path.abspath(database.DB_PATH)), SLOW_LOG_NAME
+    )
+
+
+def _explain(conn, sql: str, params):
+    if not sql.lstrip().upper().startswith(_EXPLAIN_PREFIXES):
+        return []
+    try:
+        # A plain cursor so the EXPLAIN itself is not recorded
+        cur = sqlite3.Cursor(conn)
+        cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+        rows = cur.fetchall()
+        cur.close()
+    except sqlite3.Error as e:
+        return [f"(EXPLAIN 失败: {e})"]
+    depth = {0: 0}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, 0) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def _log_slow(conn, sql: str, params, ms: float, rows: int, caller: str):
+    plan = _explain(conn, sql, params)
+    entry = [
+        f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  {ms:.1f} ms  rows={rows}  {caller or '-'}",
+        "  " + _normalize_sql(sql),
+    ]
+    if params:
+        entry.append(f"  params: {params!r}"[:500])
+    entry.extend("  " + line for line in plan)
+    try:
+        with _lock, open(_slow_log_path(), "a", encoding="utf-8") as f:
+            f.write("\n".join(entry) + "\n\n")
+    except OSError:
+        pass
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """记录每条语句的执行 + 取数耗时；语句结果取完、再次 execute 或连接关闭时计入统计。"""
+
+    _pending = None
+
+    def _begin(self, sql, params, t0):
+        self._pending = [sql, params, (time.perf_counter() - t0) * 1000, 0, _caller()]
+        if self.description is None:
+            self._flush()
+
+    def _add(self, t0, rows):
+        if self._pending is not None:
+            self._pending[2] += (time.perf_counter() - t0) * 1000
+            self._pending[3] += rows
+
+    def _flush(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, ms, rows, caller = pending
+        _record("sql", _normalize_sql(sql), ms, rows, caller)
+        if ms >= _settings["slow_ms"]:
+            _log_slow(self.connection, sql, params, ms, rows, caller)
+
+    def execute(self, sql, parameters=()):
+        self._flush()
+        t0 = time.perf_counter()
+        super().execute(sql, parameters)
+        self._begin(sql, parameters, t0)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._flush()
+        seq_of_parameters = list(seq_of_parameters)
+        t0 = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._begin(sql, seq_of_parameters[0] if seq_of_parameters else (), t0)
+        return self
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._add(t0, 0 if row is None else 1)
+        if row is None:
+            self._flush()
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(t0, len(rows))
+        if not rows:
+            self._flush()
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._add(t0, len(rows))
+        self._flush()
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(t0, 0)
+            self._flush()
+            raise
+        self._add(t0, 1)
+        return row
+
+    def close(self):
+        self._flush()
+        super().close()
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = weakref.WeakSet()
+
+    def cursor(self, factory=ProfiledCursor):
+        cur = super().cursor(factory)
+        if isinstance(cur, ProfiledCursor):
+            self._cursors.add(cur)
+        return cur
+
+    def close(self):
+        for cur in list(self._cursors):
+            cur._flush()
+        super().close()
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable(slow_ms: float = None, log_path: str = None):
+    """替换 database 模块中的公开函数与 _connect；重复调用只更新阈值与日志路径。"""
+    if slow_ms is not None:
+        _settings["slow_ms"] = float(slow_ms)
+    if log_path is not None:
+        _settings["log_path"] = log_path
+    if _originals:
+        return
+    for name, fn in list(vars(database).items()):
+        if not inspect.isfunction(fn) or fn.__module__ != database.__name__:
+            continue
+        if name == "_connect":
+            _originals[name] = fn
+            setattr(database, name, _wrap_connect(fn))
+        elif not name.startswith("_"):
+            _originals[name] = fn
+            setattr(database, name, _wrap_function(name, fn))
+    database._connection_factory = ProfiledConnection
+
+
+def disable():
+    for name, fn in _originals.items():
+        setattr(database, name, fn)
+    _originals.clear()
+    database._connection_factory = None
+
+
+def enable_from_env():
+    if os.environ.get("PPOMS_DB_PROFILE"):
+        enable(slow_ms=float(os.environ.get("PPOMS_SLOW_QUERY_MS") or DEFAULT_SLOW_MS))
+
+
+def slow_ms() -> float:
+    return _settings["slow_ms"]
+
+
+def slow_log_path() -> str:
+    return _slow_log_path()
+
+
+def reset():
+    with _lock:
+        _series.clear()
+
+
+def stats(kind: str) -> list:
+    """kind 为 func / connect / sql；按累计耗时降序返回每项的统计。"""
+    with _lock:
+        items = [(name, s, list(s.samples)) for (k, name), s in _series.items() if k == kind]
+    result = []
+    for name, s, samples in items:
+        result.append({
+            "name": name,
+            "count": s.count,
+            "total_ms": round(s.total_ms, 2),
+            "avg_ms": round(s.total_ms / s.count, 3) if s.count else 0.0,
+            "p50_ms": round(percentile(samples, 50), 3),
+            "p95_ms": round(percentile(samples, 95), 3),
+            "p99_ms": round(percentile(samples, 99), 3),
+            "max_ms": round(s.max_ms, 3),
+            "avg_rows": round(s.rows / s.count, 1) if s.count else 0.0,
+            "callers": list(s.callers),
+        })
+    result.sort(key=lambda r: r["total_ms"], reverse=True)
+    return result
@@ -17,16 +17,17 @@ def inspect():
     cur = conn.cursor()
 
     print("--- Monthly Plans (2601) ---")
-    cur.execute("SELECT id, item_name, spec_model FROM monthly_plans WHERE plan_month='2601'")
+    cur.execute("SELECT id, item_name, spec_model, item_key, spec_key FROM monthly_plans WHERE plan_month='2601'")
     plans = cur.fetchall()
     for row in plans:
         print(f"ID: {row[0]}")
         print(f"  Item: '{row[1]}' (Hex: {get_hex(row[1])})")
         print(f"  Spec: '{row[2]}' (Hex: {get_hex(row[2])})")
+        print(f"  Keys: '{row[3]}' / '{row[4]}'")
 
     print("\n--- Order Details (YYMM=2601) ---")
     cur.execute("""
-        SELECT d.id, d.item_name, d.purchase_item, d.spec_model, o.yymm 
+        SELECT d.id, d.item_name, d.purchase_item, d.spec_model, d.item_key, d.spec_key
         FROM order_details d
         JOIN orders o ON d.order_number = o.number
         WHERE o.yymm='2601'
@@ -37,6 +38,7 @@ def inspect():
         print(f"  ItemName: '{row[1]}' (Hex: {get_hex(row[1])})")
         print(f"  PurchItem: '{row[2]}' (Hex: {get_hex(row[2])})")
         print(f"  Spec: '{row[3]}' (Hex: {get_hex(row[3])})")
+        print(f"  Keys: '{row[4]}' / '{row[5]}'")
 
     conn.close()
 
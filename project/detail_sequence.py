@@ -0,0 +1,58 @@
+"""
+采购明细序号分配
+
+序号格式为 "{yymm}{类别}-{n}"（如 2601MP-35），同一 (yymm, 类别) 下跨主单连续编号。
+DetailSequenceAllocator 创建时从数据库取一次当前最大序号，之后在内存中递增分配，
+未保存的新行之间不会重号，也不必再逐行扫描表格。
+与其他客户端同时编号产生的冲突在保存时由 database.save_order_details_transaction 检出。
+"""
+import database
+
+
+def parse_seq(detail_no: str, prefix: str):
+    """prefix 开头且后缀为数字时返回序号，否则返回 None。"""
+    detail_no = str(detail_no or "")
+    if not detail_no.startswith(prefix):
+        return None
+    suffix = detail_no[len(prefix):]
+    return int(suffix) if suffix.isdigit() else None
+
+
+class DetailSequenceAllocator:
+    def __init__(self, yymm: str, category_code: str, next_detail_no_fn=None):
+        self.yymm = yymm
+        self.category_code = category_code
+        self.prefix = f"{yymm}{category_code}-"
+        self._next_detail_no_fn = next_detail_no_fn or database.next_detail_number
+        self._last = 0
+        self.reseed()
+
+    @property
+    def last(self) -> int:
+        """最近一次分配出去的序号（未分配时为数据库中的最大序号）。"""
+        return self._last
+
+    def reseed(self):
+        """重新读取数据库最大序号；只会前进，不会回退到已分配的序号之前。"""
+        n = parse_seq(self._next_detail_no_fn(self.yymm, self.category_code), self.prefix)
+        self._last = max(self._last, (n or 1) - 1)
+
+    def next(self) -> str:
+        self._last += 1
+        return f"{self.prefix}{self._last}"
+
+    def observe(self, detail_no: str):
+        """表格中出现了更大的序号（如手工输入）时跟进，避免之后重号。"""
+        n = parse_seq(detail_no, self.prefix)
+        if n is not None and n > self._last:
+            self._last = n
+
+    def release(self, detail_no: str):
+        """删除的行恰好是最后分配的序号时收回，下一行继续使用该序号。"""
+        if parse_seq(detail_no, self.prefix) == self._last and self._last > 0:
+            self._last -= 1
+
+    def rewind(self, mark: int):
+        """撤销 mark 之后分配的序号（如取消导入）。"""
+        if mark < self._last:
+            self._last = mark
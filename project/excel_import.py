@@ -0,0 +1,221 @@
+"""
+Excel 导入公共流程（采购明细 / 月度计划 / 推荐库）
+
+iter_sheet_batches 以 openpyxl read_only 模式逐行读取，按批产出只含所需列的 DataFrame，
+内存占用与批大小相关而与文件大小无关；用 pandas 向量化操作清洗与转换，
+校验错误以 DataFrame 形式返回：列为 行号 / 列 / 值 / 错误，行号对应 Excel 中的行。
+"""
+import pandas as pd
+
+
+DETAIL_COLUMNS = {
+    "采购标的": "item_name",
+    "规格型号": "spec_model",
+    "采购数量": "qty",
+    "单位": "unit",
+    "单价(元)": "price",
+    "采购方式": "method",
+    "采购途径": "channel",
+    "计划发放": "plan_release",
+    "备注": "remark",
+}
+DETAIL_REQUIRED = ["采购标的", "规格型号", "采购数量", "单位", "单价(元)", "采购方式", "采购途径", "计划发放"]
+
+
+MONTHLY_PLAN_COLUMNS = {
+    "标的名称": "item_name",
+    "规格型号": "spec_model",
+    "单位": "unit",
+    "计划数量": "plan_qty",
+    "计划预算": "plan_budget",
+    "需求部门": "department",
+    "备注": "remarks",
+}
+
+RECOMMENDATION_COLUMNS = {
+    "采购标的": "item_name",
+    "计划发放": "plan_release",
+    "权重": "weight",
+    "采购方式": "purchase_method",
+    "采购途径": "purchase_channel",
+}
+
+ERROR_COLUMNS = ["行号", "列", "值", "错误"]
+
+BATCH_SIZE = 2000
+
+# Header is row 1, so DataFrame index 0 is Excel row 2
+_EXCEL_ROW_OFFSET = 2
+
+
+class ImportCancelled(Exception):
+    """用户在进度框中取消了导入。"""
+
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing):
+        self.missing = list(missing)
+        super().__init__(f"Excel中必须包含列：{', '.join(self.missing)}")
+
+
+def _check_columns(found, columns: dict, required):
+    missing = [c for c in required if c not in found]
+    if missing:
+        raise MissingColumnsError(missing)
+    if not found:
+        raise ValueError(f"Excel需包含以下列名之一: {', '.join(columns)}")
+
+
+def read_sheet(path: str, columns: dict, required=()) -> pd.DataFrame:
+    """
+    读取 columns 中列出的表头（忽略首尾空格），全部按字符串读入。
+    缺失的列补空字符串；返回的列名为 columns 的值（英文字段名）。
+    一列都没有、或缺少 required 中的列时抛出 ValueError。
+    """
+    wanted = set(columns)
+    df = pd.read_excel(path, usecols=lambda c: str(c).strip() in wanted, dtype=str)
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.loc[:, ~df.columns.duplicated()]
+    _check_columns(list(df.columns), columns, required)
+    for col in columns:
+        if col not in df.columns:
+            df[col] = ""
+    return df[list(columns)].rename(columns=columns)
+
+
+def _cell_text(v) -> str:
+    return "" if v is None else str(v)
+
+
+def iter_sheet_batches(path: str, columns: dict, required=(), batch_size: int = BATCH_SIZE, on_progress=None):
+    """
+    逐批产出 DataFrame：列名为 columns 的值，index 为数据行序号（从 0 开始，空行跳过但占序号），
+    单元格统一转为字符串（空单元格为 ""）。
+    on_progress(已读行数, 总行数) 在每批产出前调用，返回 False 时抛出 ImportCancelled；
+    总行数取自工作表尺寸，未知时为 0。
+    .xls 无法流式读取，退回 read_sheet 后分块产出。
+    """
+    fields = list(columns.values())
+
+    def report(done, total):
+        if on_progress is not None and on_progress(done, total) is False:
+            raise ImportCancelled()
+
+    if str(path).lower().endswith(".xls"):
+        df = read_sheet(path, columns, required)
+        total = len(df)
+        for start in range(0, total, batch_size):
+            report(min(start + batch_size, total), total)
+            yield df.iloc[start:start + batch_size]
+        return
+
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        rows = ws.iter_rows(values_only=True)
+        positions = {}
+        for pos, name in enumerate(next(rows, None) or ()):
+            name = _cell_text(name).strip()
+            if name in columns and name not in positions:
+                positions[name] = pos
+        _check_columns(list(positions), columns, required)
+        picks = [positions.get(col) for col in columns]
+        total = max((ws.max_row or 1) - 1, 0)
+
+        batch, index, n = [], [], 0
+        for values in rows:
+            n += 1
+            rec = [_cell_text(values[p]) if p is not None and p < len(values) else "" for p in picks]
+            if any(rec):
+                batch.append(rec)
+                index.append(n - 1)
+            if len(batch) >= batch_size:
+                report(n, total)
+                yield pd.DataFrame(batch, columns=fields, index=index)
+                batch, index = [], []
+        report(n, max(total, n))
+        if batch:
+            yield pd.DataFrame(batch, columns=fields, index=index)
+    finally:
+        wb.close()
+
+
+def clean_text(s: pd.Series) -> pd.Series:
+    s = s.fillna("").astype(str).str.strip()
+    return s.mask(s.str.lower() == "nan", "")
+
+
+def to_number(s: pd.Series, default: float = 0.0):
+    """返回 (数值 Series, 非法值掩码)；空值取 default，不算错误。"""
+    text = clean_text(s).str.replace(",", "", regex=False)
+    values = pd.to_numeric(text, errors="coerce")
+    invalid = values.isna() & (text != "")
+    return values.fillna(default), invalid
+
+
+def _errors(mask: pd.Series, column: str, raw: pd.Series, message: str) -> pd.DataFrame:
+    idx = mask[mask].index
+    return pd.DataFrame({
+        "行号": idx + _EXCEL_ROW_OFFSET,
+        "列": column,
+        "值": raw.loc[idx].astype(str).values,
+        "错误": message,
+    })
+
+
+def concat_errors(parts: list) -> pd.DataFrame:
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=ERROR_COLUMNS)
+    return pd.concat(parts, ignore_index=True).sort_values("行号", kind="stable").reset_index(drop=True)
+
+
+def prepare_monthly_plans(df: pd.DataFrame, plan_month: str):
+    """
+    df: read_sheet(..., MONTHLY_PLAN_COLUMNS) 的结果
+    返回 (rows, errors)：rows 为 import_monthly_plans 所需的元组列表；
+    标的名称为空的行静默跳过，数量/预算无法识别的行不导入并记入 errors。
+    """
+    out = pd.DataFrame(index=df.index)
+    for col in ("item_name", "spec_model", "unit", "department", "remarks"):
+        out[col] = clean_text(df[col])
+    out["plan_qty"], bad_qty = to_number(df["plan_qty"])
+    out["plan_budget"], bad_budget = to_number(df["plan_budget"])
+
+    has_name = out["item_name"] != ""
+    errors = concat_errors([
+        _errors(bad_qty & has_name, "计划数量", df["plan_qty"], "不是有效数字"),
+        _errors(bad_budget & has_name, "计划预算", df["plan_budget"], "不是有效数字"),
+    ])
+    ok = out[has_name & ~bad_qty & ~bad_budget]
+    rows = list(zip(
+        [plan_month] * len(ok), ok["item_name"], ok["spec_model"], ok["unit"],
+        ok["plan_qty"].astype(float), ok["plan_budget"].astype(float), ok["department"], ok["remarks"],
+    ))
+    return rows, errors
+
+
+def prepare_recommendations(df: pd.DataFrame):
+    """
+    df: read_sheet(..., RECOMMENDATION_COLUMNS) 的结果
+    返回 (records, errors)：records 为字段名 -> 文本 的字典列表（权重为空时取 "0"），
+    权重不是数字的行不导入并记入 errors。
+    """
+    out = pd.DataFrame(index=df.index)
+    for col in ("item_name", "plan_release", "purchase_method", "purchase_channel"):
+        out[col] = clean_text(df[col])
+    weight = clean_text(df["weight"])
+    _, bad_weight = to_number(weight)
+    out["weight"] = weight.mask(weight == "", "0")
+
+    errors = concat_errors([_errors(bad_weight, "权重", df["weight"], "不是有效数字")])
+    records = out[~bad_weight].to_dict("records")
+    return records, errors
+
+
+def format_errors(errors: pd.DataFrame, limit: int = 10) -> str:
+    lines = [f"第{r['行号']}行 {r['列']}: {r['值']} ({r['错误']})" for r in errors.head(limit).to_dict("records")]
+    if len(errors) > limit:
+        lines.append(f"... 共 {len(errors)} 条")
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+"""
+导出/打印数据源
+
+按筛选条件直接从数据库逐行生成导出行（生成器），供 OrderExporter / OrderPrinter 使用，
+不读取界面表格；计划导出页的表格也用同一套筛选与列映射渲染，保证所见即所导。
+"""
+import re
+
+import database
+
+
+PLAN_EXPORT_COLUMNS = [
+    "序号", "主单编号", "需求单位", "采购标的", "规格型号",
+    "单位", "采购数量", "预算(万)",
+    "采购方式", "采购渠道", "计划发放", "询价金额", "备注"
+]
+
+# Index into fetch_monthly_details_for_export rows for each PLAN_EXPORT_COLUMNS entry:
+# detail_no, o.number, o.unit, purchase_item, spec_model, od.unit, purchase_qty, budget_wan,
+# purchase_method, purchase_channel, plan_release, inquiry_price, remark
+_PLAN_EXPORT_FIELDS = (5, 0, 3, 7, 8, 9, 10, 11, 12, 13, 14, 15, 17)
+
+RELEASE_COLUMNS = [
+    "序号", "采购标的", "规格型号", "采购数量", "单位",
+    "单价(元)", "总价(元)", "采购方式", "采购途径",
+    "计划发放", "进度要求", "询价(报价)", "税率", "备注"
+]
+
+
+def plan_export_filter(spec: dict):
+    """
+    spec: {"month", "seq", "item", "order", "unit", "units"}
+    seq 支持 "1-5" 这样的序号区间；units 非空时优先于单选的 unit（"全部" 表示不过滤）。
+    返回作用于 fetch_monthly_details_for_export 原始行的判定函数。
+    """
+    seq_text = (spec.get("seq") or "").strip()
+    item_kw = (spec.get("item") or "").strip()
+    order_kw = (spec.get("order") or "").strip()
+    unit_sel = spec.get("unit") or "全部"
+    unit_set = set(spec.get("units") or ())
+    seq_range = None
+    m = re.match(r"^(\d+)\s*-\s*(\d+)$", seq_text)
+    if m:
+        seq_range = (int(m.group(1)), int(m.group(2)))
+
+    def match_seq(detail_no: str) -> bool:
+        if not seq_text:
+            return True
+        if seq_range:
+            suf_m = re.search(r"-(\d+)$", detail_no)
+            if not suf_m:
+                return False
+            return seq_range[0] <= int(suf_m.group(1)) <= seq_range[1]
+        return seq_text in detail_no
+
+    def match_unit(unit_val: str) -> bool:
+        if unit_set:
+            return unit_val in unit_set
+        if unit_sel != "全部":
+            return unit_val == unit_sel
+        return True
+
+    def match(row) -> bool:
+        return (
+            match_seq(str(row[5] or ""))
+            and (not item_kw or item_kw in str(row[7] or ""))
+            and (not order_kw or order_kw in str(row[0] or ""))
+            and match_unit(str(row[3] or ""))
+        )
+
+    return match
+
+
+def plan_export_row(raw) -> list:
+    return [str(raw[i] or "") for i in _PLAN_EXPORT_FIELDS]
+
+
+def iter_plan_export_rows(spec: dict, raw_rows=None):
+    """
+    按 spec 产出 PLAN_EXPORT_COLUMNS 格式的行。
+    raw_rows 为空时直接从数据库读取 spec["month"] 的明细。
+    """
+    if raw_rows is None:
+        raw_rows = database.iter_monthly_details_for_export(spec.get("month") or "")
+    match = plan_export_filter(spec)
+    for raw in raw_rows:
+        if match(raw):
+            yield plan_export_row(raw)
+
+
+def iter_release_rows(order_number: str, purchaser: str):
+    """产出 RELEASE_COLUMNS 格式的计划发放明细行。"""
+    for row in database.iter_release_details(order_number, purchaser):
+        yield [str(v if v is not None else "") for v in row]
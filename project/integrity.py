@@ -0,0 +1,64 @@
+"""
+全库数据完整性检查
+
+database.scan_integrity 一次性扫描全部主单：明细序号重复/缺号/格式不符、
+主单已删除的明细与计划发放记录、发放记录条数与实际明细数不一致。
+本模块负责把结果整理成文字报告，菜单“工具 → 全库完整性检查”与命令行共用。
+
+用法：
+    python integrity.py [--db purchase.db] [--limit 50]
+退出码：无问题为 0，发现问题为 1。
+"""
+import argparse
+import sys
+
+import database
+
+SECTIONS = [
+    ("duplicates", "明细序号重复", lambda r: f"{r[0]} 出现 {r[1]} 次（主单 {r[2]}）"),
+    ("gaps", "明细序号缺号", lambda r: f"{r[0]}{r[1]}" if r[1] == r[2] else f"{r[0]}{r[1]} ~ {r[0]}{r[2]}"),
+    ("malformed", "明细序号格式不符", lambda r: f"主单 {r[1]} 明细 id={r[0]}: {r[2] or '(空)'}"),
+    ("orphan_details", "主单不存在的明细", lambda r: f"{r[0]}: {r[1]} 条"),
+    ("orphan_releases", "无对应明细的发放记录", lambda r: f"id={r[0]} 主单 {r[1]} 采购员 {r[2]}"),
+    ("count_mismatches", "发放记录条数不一致", lambda r: f"主单 {r[0]} 采购员 {r[1]}: 记录 {r[2]} 条，实际 {r[3]} 条"),
+]
+
+
+def issue_count(report: dict) -> int:
+    return sum(len(report.get(key) or []) for key, _, _ in SECTIONS)
+
+
+def summary(report: dict) -> str:
+    return f"检查完成，耗时 {report.get('elapsed_ms', 0)} ms，发现问题 {issue_count(report)} 项"
+
+
+def format_report(report: dict, limit: int = 50) -> str:
+    """每类问题最多列出 limit 条；limit 为 None 时全部列出。"""
+    lines = [summary(report)]
+    for key, title, fmt in SECTIONS:
+        rows = report.get(key) or []
+        if not rows:
+            continue
+        lines.append("")
+        lines.append(f"[{title}] {len(rows)} 项")
+        shown = rows if limit is None else rows[:limit]
+        lines.extend("  " + fmt(r) for r in shown)
+        if len(shown) < len(rows):
+            lines.append(f"  ……另有 {len(rows) - len(shown)} 项未列出")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="全库数据完整性检查")
+    parser.add_argument("--db", help="数据库文件，默认使用程序目录下的 purchase.db")
+    parser.add_argument("--limit", type=int, default=50, help="每类问题最多列出条数，0 表示全部")
+    args = parser.parse_args(argv)
+    if args.db:
+        database.DB_PATH = args.db
+    report = database.scan_integrity()
+    print(format_report(report, args.limit or None))
+    return 1 if issue_count(report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
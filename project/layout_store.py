@@ -0,0 +1,83 @@
+import database
+
+
+FLUSH_INTERVAL_MS = 2000
+
+
+class LayoutStore:
+    """
+    列宽/布局版本的内存缓存（write-behind）。
+
+    启动时一次性读取所有布局表；拖动列宽只修改内存并标记为脏，
+    由定时器或程序退出时在一个事务内批量写回数据库。
+    """
+
+    def __init__(self, flush_interval_ms: int = FLUSH_INTERVAL_MS):
+        self._widths, self._versions = database.fetch_all_layouts()
+        self._dirty_widths = {}
+        self._dirty_versions = {}
+        self._timer = None
+        from PySide6.QtCore import QCoreApplication, QTimer
+        app = QCoreApplication.instance()
+        if app is not None:
+            self._timer = QTimer()
+            self._timer.setSingleShot(True)
+            self._timer.setInterval(flush_interval_ms)
+            self._timer.timeout.connect(self.flush)
+            app.aboutToQuit.connect(self.flush)
+
+    def get_widths(self, layout_name: str) -> dict:
+        return dict(self._widths.get(layout_name, {}))
+
+    def get_version(self, layout_name: str) -> str:
+        return self._versions.get(layout_name, "")
+
+    def set_width(self, layout_name: str, col_index: int, width: int):
+        col_index, width = int(col_index), int(width)
+        cols = self._widths.setdefault(layout_name, {})
+        if cols.get(col_index) == width:
+            return
+        cols[col_index] = width
+        self._dirty_widths.setdefault(layout_name, {})[col_index] = width
+        self._schedule()
+
+    def set_version(self, layout_name: str, version: str):
+        if self._versions.get(layout_name) == version:
+            return
+        self._versions[layout_name] = version
+        self._dirty_versions[layout_name] = version
+        self._schedule()
+
+    def is_dirty(self) -> bool:
+        return bool(self._dirty_widths or self._dirty_versions)
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.start()
+
+    def flush(self):
+        if not self.is_dirty():
+            return
+        widths, versions = self._dirty_widths, self._dirty_versions
+        self._dirty_widths, self._dirty_versions = {}, {}
+        try:
+            database.save_layouts(widths, versions)
+        except Exception as e:
+            # Keep the pending changes for the next attempt
+            for name, cols in widths.items():
+                pending = self._dirty_widths.setdefault(name, {})
+                for c, w in cols.items():
+                    pending.setdefault(c, w)
+            for name, v in versions.items():
+                self._dirty_versions.setdefault(name, v)
+            print(f"布局保存失败: {e}")
+
+
+_store = None
+
+
+def get_layout_store() -> LayoutStore:
+    global _store
+    if _store is None:
+        _store = LayoutStore()
+    return _store
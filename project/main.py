@@ -1,22 +1,61 @@
+import time
+_STARTUP_T0 = time.perf_counter()
 import sys
 import os
 import shutil
-import time
+import importlib
 from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox, QTableWidgetItem, QStackedWidget, QWidget, QHBoxLayout, QVBoxLayout, QListWidget, QFileDialog
-from PySide6.QtCore import QDate, Qt, QSize, QUrl
+from PySide6.QtCore import QDate, Qt, QSize, QUrl, QTimer
 from PySide6.QtGui import QDesktopServices
 
 
 from ui_main import MainForm, SettingsDialog, EditOrderDialog
 from ui_detail import DetailWidget
 from ui_workbench import WorkbenchWidget
-from ui_plan_release import PlanReleaseForm
-from ui_recommendation import RecommendationWidget
-from ui_monthly_plan import MonthlyPlanWidget
-from ui_data_manager import DataManagerWidget
-from ui_plan_export import PlanExportWidget
+from reference_data import get_reference_data
+from change_watch import ChangeWatcher
 import database
-from print import export_order_pdf
+import tracing
+
+
+# Every page except the Workbench (landing page) is imported and constructed on
+# first navigation. index -> (attribute, module, class); pages whose module is
+# None are assembled by MainWindow._build_<attribute>.
+LAZY_PAGES = {
+    1: ("monthly_plan", "ui_monthly_plan", "MonthlyPlanWidget"),
+    2: ("purchase_flow_widget", None, None),
+    3: ("plan_release", "ui_plan_release", "PlanReleaseForm"),
+    4: ("plan_export", "ui_plan_export", "PlanExportWidget"),
+    5: ("recommendation", "ui_recommendation", "RecommendationWidget"),
+    6: ("data_manager", "ui_data_manager", "DataManagerWidget"),
+}
+
+# Background warm-up: delay after first paint, then one page per tick
+PAGE_WARMUP_DELAY_MS = 1500
+PAGE_WARMUP_INTERVAL_MS = 50
+
+# Change notifications (see change_watch): pages reloaded as a whole when one of
+# these tables changed, index -> tables. The order list (2) and the release list (3)
+# patch the affected rows in place instead and only reload when the change log
+# cannot say what changed.
+PAGE_RELOAD_TABLES = {
+    0: {"orders", "order_details", "release_orders"},
+    1: {"monthly_plans", "orders", "order_details"},
+}
+# Read-only pages reload immediately while on screen; an editable page (monthly
+# plan) waits for the next visit so unsaved edits are not thrown away
+LIVE_RELOAD_PAGES = (0, 2, 3)
+# Pages reloaded on every visit when change notifications are off
+VISIT_RELOAD_PAGES = (0, 1, 3)
+# More changed orders than this: reload the list instead of patching row by row
+ROW_REFRESH_LIMIT = 200
+# change_log table -> ReferenceData kind
+REFERENCE_TABLES = {
+    "units": "units",
+    "purchasers": "purchasers",
+    "purchase_status": "purchase_statuses",
+    "plan_months": "plan_months",
+}
 
 
 class MainWindow(QMainWindow):
@@ -71,53 +110,30 @@ class MainWindow(QMainWindow):
         self.workbench = WorkbenchWidget()
         self.right_stack.addWidget(self.workbench)
         
-        # 2. Monthly Plan Page (Index 1)
-        self.monthly_plan = MonthlyPlanWidget()
-        self.right_stack.addWidget(self.monthly_plan)
-        
-        # 3. Purchase Plan Page (Index 2)
-        self.purchase_flow_widget = QWidget()
-        self.purchase_layout = QVBoxLayout(self.purchase_flow_widget)
-        self.purchase_layout.setContentsMargins(0, 0, 0, 0)
-        
-        self.form = MainForm()
-        self.stack = QStackedWidget() # This is the stack used by existing logic (MainForm <-> DetailWidget)
-        self.stack.addWidget(self.form)
-        
-        self.purchase_layout.addWidget(self.stack)
-        self.right_stack.addWidget(self.purchase_flow_widget)
-        
-        # 4. Plan Release Page (Index 3)
-        self.plan_release = PlanReleaseForm(self)
-        self.right_stack.addWidget(self.plan_release)
-        
-        # 5. Plan Export Page (Index 4)
-        self.plan_export = PlanExportWidget()
-        self.right_stack.addWidget(self.plan_export)
-        
-        # 6. Recommendation Page (Index 5)
-        self.recommendation = RecommendationWidget()
-        self.right_stack.addWidget(self.recommendation)
-        
-        # 7. Data Manager Page (Index 6)
-        self.data_manager = DataManagerWidget()
-        self.right_stack.addWidget(self.data_manager)
+        # 2-7. Monthly Plan, Purchase Plan, Plan Release, Plan Export,
+        # Recommendation, Data Manager (Index 1-6): placeholders until first use
+        self.form = None
+        self.stack = None # MainForm <-> DetailWidget stack, built with the Purchase Plan page
+        for index in sorted(LAZY_PAGES):
+            setattr(self, LAZY_PAGES[index][0], None)
+            self.right_stack.addWidget(QWidget())
+        self._warmup_queue = []
+        self._stale_pages = set()
+        self._history_filters = (None, None, None, None)
+        self.change_watcher = ChangeWatcher(self)
+        self.change_watcher.changed.connect(self.on_db_changed)
         
         # Connect Sidebar
         self.sidebar.currentRowChanged.connect(self.on_sidebar_changed)
-        self.sidebar.setCurrentRow(0) # Default to Workbench
+        # Default to Workbench; refresh_months() below loads its stats once
+        self.sidebar.blockSignals(True)
+        self.sidebar.setCurrentRow(0)
+        self.sidebar.blockSignals(False)
         
         # Connect Workbench Signals
         self.workbench.open_purchase_plan.connect(lambda: self.sidebar.setCurrentRow(2))
         self.workbench.open_plan_release.connect(lambda: self.sidebar.setCurrentRow(3))
         
-        # Existing Connections
-        self.form.button_generate.clicked.connect(self.generate_order)
-        self.form.btn_search.clicked.connect(self.search_orders)
-        self.form.table.cellDoubleClicked.connect(self.open_detail_from_table)
-        self.form.table.cellClicked.connect(self.on_table_cell_clicked)
-        self.form.table.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.form.table.customContextMenuRequested.connect(self.show_context_menu)
         menu = self.menuBar().addMenu("设置")
         act_units = menu.addAction("需求单位")
         act_units.triggered.connect(self.open_settings)
@@ -131,26 +147,150 @@ class MainWindow(QMainWindow):
         tools = self.menuBar().addMenu("工具")
         act_validate = tools.addAction("校验明细序号")
         act_validate.triggered.connect(self.validate_current_order_details)
+        act_integrity = tools.addAction("全库完整性检查")
+        act_integrity.triggered.connect(self.scan_integrity)
+        act_diagnostics = tools.addAction("性能诊断")
+        act_diagnostics.triggered.connect(self.open_diagnostics)
+        self.act_trace = tools.addAction("界面响应跟踪")
+        self.act_trace.setCheckable(True)
+        self.act_trace.setChecked(tracing.is_enabled())
+        self.act_trace.toggled.connect(self.toggle_ui_trace)
+        self.loop_monitor = tracing.EventLoopMonitor(self)
+        if tracing.is_enabled():
+            self.loop_monitor.start()
         act_reset = tools.addAction("清除测试数据并初始化")
         act_reset.triggered.connect(self.reset_test_data)
         self.current_order_number = ""
-        self.load_history()
-        self.refresh_units()
         self.refresh_months()
         self.detail_widget = None
+        get_reference_data().changed.connect(self.on_reference_changed)
+
+    def _build_purchase_flow_widget(self):
+        page = QWidget()
+        self.purchase_layout = QVBoxLayout(page)
+        self.purchase_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.form = MainForm()
+        self.stack = QStackedWidget() # This is the stack used by existing logic (MainForm <-> DetailWidget)
+        self.stack.addWidget(self.form)
+        self.purchase_layout.addWidget(self.stack)
+        
+        # Existing Connections
+        self.form.button_generate.clicked.connect(self.generate_order)
+        self.form.btn_search.clicked.connect(self.search_orders)
+        self.form.table.cellDoubleClicked.connect(self.open_detail_from_table)
+        self.form.table.cellClicked.connect(self.on_table_cell_clicked)
+        self.form.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.form.table.customContextMenuRequested.connect(self.show_context_menu)
+        
+        self.load_history()
+        self.refresh_units()
+        self.form.set_months(get_reference_data().get("plan_months"))
+        return page
+
+    def _build_plan_release(self):
+        from ui_plan_release import PlanReleaseForm
+        return PlanReleaseForm(self)
+
+    def _ensure_page(self, index):
+        """Import and construct a lazy page; returns True if it was just created."""
+        spec = LAZY_PAGES.get(index)
+        if not spec:
+            return False
+        attr, module_name, class_name = spec
+        if getattr(self, attr) is not None:
+            return False
+        builder = getattr(self, f"_build_{attr}", None)
+        with tracing.span(f"page.create:{attr}"):
+            if builder is not None:
+                page = builder()
+            else:
+                page = getattr(importlib.import_module(module_name), class_name)()
+        placeholder = self.right_stack.widget(index)
+        self.right_stack.removeWidget(placeholder)
+        placeholder.deleteLater()
+        self.right_stack.insertWidget(index, page)
+        setattr(self, attr, page)
+        return True
+
+    def start_page_warmup(self, delay_ms=PAGE_WARMUP_DELAY_MS):
+        """Construct the remaining pages in the background after first paint."""
+        self._warmup_queue = [i for i in sorted(LAZY_PAGES) if getattr(self, LAZY_PAGES[i][0]) is None]
+        if self._warmup_queue:
+            QTimer.singleShot(delay_ms, self._warmup_next)
+
+    def _warmup_next(self):
+        # One page per event-loop tick so input stays responsive in between
+        while self._warmup_queue:
+            index = self._warmup_queue.pop(0)
+            try:
+                if self._ensure_page(index):
+                    break
+            except Exception as e:
+                print(f"页面预加载失败({index}): {e}")
+        if self._warmup_queue:
+            QTimer.singleShot(PAGE_WARMUP_INTERVAL_MS, self._warmup_next)
 
+    @tracing.traced("on_sidebar_changed")
     def on_sidebar_changed(self, index):
+        created = self._ensure_page(index)
+        if self.change_watcher.is_running():
+            # Deliver writes committed since the last tick before deciding what is stale
+            self.change_watcher.poll()
+        elif index in VISIT_RELOAD_PAGES:
+            self._stale_pages.add(index)
         self.right_stack.setCurrentIndex(index)
+        # A freshly constructed page has already loaded its data in __init__
+        if created:
+            self._stale_pages.discard(index)
+            return
+        if index == 4:
+            self.plan_export.load_months()
+        elif index == 6:
+            self.data_manager.load_backups()
+        elif index in self._stale_pages:
+            self._reload_page(index)
+
+    def _reload_page(self, index):
+        self._stale_pages.discard(index)
         if index == 0:
             self.workbench.refresh_stats()
         elif index == 1:
             self.monthly_plan.load_data()
+        elif index == 2:
+            self.load_history(*self._history_filters)
         elif index == 3:
             self.plan_release.load_data()
-        elif index == 4:
-            self.plan_export.load_months()
-        elif index == 6:
-            self.data_manager.load_backups()
+
+    def start_change_watch(self):
+        """开始轮询数据库变更；之后页面只在数据确实变化时刷新。"""
+        self.change_watcher.start()
+
+    @tracing.traced("on_db_changed")
+    def on_db_changed(self, changes):
+        built = {i for i in LAZY_PAGES if getattr(self, LAZY_PAGES[i][0]) is not None} | {0}
+        tables = changes["tables"]
+        if changes["truncated"]:
+            self._stale_pages |= built & {0, 1, 2, 3}
+            get_reference_data().invalidate_all()
+        else:
+            for index, deps in PAGE_RELOAD_TABLES.items():
+                if index in built and deps & tables.keys():
+                    self._stale_pages.add(index)
+            orders = set()
+            for table in ("orders", "order_details", "release_orders"):
+                orders |= tables.get(table, set())
+            if self.form is not None and orders:
+                self.refresh_order_rows(orders)
+            released = tables.get("release_orders", set()) | tables.get("orders", set())
+            if self.plan_release is not None and released:
+                self.plan_release.refresh_orders(released)
+            for table, kind in REFERENCE_TABLES.items():
+                if table in tables:
+                    get_reference_data().invalidate(kind)
+        current = self.right_stack.currentIndex()
+        if current in self._stale_pages and current in LIVE_RELOAD_PAGES:
+            self._reload_page(current)
 
     def get_display_name(self, path):
         if not path:
@@ -179,48 +319,89 @@ class MainWindow(QMainWindow):
             
         return base
 
+    @tracing.traced("load_history")
     def load_history(self, number_filter=None, task_filter=None, unit_filter=None, month_filter=None):
-        rows = database.fetch_orders(number_filter, task_filter, unit_filter, month_filter)
-        self.form.table.setRowCount(0)
-        for r in rows:
-            rr = self.form.table.rowCount()
-            self.form.table.insertRow(rr)
+        self._history_filters = (number_filter, task_filter, unit_filter, month_filter)
+        with tracing.span("load_history.sql") as args:
             # r: yymm, category, unit, date, task_name, number, approval_doc
-            yymm = r[0]
-            category_code = r[1]
-            unit = r[2]
-            date_str = r[3]
-            task_name = r[4]
-            number = r[5]
-            approval_doc = r[6] if len(r) > 6 else ""
-            
-            category = database.category_display_from_code(category_code)
-            count = database.count_details(number)
-            total_inquiry = database.get_order_inquiry_total(number)
-            
-            # Use safe string conversion
-            def safe_str(v):
-                return str(v) if v is not None else ""
-                
-            status = database.get_order_processing_status(number)
-            
-            doc_display = self.get_display_name(approval_doc) if approval_doc else "点击上传"
-            
-            vals = [date_str, number, task_name, unit, category, yymm, f"{total_inquiry:,.2f}", count, status]
-            for c, val in enumerate(vals):
-                self.form.table.setItem(rr, c, QTableWidgetItem(safe_str(val)))
-            
-            # Column 9: Approval Doc
-            item_doc = QTableWidgetItem(doc_display)
-            item_doc.setTextAlignment(Qt.AlignCenter)
-            if approval_doc:
-                item_doc.setForeground(Qt.blue)
-                item_doc.setToolTip(f"已上传: {doc_display}\n点击打开，右键可替换")
-            else:
-                item_doc.setForeground(Qt.gray)
-                item_doc.setToolTip("点击上传审批单据PDF")
-            self.form.table.setItem(rr, 9, item_doc)
+            rows = database.fetch_orders(number_filter, task_filter, unit_filter, month_filter)
+            stats = database.fetch_order_stats(r[5] for r in rows)
+            args["rows"] = len(rows)
+
+        with tracing.span("load_history.shape"):
+            shaped = [self._shape_order_row(r, stats[r[5]]) for r in rows]
+
+        with tracing.span("load_history.fill"):
+            self.form.table.setRowCount(0)
+            for row in shaped:
+                rr = self.form.table.rowCount()
+                self.form.table.insertRow(rr)
+                self._fill_order_row(rr, row)
+
+    def _shape_order_row(self, r, stats):
+        # Use safe string conversion
+        def safe_str(v):
+            return str(v) if v is not None else ""
+
+        count, total_inquiry, status = stats
+        yymm = r[0]
+        category_code = r[1]
+        unit = r[2]
+        date_str = r[3]
+        task_name = r[4]
+        number = r[5]
+        approval_doc = r[6] if len(r) > 6 else ""
+
+        category = database.category_display_from_code(category_code)
+        doc_display = self.get_display_name(approval_doc) if approval_doc else "点击上传"
+        vals = [date_str, number, task_name, unit, category, yymm, f"{total_inquiry:,.2f}", count, status]
+        return [safe_str(v) for v in vals], approval_doc, doc_display
+
+    def _fill_order_row(self, rr, shaped):
+        vals, approval_doc, doc_display = shaped
+        for c, val in enumerate(vals):
+            self.form.table.setItem(rr, c, QTableWidgetItem(val))
+
+        # Column 9: Approval Doc
+        item_doc = QTableWidgetItem(doc_display)
+        item_doc.setTextAlignment(Qt.AlignCenter)
+        if approval_doc:
+            item_doc.setForeground(Qt.blue)
+            item_doc.setToolTip(f"已上传: {doc_display}\n点击打开，右键可替换")
+        else:
+            item_doc.setForeground(Qt.gray)
+            item_doc.setToolTip("点击上传审批单据PDF")
+        self.form.table.setItem(rr, 9, item_doc)
 
+    @tracing.traced("refresh_order_rows")
+    def refresh_order_rows(self, numbers):
+        """
+        只重新读取 numbers 对应的主单行；出现当前列表里没有、但符合筛选条件的主单
+        （新建或改号）时整表重新加载，以保持原有行序。
+        """
+        if len(numbers) > ROW_REFRESH_LIMIT:
+            self.load_history(*self._history_filters)
+            return
+        number_filter, task_filter, unit_filter, month_filter = self._history_filters
+        table = self.form.table
+        positions = {}
+        for r in range(table.rowCount()):
+            item = table.item(r, 1)
+            if item is not None:
+                positions[item.text()] = r
+        rows = database.fetch_orders_by_numbers(numbers, number_filter, task_filter, unit_filter, month_filter)
+        if any(number not in positions for number in rows):
+            self.load_history(*self._history_filters)
+            return
+        stats = database.fetch_order_stats(rows)
+        removed = []
+        for number in numbers:
+            if number in rows:
+                self._fill_order_row(positions[number], self._shape_order_row(rows[number], stats[number]))
+            elif number in positions:
+                removed.append(positions[number])
+        for r in sorted(removed, reverse=True):
+            table.removeRow(r)
 
     def search_orders(self):
         number = self.form.search_number.text().strip()
@@ -318,7 +499,7 @@ class MainWindow(QMainWindow):
 
     def validate_current_order_details(self):
         number = self.current_order_number
-        if not number:
+        if not number and self.form is not None:
             # try selected
             r = self.form.table.currentRow()
             if r >= 0:
@@ -333,37 +514,94 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.warning(self, "校验", msg)
 
+    def scan_integrity(self):
+        import integrity
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            report = database.scan_integrity()
+        finally:
+            QApplication.restoreOverrideCursor()
+        total = integrity.issue_count(report)
+        box = QMessageBox(QMessageBox.Warning if total else QMessageBox.Information, "全库完整性检查",
+                          integrity.summary(report), parent=self)
+        if total:
+            box.setDetailedText(integrity.format_report(report, limit=None))
+        box.exec()
+
+    def open_diagnostics(self):
+        # Non-modal so the pages being diagnosed stay usable; 刷新 picks up new samples
+        from ui_diagnostics import DiagnosticsDialog
+        if getattr(self, "diagnostics_dialog", None) is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.refresh()
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
+    def toggle_ui_trace(self, checked):
+        if checked:
+            tracing.clear()
+            tracing.enable()
+            self.loop_monitor.start()
+            return
+        self.loop_monitor.stop()
+        tracing.disable()
+        default_name = f"ui_trace_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出界面跟踪", default_name, "Trace Files (*.json)")
+        if not file_path:
+            return
+        try:
+            count = tracing.export(file_path)
+            QMessageBox.information(self, "界面响应跟踪",
+                                    f"已导出 {count} 个事件，可在 chrome://tracing 或 ui.perfetto.dev 中打开:\n{file_path}")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+
     def reset_test_data(self):
         database.reset_test_data()
         self.current_order_number = ""
-        self.load_history()
-        self.plan_release.load_data()
+        if self.form is not None:
+            self.load_history()
+        if self.plan_release is not None:
+            self.plan_release.load_data()
         QMessageBox.information(self, "初始化", "已清除测试数据并重置计数器")
 
     # 打印功能已取消
 
     def refresh_units(self):
-        units = database.fetch_units()
+        if self.form is None:
+            return
+        units = get_reference_data().get("units")
         self.form.set_units(units)
 
     def refresh_months(self):
-        months = database.fetch_plan_months()
-        self.form.set_months(months)
+        months = get_reference_data().get("plan_months")
+        if self.form is not None:
+            self.form.set_months(months)
         self.workbench.set_months(months)
 
+    def on_reference_changed(self, kind):
+        # Emitted by ReferenceData only when the list really changed
+        if kind == "units":
+            self.refresh_units()
+        elif kind == "plan_months":
+            self.refresh_months()
+
     def open_settings(self):
-        dlg = SettingsDialog(database.fetch_units, database.add_unit, database.rename_unit)
+        dlg = SettingsDialog(database.fetch_units, database.add_unit, database.rename_unit,
+                             lambda o, n: database.rename_reference("units", o, n, dry_run=True))
         dlg.setWindowTitle("设置 - 需求单位")
         dlg.exec()
-        self.refresh_units()
 
     def open_purchaser_settings(self):
-        dlg = SettingsDialog(database.fetch_purchasers, database.add_purchaser, database.rename_purchaser)
+        dlg = SettingsDialog(database.fetch_purchasers, database.add_purchaser, database.rename_purchaser,
+                             lambda o, n: database.rename_reference("purchasers", o, n, dry_run=True))
         dlg.setWindowTitle("设置 - 采购员")
         dlg.exec()
         
     def open_status_settings(self):
-        dlg = SettingsDialog(database.fetch_purchase_statuses, database.add_purchase_status, database.rename_purchase_status)
+        dlg = SettingsDialog(database.fetch_purchase_statuses, database.add_purchase_status, database.rename_purchase_status,
+                             lambda o, n: database.rename_reference("purchase_statuses", o, n, dry_run=True),
+                             database.BUILTIN_REFERENCE_NAMES["purchase_statuses"])
         dlg.setWindowTitle("设置 - 采购状态")
         dlg.exec()
 
@@ -371,7 +609,6 @@ class MainWindow(QMainWindow):
         dlg = SettingsDialog(database.fetch_plan_months, database.add_plan_month, database.rename_plan_month)
         dlg.setWindowTitle("设置 - 计划月份")
         dlg.exec()
-        self.refresh_months()
 
     def show_context_menu(self, pos):
         item = self.form.table.itemAt(pos)
@@ -588,11 +825,32 @@ class MainWindow(QMainWindow):
                 break
 
 
+def _report_first_paint():
+    # First event-loop turn after show(): the window has been painted once
+    elapsed_ms = (time.perf_counter() - _STARTUP_T0) * 1000
+    print(f"[startup] first_paint_ms={elapsed_ms:.1f}", flush=True)
+    if os.environ.get("PPOMS_STARTUP_EXIT"):
+        QApplication.instance().quit()
+
+
 def main():
+    import db_profile
+    db_profile.enable_from_env()
+    trace_path = tracing.enable_from_env()
     database.init_db()
     app = QApplication(sys.argv)
+    if trace_path:
+        app.aboutToQuit.connect(lambda: tracing.export(trace_path))
+    from layout_store import get_layout_store
+    get_layout_store() # one read of all layout tables; flushed on quit
     w = MainWindow()
     w.showMaximized()
+    if not os.environ.get("PPOMS_NO_CHANGE_WATCH"):
+        w.start_change_watch()
+    if not os.environ.get("PPOMS_NO_PAGE_WARMUP"):
+        w.start_page_warmup()
+    if os.environ.get("PPOMS_STARTUP_REPORT"):
+        QTimer.singleShot(0, _report_first_paint)
     sys.exit(app.exec())
 
 
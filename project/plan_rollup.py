@@ -0,0 +1,98 @@
+"""
+月度计划多月汇总（季度 / 年度）
+
+load_rollup 用 database.fetch_plan_rollup 一次取回各月 (部门, 标的, 规格) 的计划与执行数，
+返回 pandas DataFrame；summarize / pivot_by_month 在内存中按维度聚合或透视，
+切换维度不再查库。执行数取自按月缓存的执行汇总（plan_exec_agg）。
+
+执行数按 (月份, 标的, 规格) 匹配、与部门无关：多个部门计划同一标的时，每个部门行
+都带着同一份执行数。按部门分组时各部门各自计入；不按部门分组或求总计时只计一次。
+"""
+import pandas as pd
+
+import database
+
+
+PERIODS = {
+    "全年": range(1, 13),
+    "第一季度": range(1, 4),
+    "第二季度": range(4, 7),
+    "第三季度": range(7, 10),
+    "第四季度": range(10, 13),
+}
+
+# 汇总维度 -> 分组列
+GROUPINGS = {
+    "部门+标的": ["department", "item_name", "spec_model", "unit"],
+    "标的": ["item_name", "spec_model", "unit"],
+    "部门": ["department"],
+}
+
+VALUE_FIELDS = ["plan_qty", "plan_budget", "exec_qty", "exec_amt"]
+EXEC_FIELDS = ["exec_qty", "exec_amt"]
+# Execution figures are unique per these columns, not per department
+EXEC_KEY = ["plan_month", "item_key", "spec_key"]
+
+COLUMN_TITLES = {
+    "plan_month": "计划月份",
+    "department": "需求部门",
+    "item_name": "标的名称",
+    "spec_model": "规格型号",
+    "unit": "单位",
+    "plan_qty": "计划数量",
+    "plan_budget": "计划预算(万)",
+    "exec_qty": "执行数量",
+    "exec_amt": "执行金额",
+    "progress": "执行进度(%)",
+}
+
+
+def period_months(year: str, period: str = "全年") -> list:
+    """year 为两位年份（如 "26"），返回该区间内的 YYMM 月份列表。"""
+    return [f"{year}{m:02d}" for m in PERIODS[period]]
+
+
+def load_rollup(months) -> pd.DataFrame:
+    """各月份 (部门, 标的, 规格) 一行的计划/执行明细，列见 database.PLAN_ROLLUP_FIELDS。"""
+    df = pd.DataFrame(database.fetch_plan_rollup(months), columns=database.PLAN_ROLLUP_FIELDS)
+    for col in ("department", "item_name", "spec_model", "unit", "item_key", "spec_key"):
+        df[col] = df[col].fillna("")
+    for col in VALUE_FIELDS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+    return df
+
+
+def _across_departments(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    供不按部门分组的汇总使用：同一 (月份, 标的, 规格) 的执行数只留在第一行，
+    并让同一规范化键的各行使用相同的名称/规格/单位，保证落在同一分组。
+    """
+    out = df.copy()
+    out.loc[out.duplicated(EXEC_KEY), EXEC_FIELDS] = 0.0
+    labels = ["item_name", "spec_model", "unit"]
+    out[labels] = out.groupby(["item_key", "spec_key"])[labels].transform("first")
+    return out
+
+
+def summarize(df: pd.DataFrame, grouping: str = "部门+标的") -> pd.DataFrame:
+    """按 GROUPINGS[grouping] 汇总各数值列，并按执行数量/计划数量计算执行进度。"""
+    keys = GROUPINGS[grouping]
+    if "department" not in keys:
+        df = _across_departments(df)
+    out = df.groupby(keys, sort=True, as_index=False)[VALUE_FIELDS].sum()
+    plan = out["plan_qty"].where(out["plan_qty"] > 0)
+    out["progress"] = (out["exec_qty"] / plan * 100).round(1).fillna(0.0)
+    return out
+
+
+def pivot_by_month(df: pd.DataFrame, value: str = "exec_qty", grouping: str = "标的") -> pd.DataFrame:
+    """行为 GROUPINGS[grouping]，列为计划月份的透视表。"""
+    if "department" not in GROUPINGS[grouping]:
+        df = _across_departments(df)
+    return df.pivot_table(index=GROUPINGS[grouping], columns="plan_month", values=value,
+                          aggfunc="sum", fill_value=0)
+
+
+def totals(df: pd.DataFrame) -> dict:
+    """全部行的各数值列合计，执行数跨部门只计一次。"""
+    return {col: float(v) for col, v in _across_departments(df)[VALUE_FIELDS].sum().items()}
@@ -81,7 +81,8 @@ class OrderPrinter:
     def __init__(self, header_info: dict, columns: list, rows: list, config: dict = None):
         self.header_info = header_info
         self.columns = columns
-        self.rows = rows
+        # Pagination needs len() and indexing, so materialize generators once
+        self.rows = list(rows)
         
         # Default config
         self.config = {
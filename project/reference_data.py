@@ -0,0 +1,63 @@
+from PySide6.QtCore import QObject, Signal
+import database
+
+
+# kind -> name of the database fetch function (looked up at load time)
+REFERENCE_KINDS = {
+    "units": "fetch_units",
+    "purchasers": "fetch_purchasers",
+    "purchase_statuses": "fetch_purchase_statuses",
+    "plan_months": "fetch_plan_months",
+}
+
+
+class ReferenceData(QObject):
+    """
+    基础数据（需求单位、采购员、采购状态、计划月份）的进程内缓存。
+
+    首次读取时加载；database 的 add_*/rename_* 成功后触发重新加载，
+    仅当内容确实变化时递增版本号并发出 changed(kind)。
+    """
+    changed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._data = {}
+        self._versions = {kind: 0 for kind in REFERENCE_KINDS}
+        database.add_reference_listener(self.invalidate)
+
+    def _load(self, kind: str) -> tuple:
+        return tuple(getattr(database, REFERENCE_KINDS[kind])())
+
+    def get(self, kind: str) -> list:
+        if kind not in self._data:
+            self._data[kind] = self._load(kind)
+        return list(self._data[kind])
+
+    def version(self, kind: str) -> int:
+        return self._versions[kind]
+
+    def invalidate(self, kind: str):
+        # Nothing cached yet means nothing on screen depends on it
+        if kind not in REFERENCE_KINDS or kind not in self._data:
+            return
+        old = self._data[kind]
+        new = self._load(kind)
+        self._data[kind] = new
+        if old != new:
+            self._versions[kind] += 1
+            self.changed.emit(kind)
+
+    def invalidate_all(self):
+        for kind in REFERENCE_KINDS:
+            self.invalidate(kind)
+
+
+_instance = None
+
+
+def get_reference_data() -> ReferenceData:
+    global _instance
+    if _instance is None:
+        _instance = ReferenceData()
+    return _instance
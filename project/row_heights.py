@@ -0,0 +1,190 @@
+import time
+
+from PySide6.QtCore import QObject, QRect, QTimer, Qt
+from PySide6.QtWidgets import QHeaderView
+
+
+# Offscreen rows are measured once column dragging/editing has been idle this long
+IDLE_MS = 150
+CHUNK_ROWS = 200
+MAX_ENTRIES = 20000
+# Matches the default item delegate's text margins
+CELL_H_MARGIN = 3
+CELL_V_MARGIN = 4
+_WRAP_FLAGS = int(Qt.TextWordWrap | Qt.AlignLeft | Qt.AlignTop)
+
+
+class RowHeightCache(QObject):
+    """
+    代替 QHeaderView.ResizeToContents 的自动换行行高。
+
+    行高按 (行内容 hash, 有内容列的列宽) 缓存；单元格编辑、插入/删除行、
+    拖动列宽只把相关行标记为脏。下一轮事件循环先量可见行，其余行在空闲
+    IDLE_MS 后分批（每批 CHUNK_ROWS 行）计算，拖动列宽时不会逐行重排整张表。
+    带 cellWidget 的列（下拉框）不参与测量。
+    """
+
+    def __init__(self, table, idle_ms: int = IDLE_MS, chunk_rows: int = CHUNK_ROWS):
+        super().__init__(table)
+        self.table = table
+        self.idle_ms = idle_ms
+        self.chunk_rows = chunk_rows
+        self._heights = {}
+        self._dirty = set()
+        self._all_dirty = False
+        self._touched = 0.0
+
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+
+        self._visible_timer = QTimer(self)
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.timeout.connect(self._flush_visible)
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(self._flush_chunk)
+
+        # (signal, slot) pairs, kept so detach() does not have to reach through a table being destroyed
+        model = table.model()
+        self._connections = [
+            (model.dataChanged, self._on_data_changed),
+            (model.rowsInserted, self._on_rows_changed),
+            (model.rowsRemoved, self._on_rows_changed),
+            (model.modelReset, self.invalidate_all),
+            (table.horizontalHeader().sectionResized, self._on_section_resized),
+            (table.verticalScrollBar().valueChanged, self._on_scrolled),
+            # The model and header outlive the table's destroyed() and still emit while it tears down
+            (table.destroyed, self.detach),
+        ]
+        for signal, slot in self._connections:
+            signal.connect(slot)
+
+    def detach(self, *_):
+        """断开与表格的所有连接并停止计时器；表格销毁时自动调用，可重复调用。"""
+        self._visible_timer.stop()
+        self._idle_timer.stop()
+        connections, self._connections = self._connections, []
+        for signal, slot in connections:
+            signal.disconnect(slot)
+
+    def _on_data_changed(self, top_left, bottom_right):
+        self.invalidate_rows(top_left.row(), bottom_right.row())
+
+    def _on_rows_changed(self, _parent, _first, _last):
+        self.invalidate_all()
+
+    def _on_section_resized(self, _index, _old, _new):
+        self.invalidate_all()
+
+    def _on_scrolled(self, _value):
+        if not self._visible_timer.isActive():
+            self._visible_timer.start(0)
+
+    def invalidate_rows(self, first: int, last: int):
+        if not self._all_dirty:
+            self._dirty.update(range(first, last + 1))
+        self._schedule()
+
+    def invalidate_all(self):
+        # Existing rows keep their cached heights; only keys that changed are re-measured
+        self._all_dirty = True
+        self._dirty.clear()
+        self._schedule()
+
+    def refresh_now(self):
+        """立即计算所有脏行（测试与需要同步结果的调用方使用）。"""
+        self._visible_timer.stop()
+        self._idle_timer.stop()
+        self._apply(self._take_dirty(None))
+
+    def cached_count(self) -> int:
+        return len(self._heights)
+
+    def _schedule(self):
+        # Timers are armed once per burst rather than restarted on every signal;
+        # the idle timer checks _touched when it fires and re-arms for the remainder
+        self._touched = time.monotonic()
+        if not self._visible_timer.isActive():
+            self._visible_timer.start(0)
+        if not self._idle_timer.isActive():
+            self._idle_timer.start(self.idle_ms)
+
+    def _visible_range(self):
+        count = self.table.rowCount()
+        if count == 0:
+            return range(0)
+        top = self.table.rowAt(0)
+        bottom = self.table.rowAt(self.table.viewport().height() - 1)
+        top = 0 if top < 0 else top
+        bottom = count - 1 if bottom < 0 else bottom
+        return range(top, bottom + 1)
+
+    def _take_dirty(self, limit, prefer=()):
+        if self._all_dirty:
+            self._dirty = set(range(self.table.rowCount()))
+            self._all_dirty = False
+        count = self.table.rowCount()
+        self._dirty = {r for r in self._dirty if r < count}
+        rows = [r for r in prefer if r in self._dirty]
+        if limit is None:
+            rows = list(self._dirty)
+        elif len(rows) < limit:
+            taken = set(rows)
+            for r in sorted(self._dirty):
+                if len(rows) >= limit:
+                    break
+                if r not in taken:
+                    rows.append(r)
+        self._dirty.difference_update(rows)
+        return rows
+
+    def _flush_visible(self):
+        visible = self._visible_range()
+        self._apply(self._take_dirty(len(visible), prefer=visible))
+
+    def _flush_chunk(self):
+        wait = self.idle_ms - int((time.monotonic() - self._touched) * 1000)
+        if wait > 0:
+            self._idle_timer.start(wait)
+            return
+        self._apply(self._take_dirty(self.chunk_rows, prefer=self._visible_range()))
+        if self._dirty or self._all_dirty:
+            self._idle_timer.start(0)
+
+    def _apply(self, rows):
+        if not rows:
+            return
+        header = self.table.verticalHeader()
+        widths = [self.table.columnWidth(c) for c in range(self.table.columnCount())]
+        for r in rows:
+            h = self.height_for_row(r, widths)
+            if header.sectionSize(r) != h:
+                header.resizeSection(r, h)
+
+    def height_for_row(self, r: int, widths=None) -> int:
+        if widths is None:
+            widths = [self.table.columnWidth(c) for c in range(self.table.columnCount())]
+        texts = []
+        for c, w in enumerate(widths):
+            if self.table.cellWidget(r, c) is not None:
+                continue
+            it = self.table.item(r, c)
+            text = it.text() if it is not None else ""
+            if text:
+                texts.append((c, w, text))
+        key = (hash(tuple(t for _, _, t in texts)), tuple((c, w) for c, w, _ in texts))
+        h = self._heights.get(key)
+        if h is None:
+            h = self._measure(texts)
+            if len(self._heights) >= MAX_ENTRIES:
+                self._heights.clear()
+            self._heights[key] = h
+        return h
+
+    def _measure(self, texts) -> int:
+        header = self.table.verticalHeader()
+        fm = self.table.fontMetrics()
+        h = header.defaultSectionSize()
+        for _, w, text in texts:
+            rect = fm.boundingRect(QRect(0, 0, max(w - 2 * CELL_H_MARGIN, 1), 1 << 20), _WRAP_FLAGS, text)
+            h = max(h, rect.height() + 2 * CELL_V_MARGIN)
+        return min(h, header.maximumSectionSize())
@@ -0,0 +1,33 @@
+import os
+import tempfile
+import unittest
+
+import database
+
+# row_data columns of save_order_details_transaction, in order
+DETAIL_FIELDS = (
+    "item_name", "purchase_item", "spec_model", "purchase_cycle", "stock_count", "purchase_qty", "unit",
+    "unit_price", "budget_wan", "purchase_method", "purchase_channel", "plan_time", "demand_unit", "plan_release",
+    "progress_req", "supplier", "inquiry_price", "tax_rate", "actual_status", "purchase_body", "add_adjust", "remark",
+)
+
+
+def detail_row(**fields) -> list:
+    """detail_row(purchase_item="螺栓", plan_release="张三")；未给出的列为空串。"""
+    unknown = set(fields) - set(DETAIL_FIELDS)
+    if unknown:
+        raise KeyError(f"unknown detail fields: {sorted(unknown)}")
+    return [fields.get(name, "") for name in DETAIL_FIELDS]
+
+
+class TempDatabaseTestCase(unittest.TestCase):
+    """每个用例使用 tmp_dir 下新建并初始化的 purchase.db，结束后恢复 database.DB_PATH。"""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = tmp.name
+        self.addCleanup(setattr, database, "DB_PATH", database.DB_PATH)
+        database.DB_PATH = os.path.join(self.tmp_dir, "purchase.db")
+        database.init_db()
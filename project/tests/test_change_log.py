@@ -0,0 +1,115 @@
+import sqlite3
+import unittest
+from unittest import mock
+
+from PySide6.QtWidgets import QApplication
+
+import database
+from db_case import TempDatabaseTestCase, detail_row
+from change_watch import ChangeWatcher
+
+
+class TestChangeLog(TempDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        super().setUp()
+        self.number = database.next_main_number("2601", "MP")
+        database.save_order(self.number, "2601", "MP", "生产部", "2026-01-01", "民品")
+        database.save_order_details_transaction(self.number, [
+            ("2601MP-1", detail_row(purchase_item="螺栓", plan_release="张三")),
+        ])
+
+    def test_triggers_record_keys_by_table(self):
+        changes = database.fetch_changes_since(0)
+        self.assertFalse(changes["truncated"])
+        self.assertEqual(changes["tables"]["orders"], {self.number})
+        self.assertEqual(changes["tables"]["order_details"], {self.number})
+        self.assertEqual(changes["tables"]["release_orders"], {self.number})
+
+        position = changes["last_id"]
+        self.assertEqual(database.fetch_changes_since(position)["tables"], {})
+        res = database.update_order_info(self.number, "民品", "采购部", "MPJ", "2602")
+        self.assertTrue(res["success"], res["msg"])
+        tables = database.fetch_changes_since(position)["tables"]
+        # A renumbered order touches both the old and the new key
+        self.assertEqual(tables["orders"], {self.number, res["new_number"]})
+
+    def test_connect_skips_schema_setup_once_checked(self):
+        with mock.patch.object(database, "_migrate_schema") as migrate:
+            database._connect().close()
+            migrate.assert_not_called()
+            database.forget_schema_check()
+            database._connect().close()
+            database._connect().close()
+            migrate.assert_called_once()
+
+    def test_pruned_log_reports_truncation(self):
+        position = database.change_log_position()
+        database.add_unit("测试一部")
+        database.add_unit("测试二部")
+        self.assertEqual(database.prune_change_log(keep=1), position + 1)
+        self.assertTrue(database.fetch_changes_since(position)["truncated"])
+        changes = database.fetch_changes_since(position + 1)
+        self.assertFalse(changes["truncated"])
+        self.assertEqual(changes["tables"], {"units": {"测试二部"}})
+
+    def test_watcher_emits_only_after_commits_from_other_connections(self):
+        watcher = ChangeWatcher()
+        received = []
+        watcher.changed.connect(received.append)
+        self.assertFalse(watcher.poll())  # first poll opens the connection and takes the current position
+        self.assertFalse(watcher.poll())
+
+        database.update_release_status(self.number, "张三", "已发放")
+        self.assertTrue(watcher.poll())
+        self.assertEqual(received[-1]["tables"], {"release_orders": {self.number}})
+        self.assertFalse(watcher.poll())
+        watcher.close()
+
+    def test_batched_order_reads_match_per_order_helpers(self):
+        other = database.next_main_number("2601", "MP")
+        database.save_order(other, "2601", "MP", "采购部", "2026-01-02", "民品")
+        numbers = [self.number, other, "CG-无此单"]
+
+        rows = database.fetch_orders_by_numbers(numbers)
+        self.assertEqual(set(rows), {self.number, other})
+        self.assertEqual(rows[other], database.fetch_orders(other)[0])
+        # Exact match: a number that merely contains another is not returned
+        self.assertEqual(database.fetch_orders_by_numbers([self.number[:-1]]), {})
+        self.assertEqual(set(database.fetch_orders_by_numbers(numbers, unit_filter="采购")), {other})
+
+        stats = database.fetch_order_stats(numbers)
+        for number in numbers:
+            self.assertEqual(stats[number], (database.count_details(number), database.get_order_inquiry_total(number),
+                                             database.get_order_processing_status(number)))
+
+        releases = database.fetch_release_orders_by_numbers(numbers)
+        self.assertEqual(releases, {self.number: database.fetch_release_orders(self.number)})
+
+    def test_release_list_patches_changed_rows_in_place(self):
+        from ui_plan_release import PlanReleaseForm
+        w = PlanReleaseForm(None)
+        w.load_data()
+        self.assertEqual(w.table.rowCount(), 1)
+        status = w.table.item(0, 7)
+
+        database.update_release_status(self.number, "张三", "已发放")
+        w.refresh_orders({self.number})
+        self.assertIs(w.table.item(0, 7), status)
+        self.assertEqual(status.text(), "已发放")
+
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute(
+            "INSERT INTO release_orders(source_order_number, purchaser, release_date, status, record_count) "
+            "VALUES(?, '李四', '2026-01-01', '未发放', 1)", (self.number,))
+        conn.commit()
+        conn.close()
+        w.refresh_orders({self.number})
+        self.assertEqual(w.table.rowCount(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
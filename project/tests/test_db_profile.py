@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import unittest
+
+import database
+from db_case import TempDatabaseTestCase, detail_row
+import db_profile
+
+
+class TestDbProfile(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.log_path = os.path.join(self.tmp_dir, "slow.log")
+        db_profile.reset()
+
+    def tearDown(self):
+        db_profile.disable()
+        db_profile.reset()
+
+    def _by_name(self, kind):
+        return {r["name"]: r for r in db_profile.stats(kind)}
+
+    def test_records_functions_connections_and_statements(self):
+        original = database.fetch_order_details
+        db_profile.enable(slow_ms=1e9, log_path=self.log_path)
+        number = database.next_main_number("2601", "MP")
+        database.save_order(number, "2601", "MP", "生产部", "2026-01-01", "民品")
+        database.save_order_details_transaction(number, [("2601MP-1", detail_row()), ("2601MP-2", detail_row())])
+        for _ in range(3):
+            rows = database.fetch_order_details(number)
+        self.assertEqual(len(rows), 2)
+
+        funcs = self._by_name("func")
+        self.assertEqual(funcs["fetch_order_details"]["count"], 3)
+        self.assertEqual(funcs["fetch_order_details"]["avg_rows"], 2)
+        # next_main_number delegates to reserve_main_numbers; both are recorded
+        self.assertIn("reserve_main_numbers", funcs)
+        self.assertEqual(self._by_name("connect")["fetch_order_details"]["count"], 3)
+
+        fetch_sql = [r for r in db_profile.stats("sql")
+                     if r["name"].startswith("SELECT detail_no, item_name") and "fetch_order_details" in r["callers"]]
+        self.assertEqual(len(fetch_sql), 1)
+        self.assertEqual((fetch_sql[0]["count"], fetch_sql[0]["avg_rows"]), (3, 2))
+        self.assertLessEqual(fetch_sql[0]["p50_ms"], fetch_sql[0]["max_ms"])
+        self.assertFalse(os.path.exists(self.log_path))
+
+        db_profile.disable()
+        self.assertIs(database.fetch_order_details, original)
+        self.assertIs(type(database._connect()), sqlite3.Connection)
+
+    def test_slow_statements_are_logged_with_plan(self):
+        db_profile.enable(slow_ms=0, log_path=self.log_path)
+        number = database.next_main_number("2601", "MP")
+        database.fetch_order_details(number)
+        with open(self.log_path, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn("fetch_order_details", text)
+        self.assertIn("SEARCH order_details USING INDEX idx_order_details_order_number", text)
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(db_profile.percentile(samples, 50), 50)
+        self.assertEqual(db_profile.percentile(samples, 95), 95)
+        self.assertEqual(db_profile.percentile(samples, 100), 100)
+        self.assertEqual(db_profile.percentile([], 95), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
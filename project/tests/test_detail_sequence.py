@@ -0,0 +1,91 @@
+import unittest
+
+from PySide6.QtWidgets import QApplication, QTableWidgetItem
+
+import database
+from db_case import TempDatabaseTestCase, detail_row
+from detail_sequence import DetailSequenceAllocator
+
+
+class TestDetailSequence(TempDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        super().setUp()
+        database.save_order("CG-2601MP0001", "2601", "MP", "生产部", "2026-01-01", "民品")
+        database.save_order("CG-2601MP0002", "2601", "MP", "生产部", "2026-01-02", "民品")
+        self._save("CG-2601MP0001", ["2601MP-2", "2601MP-10", "2601MP-x", "2601MPB-99"])
+
+    def _save(self, order_number, nos):
+        return database.save_order_details_transaction(order_number, [(n, detail_row()) for n in nos])
+
+    def test_max_seq_ignores_other_prefixes_and_non_numeric(self):
+        self.assertEqual(database.max_detail_seq("2601", "MP"), 10)
+        self.assertEqual(database.next_detail_number("2601", "MP"), "2601MP-11")
+        self.assertEqual(database.next_detail_number("2601", "MPB"), "2601MPB-100")
+        self.assertEqual(database.next_detail_number("2602", "MP"), "2602MP-1")
+
+    def test_allocator_hands_out_release_and_rewind(self):
+        seq = DetailSequenceAllocator("2601", "MP")
+        self.assertEqual([seq.next(), seq.next()], ["2601MP-11", "2601MP-12"])
+        seq.release("2601MP-12")
+        self.assertEqual(seq.next(), "2601MP-12")
+        mark = seq.last
+        seq.next()
+        seq.rewind(mark)
+        seq.observe("2601MP-40")
+        self.assertEqual(seq.next(), "2601MP-41")
+
+    def test_save_rejects_numbers_held_by_another_order(self):
+        self.assertEqual(self._save("CG-2601MP0002", ["2601MP-10", "2601MP-11"]), ["2601MP-10"])
+        self.assertEqual(database.count_details("CG-2601MP0002"), 0)
+        # Re-saving the owning order is not a conflict
+        self.assertEqual(self._save("CG-2601MP0001", ["2601MP-2", "2601MP-10"]), [])
+
+    def test_widget_renumbers_conflicting_rows_on_save(self):
+        from unittest import mock
+        from ui_detail import DetailWidget
+        w = DetailWidget("2601", "MP", "CG-2601MP0002", database.next_detail_number)
+        w.add_row()
+        w.add_row()
+        self.assertEqual([w.table.item(r, 0).text() for r in range(2)], ["2601MP-12", "2601MP-11"])
+        for r in range(2):
+            w.table.setItem(r, 1, QTableWidgetItem(f"物料{r}"))
+        # Another client saves 2601MP-11 first
+        self._save("CG-2601MP0001", ["2601MP-2", "2601MP-10", "2601MP-11"])
+        with mock.patch("ui_detail.QMessageBox.information") as info:
+            self.assertTrue(w._save_data())
+        self.assertTrue(info.called)
+        saved = sorted(r[0] for r in database.fetch_order_details("CG-2601MP0002"))
+        self.assertEqual(saved, ["2601MP-12", "2601MP-13"])
+
+    def test_widget_resolves_a_second_conflict_to_the_final_number(self):
+        from unittest import mock
+        from ui_detail import DetailWidget
+        w = DetailWidget("2601", "MP", "CG-2601MP0002", database.next_detail_number)
+        w.add_row()
+        w.table.setItem(0, 1, QTableWidgetItem("物料"))
+        real_save = database.save_order_details_transaction
+        stolen = ["2601MP-2", "2601MP-10"]
+
+        def racing_save(order_number, rows):
+            # The first two attempts lose the row's current number to another client
+            if len(stolen) < 4:
+                stolen.append(rows[0][0])
+                real_save("CG-2601MP0001", [(n, detail_row()) for n in stolen])
+            return real_save(order_number, rows)
+
+        with mock.patch("database.save_order_details_transaction", side_effect=racing_save), \
+                mock.patch("ui_detail.QMessageBox.information") as info:
+            self.assertTrue(w._save_data())
+        saved = [r[0] for r in database.fetch_order_details("CG-2601MP0002")]
+        self.assertEqual(len(saved), 1)
+        self.assertNotIn(saved[0], stolen)
+        self.assertEqual(w.table.item(0, 0).text(), saved[0])
+        self.assertIn(f"2601MP-11 → {saved[0]}", info.call_args[0][2])
+
+
+if __name__ == "__main__":
+    unittest.main()
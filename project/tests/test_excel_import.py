@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+import database
+import excel_import
+
+
+class TestExcelImport(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "plans.xlsx")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_read_sheet_selects_and_fills_columns(self):
+        pd.DataFrame({" 标的名称 ": ["钢管"], "计划数量": [3], "无关列": ["x"]}).to_excel(self.path, index=False)
+        df = excel_import.read_sheet(self.path, excel_import.MONTHLY_PLAN_COLUMNS, required=["标的名称"])
+        self.assertEqual(list(df.columns), list(excel_import.MONTHLY_PLAN_COLUMNS.values()))
+        self.assertEqual(df.loc[0, "item_name"], "钢管")
+        self.assertEqual(df.loc[0, "plan_qty"], "3")
+        self.assertEqual(df.loc[0, "remarks"], "")
+
+    def test_read_sheet_missing_required(self):
+        pd.DataFrame({"规格型号": ["A"]}).to_excel(self.path, index=False)
+        with self.assertRaises(ValueError):
+            excel_import.read_sheet(self.path, excel_import.MONTHLY_PLAN_COLUMNS, required=["标的名称"])
+
+    def test_prepare_monthly_plans_reports_errors(self):
+        df = pd.DataFrame({
+            "item_name": ["钢管", "", "阀门", " 法兰 "],
+            "spec_model": ["DN50", None, "nan", ""],
+            "unit": ["根", "", "个", "片"],
+            "plan_qty": ["1,200", "x", "abc", ""],
+            "plan_budget": ["0.5", "", "1", "2"],
+            "department": ["", "", "", ""],
+            "remarks": [None, "", "", ""],
+        })
+        rows, errors = excel_import.prepare_monthly_plans(df, "2601")
+        self.assertEqual(rows, [
+            ("2601", "钢管", "DN50", "根", 1200.0, 0.5, "", ""),
+            ("2601", "法兰", "", "片", 0.0, 2.0, "", ""),
+        ])
+        # Row without a name is skipped silently; the bad quantity is reported on Excel row 4
+        self.assertEqual(errors.to_dict("records"), [{"行号": 4, "列": "计划数量", "值": "abc", "错误": "不是有效数字"}])
+
+    def test_prepare_recommendations_defaults_weight(self):
+        df = pd.DataFrame({
+            "item_name": ["钢管", "阀门"],
+            "plan_release": ["张三", None],
+            "weight": [None, "高"],
+            "purchase_method": ["", ""],
+            "purchase_channel": ["", ""],
+        })
+        records, errors = excel_import.prepare_recommendations(df)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["weight"], "0")
+        self.assertEqual(errors["行号"].tolist(), [3])
+
+    def test_iter_sheet_batches_keeps_row_numbers(self):
+        pd.DataFrame({
+            "标的名称": ["a", None, "c", "d", "e"],
+            "计划数量": [1, None, 3, 4, 5],
+        }).to_excel(self.path, index=False)
+        seen = []
+        batches = list(excel_import.iter_sheet_batches(
+            self.path, excel_import.MONTHLY_PLAN_COLUMNS, batch_size=2,
+            on_progress=lambda done, total: seen.append((done, total)),
+        ))
+        df = pd.concat(batches)
+        # The blank second row is skipped but keeps its number
+        self.assertEqual(df.index.tolist(), [0, 2, 3, 4])
+        self.assertEqual(df["item_name"].tolist(), ["a", "c", "d", "e"])
+        self.assertEqual(df["plan_qty"].tolist(), ["1", "3", "4", "5"])
+        self.assertEqual(df["remarks"].tolist(), [""] * 4)
+        self.assertEqual(seen[-1], (5, 5))
+
+    def test_iter_sheet_batches_missing_required(self):
+        pd.DataFrame({"规格型号": ["A"]}).to_excel(self.path, index=False)
+        with self.assertRaises(excel_import.MissingColumnsError) as ctx:
+            list(excel_import.iter_sheet_batches(self.path, excel_import.DETAIL_COLUMNS, required=excel_import.DETAIL_REQUIRED))
+        self.assertIn("采购标的", ctx.exception.missing)
+
+    def test_cancel_rolls_back_streamed_import(self):
+        old_path = database.DB_PATH
+        database.DB_PATH = os.path.join(self._tmp.name, "purchase.db")
+        try:
+            database.init_db()
+            pd.DataFrame({"标的名称": [f"物料{i}" for i in range(10)]}).to_excel(self.path, index=False)
+            calls = []
+
+            def on_progress(done, total):
+                calls.append(done)
+                return len(calls) < 2
+
+            def batches():
+                for df in excel_import.iter_sheet_batches(self.path, excel_import.MONTHLY_PLAN_COLUMNS,
+                                                          batch_size=4, on_progress=on_progress):
+                    yield excel_import.prepare_monthly_plans(df, "2601")[0]
+
+            with self.assertRaises(excel_import.ImportCancelled):
+                database.import_monthly_plans_batches(batches())
+            self.assertEqual(database.fetch_monthly_plans_with_stats("2601"), [])
+
+            inserted = database.import_monthly_plans_batches(
+                excel_import.prepare_monthly_plans(df, "2601")[0]
+                for df in excel_import.iter_sheet_batches(self.path, excel_import.MONTHLY_PLAN_COLUMNS, batch_size=4)
+            )
+            self.assertEqual(inserted, 10)
+        finally:
+            database.DB_PATH = old_path
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import sqlite3
+import unittest
+
+import database
+from db_case import TempDatabaseTestCase
+import export_source
+
+
+class TestExportSource(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        database.save_order("CG-2601MP0001", "2601", "MP", "生产部", "2026-01-01", "民品")
+        database.save_order("CG-2601MPB0001", "2601", "MPB", "采购部", "2026-01-01", "半成品")
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.executemany(
+            "INSERT INTO order_details(order_number, detail_no, purchase_item, plan_release) VALUES(?,?,?,?)",
+            [
+                ("CG-2601MP0001", "2601MP-10", "螺栓", "张三"),
+                ("CG-2601MP0001", "2601MP-2", "螺母", "张三"),
+                ("CG-2601MP0001", "2601MP-x", "垫片", "李四"),
+                ("CG-2601MPB0001", "2601MPB-1", "钢板", "张三"),
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+    def test_monthly_order_matches_category_then_sequence(self):
+        nos = [r[5] for r in database.iter_monthly_details_for_export("2601")]
+        self.assertEqual(nos, ["2601MPB-1", "2601MP-2", "2601MP-10", "2601MP-x"])
+
+    def test_plan_export_rows_follow_filter(self):
+        spec = {"month": "2601", "seq": "1-5", "unit": "全部"}
+        rows = list(export_source.iter_plan_export_rows(spec))
+        self.assertEqual([r[0] for r in rows], ["2601MPB-1", "2601MP-2"])
+        self.assertEqual(len(rows[0]), len(export_source.PLAN_EXPORT_COLUMNS))
+
+        rows = list(export_source.iter_plan_export_rows({"month": "2601", "units": {"生产部"}, "item": "螺"}))
+        self.assertEqual([r[3] for r in rows], ["螺母", "螺栓"])
+
+    def test_release_rows_sorted_and_stringified(self):
+        rows = list(export_source.iter_release_rows("CG-2601MP0001", "张三"))
+        self.assertEqual([r[0] for r in rows], ["2601MP-2", "2601MP-10"])
+        self.assertEqual(rows[0][3], "")
+        self.assertEqual(len(rows[0]), len(export_source.RELEASE_COLUMNS))
+
+
+if __name__ == "__main__":
+    unittest.main()
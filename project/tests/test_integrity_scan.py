@@ -0,0 +1,91 @@
+import io
+import sqlite3
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import database
+from db_case import TempDatabaseTestCase, detail_row
+import integrity
+
+
+class TestIntegrityScan(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.a = database.next_main_number("2601", "MP")
+        self.b = database.next_main_number("2601", "MP")
+        for number in (self.a, self.b):
+            database.save_order(number, "2601", "MP", "生产部", "2026-01-01", "民品")
+
+    def test_clean_database(self):
+        # Numbering is shared across orders of the same month/category, so 1-2 and 3 are contiguous
+        database.save_order_details_transaction(self.a, [("2601MP-1", detail_row()), ("2601MP-2", detail_row())])
+        database.save_order_details_transaction(self.b, [("2601MP-3", detail_row(purchase_item="螺栓", plan_release="张三"))])
+        database.update_release_status(self.b, "张三", "已发放")
+        report = database.scan_integrity()
+        self.assertEqual(integrity.issue_count(report), 0, integrity.format_report(report))
+
+    def test_reports_every_issue_kind(self):
+        database.save_order_details_transaction(self.a, [
+            ("2601MP-1", detail_row(purchase_item="螺栓", plan_release="张三")),
+            ("2601MP-4", detail_row(purchase_item="螺母", plan_release="张三")),
+            ("手工-3", detail_row()),
+        ])
+        database.save_order_details_transaction(self.b, [("2601MP-6", detail_row())])
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            # Bypass the save-time conflict check to plant a cross-order duplicate and an orphan
+            conn.execute("INSERT INTO order_details(order_number, detail_no) VALUES(?, '2601MP-4')", (self.b,))
+            conn.execute("INSERT INTO order_details(order_number, detail_no) VALUES('CG-2601MP9999', '2601MP-9')")
+            conn.execute("UPDATE release_orders SET record_count=5 WHERE source_order_number=?", (self.a,))
+            conn.execute("INSERT INTO release_orders(source_order_number, purchaser, record_count) VALUES(?, '李四', 1)",
+                         (self.b,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        report = database.scan_integrity()
+        [(detail_no, count, orders)] = report["duplicates"]
+        self.assertEqual((detail_no, count), ("2601MP-4", 2))
+        self.assertEqual(set(orders.split(",")), {self.a, self.b})
+        self.assertEqual(report["gaps"], [("2601MP-", 2, 3), ("2601MP-", 5, 5)])
+        self.assertEqual([(r[1], r[2]) for r in report["malformed"]], [(self.a, "手工-3")])
+        self.assertEqual(report["orphan_details"], [("CG-2601MP9999", 1)])
+        self.assertEqual([(r[1], r[2]) for r in report["orphan_releases"]], [(self.b, "李四")])
+        self.assertEqual(report["count_mismatches"], [(self.a, "张三", 5, 2)])
+
+        text = integrity.format_report(report, limit=None)
+        self.assertIn("2601MP-2 ~ 2601MP-3", text)
+        self.assertIn("2601MP-5", text)
+
+    def test_details_are_read_once_while_a_writer_holds_the_lock(self):
+        database.save_order_details_transaction(self.a, [("2601MP-1", detail_row())])
+        statements = []
+        connect = database._connect
+
+        def traced_connect():
+            conn = connect()
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        writer = sqlite3.connect(database.DB_PATH)
+        try:
+            writer.execute("BEGIN IMMEDIATE")
+            with mock.patch.object(database, "_connect", traced_connect):
+                report = database.scan_integrity()
+        finally:
+            writer.rollback()
+            writer.close()
+        self.assertEqual(integrity.issue_count(report), 0)
+        self.assertEqual(sum("FROM order_details" in sql for sql in statements), 1)
+
+    def test_cli_exit_code(self):
+        database.save_order_details_transaction(self.a, [("2601MP-2", detail_row())])
+        with redirect_stdout(io.StringIO()) as out:
+            code = integrity.main(["--db", database.DB_PATH])
+        self.assertEqual(code, 1)
+        self.assertIn("明细序号缺号", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+import database
+from db_case import TempDatabaseTestCase
+from layout_store import LayoutStore
+
+
+class TestLayoutStore(TempDatabaseTestCase):
+    def test_loads_existing_widths(self):
+        database.set_detail_column_width(2, 180)
+        database.set_layout_version("detail", "v1")
+        store = LayoutStore()
+        self.assertEqual(store.get_widths("detail"), {2: 180})
+        self.assertEqual(store.get_version("detail"), "v1")
+        self.assertEqual(store.get_widths("main"), {})
+
+    def test_batches_until_flush(self):
+        store = LayoutStore()
+        store.set_width("main", 0, 120)
+        store.set_width("main", 0, 140)
+        store.set_width("plan_release", 3, 90)
+        store.set_version("main", "v1")
+        self.assertTrue(store.is_dirty())
+        self.assertEqual(database.get_main_column_widths(), {})
+
+        store.flush()
+        self.assertFalse(store.is_dirty())
+        self.assertEqual(database.get_main_column_widths(), {0: 140})
+        self.assertEqual(database.get_plan_release_column_widths(), {3: 90})
+        self.assertEqual(database.get_layout_version("main"), "v1")
+
+    def test_unchanged_width_is_not_dirty(self):
+        database.set_main_column_width(1, 200)
+        store = LayoutStore()
+        store.set_width("main", 1, 200)
+        self.assertFalse(store.is_dirty())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import threading
+import unittest
+
+import database
+from db_case import TempDatabaseTestCase
+
+
+class TestMainNumber(TempDatabaseTestCase):
+    def test_block_reservation_is_contiguous(self):
+        self.assertEqual(database.next_main_number("2601", "MP"), "CG-2601MP0001")
+        self.assertEqual(database.reserve_main_numbers("2601", "MP", 3),
+                         ["CG-2601MP0002", "CG-2601MP0003", "CG-2601MP0004"])
+        self.assertEqual(database.next_main_number("2601", "MP"), "CG-2601MP0005")
+        self.assertEqual(database.next_main_number("2601", "MPB"), "CG-2601MPB0001")
+        self.assertEqual(database.reserve_main_numbers("2601", "MP", 0), [])
+
+    def test_concurrent_connections_never_share_a_number(self):
+        got, errors = [], []
+
+        def worker():
+            try:
+                for i in range(20):
+                    if i % 5 == 0:
+                        got.extend(database.reserve_main_numbers("2601", "MP", 3))
+                    else:
+                        got.append(database.next_main_number("2601", "MP"))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(got), 4 * (16 + 4 * 3))
+        self.assertEqual(len(set(got)), len(got))
+        self.assertEqual(max(got), f"CG-2601MP{len(got):04d}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from PySide6.QtWidgets import QApplication
+
+import database
+from db_case import TempDatabaseTestCase
+from ui_monthly_plan import MonthlyPlanWidget
+
+
+class TestMonthlyPlanSave(TempDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_upsert_updates_and_inserts(self):
+        database.import_monthly_plans([("2601", "钢管", "", "根", 1, 0.1, "", "")])
+        row_id = database.fetch_monthly_plans_with_stats("2601")[0][0]
+        res = database.upsert_monthly_plans([
+            (row_id, "2601", "钢管", "DN50", "根", 5, 0.5, "", ""),
+            (None, "2601", "阀门", "", "个", 2, 0.2, "", ""),
+        ])
+        self.assertEqual(res, {"updated": 1, "inserted": 1})
+        rows = {r[1]: r for r in database.fetch_monthly_plans_with_stats("2601")}
+        self.assertEqual(rows["钢管"][2], "DN50")
+        self.assertIn("阀门", rows)
+
+    def test_save_writes_only_dirty_rows(self):
+        database.import_monthly_plans([("2601", f"物料{i}", "", "", 1, 0, "", "") for i in range(3)])
+        w = MonthlyPlanWidget()
+        w.combo_month.setCurrentText("2601")
+        w.load_data()
+        self.assertFalse(any(w.is_dirty(r) for r in range(w.table.rowCount())))
+        w.table.item(1, 2).setText("新规格")
+
+        with mock.patch.object(database, "upsert_monthly_plans", wraps=database.upsert_monthly_plans) as upsert, \
+                mock.patch("ui_monthly_plan.QMessageBox.information"):
+            w.save_all()
+        rows = upsert.call_args[0][0]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][3], "新规格")
+
+
+if __name__ == "__main__":
+    unittest.main()
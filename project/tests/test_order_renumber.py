@@ -0,0 +1,46 @@
+import sqlite3
+import unittest
+
+import database
+from db_case import TempDatabaseTestCase, detail_row
+
+
+class TestOrderRenumber(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.number = database.next_main_number("2601", "MP")
+        database.save_order(self.number, "2601", "MP", "生产部", "2026-01-01", "民品")
+        database.save_order_details_transaction(self.number, [
+            ("2601MP-1", detail_row(purchase_item="螺栓", plan_release="张三")),
+            ("2601MP-12", detail_row()),
+            ("手工-3", detail_row()),
+        ])
+        database.recalc_detail_counter("2601", "MP")
+
+    def _counter(self, yymm, cat):
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            row = conn.execute("SELECT seq FROM detail_counter WHERE yymm=? AND category=?", (yymm, cat)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def test_regenerate_rewrites_prefix_and_counters(self):
+        res = database.update_order_info(self.number, "民品", "采购部", "MPJ", "2602")
+        self.assertTrue(res["success"], res["msg"])
+        self.assertEqual((res["mode"], res["new_number"], res["details"]), ("regenerate", "CG-2602MPJ0001", 3))
+        nos = sorted(r[0] for r in database.fetch_order_details("CG-2602MPJ0001"))
+        self.assertEqual(nos, ["2602MPJ-1", "2602MPJ-12", "手工-3"])
+        self.assertEqual(database.count_details(self.number), 0)
+        self.assertEqual(database.fetch_release_orders(number_filter="CG-2602MPJ0001")[0][2], "张三")
+        self.assertEqual(self._counter("2602", "MPJ"), 12)
+        self.assertEqual(self._counter("2601", "MP"), 0)
+
+    def test_simple_update_and_missing_order(self):
+        res = database.update_order_info(self.number, "新任务", "采购部", "MP", "2601")
+        self.assertEqual((res["mode"], res["new_number"]), ("simple", self.number))
+        self.assertFalse(database.update_order_info("CG-0000XX0001", "", "", "MP", "2601")["success"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import sqlite3
+import unittest
+
+import database
+from db_case import TempDatabaseTestCase, detail_row
+
+
+class TestPlanMatching(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        database.save_order("CG-2601MP0001", "2601", "MP", "生产部", "2026-01-01", "民品")
+        database.save_order("CG-2602MP0001", "2602", "MP", "生产部", "2026-02-01", "民品")
+
+    def _detail(self, order_number, detail_no, item, spec, qty, price):
+        row = detail_row(purchase_item=item, spec_model=spec, purchase_qty=qty, inquiry_price=price)
+        database.save_detail_row(order_number, detail_no, row)
+
+    def test_match_key_normalizes_width_spaces_and_invisibles(self):
+        self.assertEqual(database.match_key("﻿ＤＮ５０​  x 2 "), "DN50 x 2")
+        self.assertEqual(database.match_key("钢管　 A"), "钢管 A")
+        self.assertEqual(database.match_key(None), "")
+
+    def test_stats_match_normalized_variants_in_month(self):
+        database.import_monthly_plans([
+            ("2601", "钢管", "DN50", "根", 10, 1, "", ""),
+            ("2601", "阀门", None, "个", 1, 1, "", ""),
+        ])
+        self._detail("CG-2601MP0001", "2601MP-1", " 钢管​", "ＤＮ５０", "3", "1,000")
+        self._detail("CG-2601MP0001", "2601MP-2", "钢管", "DN50 ", "2", "500")
+        self._detail("CG-2601MP0001", "2601MP-3", "阀门", "", "4", "")
+        # Another month's execution does not count
+        self._detail("CG-2602MP0001", "2602MP-1", "钢管", "DN50", "100", "100")
+
+        stats = {r[1]: r[8:] for r in database.fetch_monthly_plans_with_stats("2601")}
+        self.assertEqual(stats["钢管"], (5.0, 1500.0))
+        self.assertEqual(stats["阀门"], (4.0, 0.0))
+
+    def test_rows_written_directly_are_backfilled(self):
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("INSERT INTO monthly_plans(plan_month, item_name, spec_model) VALUES('2601', '法兰', 'PN16')")
+        conn.execute(
+            "INSERT INTO order_details(order_number, detail_no, purchase_item, spec_model, purchase_qty) "
+            "VALUES('CG-2601MP0001', '2601MP-1', '法兰 ', 'ＰＮ16', '7')"
+        )
+        conn.commit()
+        conn.close()
+        rows = database.fetch_monthly_plans_with_stats("2601")
+        self.assertEqual(rows[0][8], 7.0)
+
+    def test_warm_reads_do_not_wait_for_a_writer(self):
+        database.import_monthly_plans([("2601", "钢管", "DN50", "根", 10, 1, "", "")])
+        self._detail("CG-2601MP0001", "2601MP-1", "钢管", "DN50", "3", "100")
+        database.fetch_monthly_plans_with_stats("2601")
+        writer = sqlite3.connect(database.DB_PATH)
+        try:
+            # e.g. another client's single-transaction plan import
+            writer.execute("BEGIN IMMEDIATE")
+            self.assertEqual(database.fetch_monthly_plans_with_stats("2601")[0][8], 3.0)
+            self.assertEqual(len(database.fetch_plan_rollup(["2601"])), 1)
+        finally:
+            writer.rollback()
+            writer.close()
+
+    def test_versioned_migrations_run_once(self):
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], database.SCHEMA_VERSION)
+            conn.execute("DROP INDEX idx_order_details_keys")
+            database._migrate_schema(conn)
+            indexes = {r[1] for r in conn.execute("PRAGMA index_list(order_details)")}
+            self.assertNotIn("idx_order_details_keys", indexes)
+
+            conn.execute("PRAGMA user_version = 0")
+            database._migrate_schema(conn)
+            indexes = {r[1] for r in conn.execute("PRAGMA index_list(order_details)")}
+            self.assertIn("idx_order_details_keys", indexes)
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import sqlite3
+import unittest
+
+import database
+from db_case import TempDatabaseTestCase, detail_row
+import plan_rollup
+
+
+class TestPlanRollup(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        database.save_order("CG-2601MP0001", "2601", "MP", "生产部", "2026-01-01", "民品")
+        database.save_order("CG-2602MP0001", "2602", "MP", "生产部", "2026-02-01", "民品")
+        database.import_monthly_plans([
+            ("2601", "钢管", "DN50", "根", 10, 1, "生产部", ""),
+            ("2601", "阀门", "", "个", 4, 2, "仓储部", ""),
+            ("2602", "钢管", "DN50", "根", 10, 1, "生产部", ""),
+            ("2604", "钢管", "DN50", "根", 99, 9, "生产部", ""),
+        ])
+        self._detail("CG-2601MP0001", "2601MP-1", "钢管", "DN50", "6", "600")
+        self._detail("CG-2602MP0001", "2602MP-1", "钢管", "ＤＮ50", "9", "900")
+
+    def _detail(self, order_number, detail_no, item, spec, qty, price):
+        row = detail_row(purchase_item=item, spec_model=spec, purchase_qty=qty, inquiry_price=price)
+        database.save_detail_row(order_number, detail_no, row)
+
+    def _cached_months(self):
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            return {r[0] for r in conn.execute("SELECT yymm FROM plan_exec_agg_months")}
+        finally:
+            conn.close()
+
+    def test_quarter_rollup_by_item_and_department(self):
+        df = plan_rollup.load_rollup(plan_rollup.period_months("26", "第一季度"))
+        self.assertEqual(sorted(df["plan_month"].unique()), ["2601", "2602"])
+
+        by_item = plan_rollup.summarize(df, "标的").set_index("item_name")
+        self.assertEqual(by_item.loc["钢管", "plan_qty"], 20)
+        self.assertEqual(by_item.loc["钢管", "exec_qty"], 15)
+        self.assertEqual(by_item.loc["钢管", "progress"], 75.0)
+        self.assertEqual(by_item.loc["阀门", "progress"], 0.0)
+
+        by_dept = plan_rollup.summarize(df, "部门").set_index("department")
+        self.assertEqual(by_dept.loc["生产部", "exec_amt"], 1500)
+
+        pivot = plan_rollup.pivot_by_month(df)
+        self.assertEqual(list(pivot.columns), ["2601", "2602"])
+
+    def test_execution_counted_once_when_departments_share_an_item(self):
+        database.import_monthly_plans([("2601", "钢管", "DN50", "根", 5, 1, "仓储部", "")])
+        df = plan_rollup.load_rollup(["2601"])
+
+        by_item = plan_rollup.summarize(df, "标的").set_index("item_name")
+        self.assertEqual(by_item.loc["钢管", "plan_qty"], 15)
+        self.assertEqual(by_item.loc["钢管", "exec_qty"], 6)
+        self.assertEqual(by_item.loc["钢管", "exec_amt"], 600)
+        self.assertEqual(by_item.loc["钢管", "progress"], 40.0)
+
+        # Each planning department still sees the item's execution
+        by_dept = plan_rollup.summarize(df, "部门+标的").set_index(["department", "item_name"])
+        self.assertEqual(by_dept.loc[("仓储部", "钢管"), "exec_qty"], 6)
+        self.assertEqual(by_dept.loc[("生产部", "钢管"), "exec_qty"], 6)
+
+        self.assertEqual(plan_rollup.pivot_by_month(df).loc[("钢管", "DN50", "根"), "2601"], 6)
+        self.assertEqual(plan_rollup.totals(df)["exec_amt"], 600)
+
+    def test_month_cache_is_reused_and_invalidated_by_detail_writes(self):
+        plan_rollup.load_rollup(["2601", "2602"])
+        self.assertEqual(self._cached_months(), {"2601", "2602"})
+
+        self._detail("CG-2601MP0001", "2601MP-2", "钢管", "DN50", "1", "100")
+        self.assertEqual(self._cached_months(), {"2602"})
+
+        stats = {r[1]: r[8] for r in database.fetch_monthly_plans_with_stats("2601")}
+        self.assertEqual(stats["钢管"], 7.0)
+        self.assertEqual(self._cached_months(), {"2601", "2602"})
+
+
+if __name__ == "__main__":
+    unittest.main()
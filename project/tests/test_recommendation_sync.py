@@ -0,0 +1,155 @@
+import sqlite3
+import unittest
+from unittest import mock
+
+import database
+from db_case import TempDatabaseTestCase, detail_row
+
+
+class TestRecommendationSync(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.executemany(
+            "INSERT INTO order_details(order_number, detail_no, purchase_item, plan_release, purchase_method, purchase_channel) VALUES(?,?,?,?,?,?)",
+            [
+                ("CG-1", "2601MP-1", " 螺栓 ", "张三", "询比采购", "线下采购"),
+                ("CG-1", "2601MP-2", "螺母", "张三", "", ""),
+                ("CG-2", "2601MP-3", "螺栓", "李四", "框架协议", "能建商城"),
+                ("CG-3", "2601MP-4", "垫片", "王五", "", ""),
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO release_orders(source_order_number, purchaser, status) VALUES(?,?,?)",
+            [("CG-1", "张三", "未发放"), ("CG-2", "李四", "未发放"), ("CG-3", "王五", "未发放")],
+        )
+        conn.execute("INSERT INTO recommendations(item_name, plan_release, weight, is_active) VALUES('螺母', '赵六', 100, 1)")
+        conn.commit()
+        conn.close()
+        database.update_release_status("CG-1", "张三", "已发放")
+        database.update_release_status("CG-2", "李四", "已发放")
+
+    def test_inserts_only_new_items(self):
+        stats = database.sync_recommendations_from_releases()
+        self.assertEqual((stats["total"], stats["inserted"], stats["skipped"], stats["failed"]), (3, 1, 2, 0))
+        self.assertTrue(stats["start_time"])
+        recs = {r[1]: r for r in database.fetch_recommendations()}
+        self.assertEqual(set(recs), {"螺栓", "螺母"})
+        # Latest released detail wins for an item released more than once
+        self.assertIn("李四", recs["螺栓"])
+
+        again = database.sync_recommendations_from_releases(full=True)
+        self.assertEqual((again["inserted"], again["skipped"]), (0, 3))
+
+    def _sync_and_log(self):
+        stats = database.sync_recommendations_from_releases()
+        database.save_sync_log(stats["start_time"], stats["end_time"], stats["total"], stats["inserted"],
+                               stats["skipped"], stats["failed"], "", release_watermark=stats["watermark"])
+        return stats
+
+    def test_only_releases_after_watermark_are_considered(self):
+        first = self._sync_and_log()
+        self.assertEqual(first["since"], 0)
+        self.assertEqual(first["watermark"], 2)
+
+        second = self._sync_and_log()
+        self.assertEqual((second["since"], second["total"], second["inserted"]), (2, 0, 0))
+
+        database.update_release_status("CG-3", "王五", "已发放")
+        third = self._sync_and_log()
+        self.assertEqual((third["total"], third["inserted"], third["watermark"]), (1, 1, 3))
+        self.assertIn("垫片", {r[1] for r in database.fetch_recommendations()})
+
+    def test_lines_added_after_release_are_synced(self):
+        self._sync_and_log()
+        details = [(dn, detail_row(purchase_item=item, plan_release="张三", purchase_method=method,
+                                   purchase_channel=channel))
+                   for dn, item, method, channel in [("2601MP-1", "螺栓", "询比采购", "线下采购"),
+                                                     ("2601MP-2", "螺母", "", ""),
+                                                     ("2601MP-6", "垫片", "", "")]]
+        database.save_order_details_transaction("CG-1", details)
+        database.update_release_status("CG-1", "张三", "已发放")
+        stats = self._sync_and_log()
+        self.assertEqual(stats["inserted"], 1)
+        self.assertIn("垫片", {r[1] for r in database.fetch_recommendations()})
+        # Saving the same lines again leaves the stamp alone
+        database.save_order_details_transaction("CG-1", details)
+        self.assertEqual(self._sync_and_log()["total"], 0)
+
+    def test_restamp_is_part_of_the_detail_save(self):
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("UPDATE release_orders SET released_at='2020-01-01 00:00:00' WHERE source_order_number='CG-1'")
+        conn.commit()
+        conn.close()
+        details = [("2601MP-1", detail_row(purchase_item="螺栓", plan_release="张三")),
+                   ("2601MP-6", detail_row(purchase_item="垫片", plan_release="张三"))]
+        with mock.patch.object(database, "_sync_release_orders", side_effect=sqlite3.OperationalError("disk I/O error")):
+            with self.assertRaises(sqlite3.OperationalError):
+                database.save_order_details_transaction("CG-1", details)
+        self.assertEqual(database.count_details("CG-1"), 2)
+
+        database.save_order_details_transaction("CG-1", details)
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            seq, at = conn.execute(
+                "SELECT released_seq, released_at FROM release_orders WHERE source_order_number='CG-1'").fetchone()
+        finally:
+            conn.close()
+        self.assertEqual(seq, 3)
+        self.assertGreater(at, "2020-01-01 00:00:00")
+
+    def test_release_records_time_once(self):
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            seq, at = conn.execute("SELECT released_seq, released_at FROM release_orders WHERE source_order_number='CG-1'").fetchone()
+        finally:
+            conn.close()
+        self.assertEqual(seq, 1)
+        self.assertTrue(at)
+        # Marking an already released order again keeps its stamp
+        database.update_release_status("CG-1", "张三", "已发放")
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            self.assertEqual(conn.execute("SELECT released_seq FROM release_orders WHERE source_order_number='CG-1'").fetchone()[0], 1)
+        finally:
+            conn.close()
+
+    def test_weights_follow_frequency_and_recency(self):
+        database.sync_recommendations_from_releases()
+        conn = sqlite3.connect(database.DB_PATH)
+        # 螺栓 -> 李四 released twice (once a year ago), 螺母 -> 赵六 never released
+        conn.execute(
+            "INSERT INTO order_details(order_number, detail_no, purchase_item, plan_release, purchase_method, purchase_channel) "
+            "VALUES('CG-4', '2601MP-5', '螺栓', '李四', '框架协议', '能建商城')"
+        )
+        conn.execute(
+            "INSERT INTO release_orders(source_order_number, purchaser, status, released_at) "
+            "VALUES('CG-4', '李四', '已发放', datetime('now', 'localtime', '-365 days'))"
+        )
+        conn.commit()
+        conn.close()
+
+        res = database.recompute_recommendation_weights(half_life_days=365)
+        self.assertEqual(res["updated"], 1)
+        weights = {r[1]: r[3] for r in database.fetch_recommendations()}
+        self.assertEqual(weights["螺栓"], 150)
+        self.assertEqual(weights["螺母"], 100)
+        self.assertEqual(database.recompute_recommendation_weights(half_life_days=365)["updated"], 0)
+
+    def test_incremental_reweight_touches_only_new_release_items(self):
+        first = self._sync_and_log()
+        database.update_release_status("CG-3", "王五", "已发放")
+        database.sync_recommendations_from_releases()
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("UPDATE recommendations SET weight=1")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(database.recompute_recommendation_weights(since=first["watermark"])["updated"], 1)
+        weights = {r[1]: r[3] for r in database.fetch_recommendations()}
+        self.assertEqual((weights["垫片"], weights["螺栓"]), (100, 1))
+        self.assertEqual(database.recompute_recommendation_weights()["updated"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from PySide6.QtCore import QCoreApplication
+
+import database
+from db_case import TempDatabaseTestCase
+from reference_data import ReferenceData
+
+
+class TestReferenceData(TempDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        super().setUp()
+        self.ref = ReferenceData()
+        self.emitted = []
+        self.ref.changed.connect(self.emitted.append)
+
+    def tearDown(self):
+        database.remove_reference_listener(self.ref.invalidate)
+
+    def test_cached_until_changed(self):
+        before = self.ref.get("units")
+        database.add_unit("一车间")
+        self.assertEqual(self.ref.get("units"), sorted(before + ["一车间"]))
+        self.assertEqual(self.ref.version("units"), 1)
+        self.assertEqual(self.emitted, ["units"])
+
+    def test_duplicate_add_does_not_emit(self):
+        database.add_purchaser("张三")
+        self.ref.get("purchasers")
+        database.add_purchaser("张三")
+        self.assertEqual(self.ref.version("purchasers"), 0)
+        self.assertEqual(self.emitted, [])
+
+    def test_rename_reloads(self):
+        database.add_plan_month("2024-01")
+        self.ref.get("plan_months")
+        database.rename_plan_month("2024-01", "2024-02")
+        months = self.ref.get("plan_months")
+        self.assertIn("2024-02", months)
+        self.assertNotIn("2024-01", months)
+        self.assertEqual(self.emitted, ["plan_months"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import sqlite3
+import unittest
+from unittest import mock
+
+from PySide6.QtWidgets import QApplication, QTableWidgetSelectionRange
+
+import database
+from db_case import TempDatabaseTestCase
+
+
+class TestReleaseStatuses(TempDatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        super().setUp()
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.executemany(
+            "INSERT INTO release_orders(source_order_number, purchaser, release_date, status, record_count) VALUES(?,?,?,?,?)",
+            [(f"CG-{i}", p, "2026-01-01", "待发放", 1) for i in range(3) for p in ("张三", "李四")],
+        )
+        conn.commit()
+        conn.close()
+
+    def _rows(self):
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            return {
+                (o, p): (status, seq)
+                for o, p, status, seq in conn.execute(
+                    "SELECT source_order_number, purchaser, status, released_seq FROM release_orders")
+            }
+        finally:
+            conn.close()
+
+    def test_bulk_release_stamps_each_pair_once(self):
+        database.update_release_status("CG-0", "张三", "已发放")
+        updated = database.update_release_statuses(
+            [("CG-0", "张三"), ("CG-1", "李四"), ("CG-2", "张三"), ("CG-1", "李四")], "已发放")
+        self.assertEqual(updated, 3)
+        rows = self._rows()
+        self.assertEqual(rows[("CG-0", "张三")], ("已发放", 1))
+        self.assertEqual(rows[("CG-1", "李四")], ("已发放", 2))
+        self.assertEqual(rows[("CG-2", "张三")], ("已发放", 3))
+        self.assertEqual(rows[("CG-0", "李四")], ("待发放", None))
+        self.assertEqual(database.update_release_statuses([], "已发放"), 0)
+
+    def test_release_selected_rows(self):
+        from PySide6.QtWidgets import QMessageBox
+        from ui_plan_release import PlanReleaseForm
+        w = PlanReleaseForm(None)
+        w.load_data()
+        self.assertEqual(w.table.rowCount(), 6)
+        w.table.setRangeSelected(QTableWidgetSelectionRange(0, 0, 1, 7), True)
+        w.table.item(1, 7).setText("已发放")
+        expected = [(w.table.item(0, 1).text(), w.table.item(0, 2).text())]
+        self.assertEqual(w.selected_pairs(), expected)
+
+        with mock.patch("ui_plan_release.QMessageBox.question", return_value=QMessageBox.Yes), \
+                mock.patch("ui_plan_release.QMessageBox.information"):
+            w.release_selected()
+        released = [k for k, v in self._rows().items() if v[0] == "已发放"]
+        self.assertEqual(released, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import sqlite3
+import unittest
+
+import database
+from db_case import TempDatabaseTestCase
+
+
+class TestRenameCascade(TempDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        database.add_purchaser("张三")
+        database.save_order("CG-2601MP0001", "2601", "MP", "生产部", "2026-01-01", "任务")
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("INSERT INTO order_details(order_number, detail_no, demand_unit, plan_release) VALUES('CG-2601MP0001', '2601MP-1', '生产部', '张三')")
+        conn.execute("INSERT INTO release_orders(source_order_number, purchaser, status) VALUES('CG-2601MP0001', '张三', '未发放')")
+        conn.commit()
+        conn.close()
+
+    def _scalar(self, sql):
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            return conn.execute(sql).fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_dry_run_counts_without_changes(self):
+        res = database.rename_reference("purchasers", "张三", "李四", dry_run=True)
+        self.assertTrue(res["success"])
+        self.assertEqual(res["counts"]["order_details.plan_release"], 1)
+        self.assertEqual(res["counts"]["release_orders.purchaser"], 1)
+        self.assertEqual(res["total"], 2)
+        self.assertEqual(self._scalar("SELECT COUNT(1) FROM purchasers WHERE name='张三'"), 1)
+
+    def test_rename_cascades(self):
+        self.assertTrue(database.rename_purchaser("张三", "李四"))
+        self.assertEqual(self._scalar("SELECT plan_release FROM order_details"), "李四")
+        self.assertEqual(self._scalar("SELECT purchaser FROM release_orders"), "李四")
+        self.assertTrue(database.rename_unit("生产部", "生产一部"))
+        self.assertEqual(self._scalar("SELECT unit FROM orders"), "生产一部")
+        self.assertEqual(self._scalar("SELECT demand_unit FROM order_details"), "生产一部")
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("UPDATE release_orders SET status='采购中'")
+        conn.commit()
+        conn.close()
+        self.assertTrue(database.rename_purchase_status("采购中", "询价中"))
+        self.assertEqual(self._scalar("SELECT status FROM release_orders"), "询价中")
+
+    def test_builtin_statuses_cannot_be_renamed(self):
+        res = database.rename_reference("purchase_statuses", "未发放", "待处理", dry_run=True)
+        self.assertFalse(res["success"])
+        self.assertFalse(database.rename_purchase_status("已发放", "已下发"))
+        # Nor can another status take over a built-in name
+        self.assertFalse(database.rename_purchase_status("采购中", "待发放"))
+        self.assertEqual(self._scalar("SELECT status FROM release_orders"), "未发放")
+        self.assertEqual(self._scalar("SELECT COUNT(1) FROM purchase_status WHERE name IN ('已发放', '采购中')"), 2)
+
+    def test_settings_dialog_disables_rename_for_builtin_names(self):
+        from PySide6.QtWidgets import QApplication
+        from ui_main import SettingsDialog
+        QApplication.instance() or QApplication([])
+        dlg = SettingsDialog(database.fetch_purchase_statuses, database.add_purchase_status,
+                             database.rename_purchase_status,
+                             builtin_names=database.BUILTIN_REFERENCE_NAMES["purchase_statuses"])
+        names = [dlg.list.item(i).text() for i in range(dlg.list.count())]
+        dlg.list.setCurrentRow(names.index("已发放"))
+        self.assertFalse(dlg.btn_rename.isEnabled())
+        dlg.list.setCurrentRow(names.index("采购中"))
+        self.assertTrue(dlg.btn_rename.isEnabled())
+
+    def test_conflict_rolls_back(self):
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("INSERT INTO release_orders(source_order_number, purchaser, status) VALUES('CG-2601MP0001', '李四', '未发放')")
+        conn.commit()
+        conn.close()
+        self.assertFalse(database.rename_purchaser("张三", "李四"))
+        self.assertEqual(self._scalar("SELECT plan_release FROM order_details"), "张三")
+        self.assertEqual(self._scalar("SELECT COUNT(1) FROM purchasers WHERE name='张三'"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
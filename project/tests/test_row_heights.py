@@ -0,0 +1,66 @@
+import unittest
+
+from PySide6.QtCore import QCoreApplication, QEvent
+from PySide6.QtWidgets import QApplication, QComboBox, QTableWidget, QTableWidgetItem
+
+from row_heights import RowHeightCache
+
+
+class TestRowHeightCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.table = QTableWidget(3, 3)
+        self.table.setWordWrap(True)
+        self.cache = RowHeightCache(self.table)
+        self.default = self.table.verticalHeader().defaultSectionSize()
+        self.table.setColumnWidth(1, 80)
+        for r in range(3):
+            self.table.setItem(r, 1, QTableWidgetItem("短"))
+
+    def tearDown(self):
+        # Delete the table while the cache is still alive, as DetailWidget's deleteLater() does
+        self.table.deleteLater()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    def height(self, r):
+        return self.table.rowHeight(r)
+
+    def test_long_text_wraps_and_widening_shrinks(self):
+        self.table.item(1, 1).setText("很长的采购标的名称 " * 10)
+        self.cache.refresh_now()
+        self.assertEqual(self.height(0), self.default)
+        tall = self.height(1)
+        self.assertGreater(tall, self.default)
+
+        self.table.setColumnWidth(1, 2000)
+        self.cache.refresh_now()
+        self.assertLess(self.height(1), tall)
+
+    def test_identical_rows_share_a_cache_entry(self):
+        self.cache.refresh_now()
+        self.assertEqual(self.cache.cached_count(), 1)
+        self.table.insertRow(0)
+        self.table.setItem(0, 1, QTableWidgetItem("短"))
+        self.cache.refresh_now()
+        self.assertEqual(self.cache.cached_count(), 1)
+
+    def test_cell_widgets_are_not_measured(self):
+        self.table.setItem(2, 2, QTableWidgetItem("很长的文本 " * 20))
+        self.table.setCellWidget(2, 2, QComboBox())
+        self.cache.refresh_now()
+        self.assertEqual(self.height(2), self.default)
+
+    def test_detached_cache_ignores_edits(self):
+        self.cache.refresh_now()
+        self.cache.detach()
+        self.cache.detach()
+        self.table.item(1, 1).setText("很长的采购标的名称 " * 10)
+        self.cache.refresh_now()
+        self.assertEqual(self.height(1), self.default)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from PySide6.QtCore import QEventLoop, QTimer
+from PySide6.QtWidgets import QApplication
+
+import tracing
+
+
+class TestTracing(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        tracing.clear()
+        tracing.enable()
+
+    def tearDown(self):
+        tracing.disable()
+        tracing.clear()
+
+    def test_disabled_records_nothing(self):
+        tracing.disable()
+        with tracing.span("load_history"):
+            pass
+        self.assertEqual(tracing.events(), [])
+
+    def test_nested_spans_and_export(self):
+        @tracing.traced("load_rows")
+        def load_rows():
+            with tracing.span("load_rows.sql") as args:
+                args["rows"] = 3
+            with tracing.span("load_rows.fill"):
+                pass
+
+        load_rows()
+        by_name = {e["name"]: e for e in tracing.events()}
+        self.assertEqual(set(by_name), {"load_rows", "load_rows.sql", "load_rows.fill"})
+        outer, sql = by_name["load_rows"], by_name["load_rows.sql"]
+        self.assertEqual(sql["args"], {"rows": 3})
+        self.assertGreaterEqual(sql["ts"], outer["ts"])
+        self.assertLessEqual(sql["ts"] + sql["dur"], outer["ts"] + outer["dur"])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            self.assertEqual(tracing.export(path), 3)
+            with open(path, encoding="utf-8") as f:
+                trace = json.load(f)
+        phases = [e["ph"] for e in trace["traceEvents"]]
+        self.assertEqual(phases.count("X"), 3)
+        self.assertIn("M", phases)
+
+    def test_traced_slot_ignores_extra_signal_arguments(self):
+        from PySide6.QtWidgets import QLineEdit
+
+        calls = []
+
+        class Page:
+            @tracing.traced("Page.apply_filters")
+            def apply_filters(self):
+                calls.append("filter")
+
+        page, edit = Page(), QLineEdit()
+        edit.textChanged.connect(page.apply_filters)
+        edit.setText("轴承")
+        self.assertEqual(calls, ["filter"])
+        self.assertEqual([e["name"] for e in tracing.events()], ["Page.apply_filters"])
+
+    def test_event_loop_monitor_reports_blocked_interval(self):
+        monitor = tracing.EventLoopMonitor(interval_ms=20, threshold_ms=100)
+        monitor.start()
+        loop = QEventLoop()
+        QTimer.singleShot(50, lambda: time.sleep(0.25))
+        QTimer.singleShot(400, loop.quit)
+        loop.exec()
+        monitor.stop()
+        blocked = [e for e in tracing.events() if e["name"] == "event loop blocked"]
+        self.assertEqual(monitor.blocked_count, len(blocked))
+        self.assertGreaterEqual(len(blocked), 1)
+        self.assertGreaterEqual(max(e["args"]["blocked_ms"] for e in blocked), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+"""
+界面响应跟踪（默认关闭）
+
+span()/traced() 记录代码段起止时间，EventLoopMonitor 用心跳定时器检测事件循环
+被阻塞超过 BLOCK_THRESHOLD_MS 的区间。export() 输出 Chrome trace-event JSON，
+可在 chrome://tracing 或 https://ui.perfetto.dev 离线打开。
+
+页面加载按阶段拆分为 sql（取数）、shape（整理行数据）、fill（填充表格）子段，
+便于区分时间花在数据库、Python 还是 QTableWidget 上。
+
+启动时设置环境变量 PPOMS_TRACE=输出文件.json 即自动开启，退出时写出；
+也可在“工具 → 界面响应跟踪”中开关。
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from PySide6.QtCore import QObject, QTimer
+
+MAX_EVENTS = 200000
+HEARTBEAT_MS = 50
+BLOCK_THRESHOLD_MS = 100
+
+_events = deque(maxlen=MAX_EVENTS)
+_threads = {}
+_enabled = False
+_origin = time.perf_counter()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def clear():
+    _events.clear()
+
+
+def events() -> list:
+    return list(_events)
+
+
+def complete(name: str, cat: str, start: float, end: float, args: dict = None):
+    """记录一个完整区间；start/end 为 time.perf_counter() 的秒数。"""
+    if not _enabled:
+        return
+    tid = threading.get_ident()
+    if tid not in _threads:
+        _threads[tid] = threading.current_thread().name
+    event = {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "ts": round((start - _origin) * 1e6, 1),
+        "dur": round((end - start) * 1e6, 1),
+        "pid": os.getpid(),
+        "tid": tid,
+    }
+    if args:
+        event["args"] = args
+    _events.append(event)
+
+
+@contextmanager
+def span(name: str, cat: str = "ui", **args):
+    """with span("load_history.sql"): ...；未开启时只多一次函数调用。"""
+    if not _enabled:
+        yield args
+        return
+    t0 = time.perf_counter()
+    try:
+        yield args
+    finally:
+        complete(name, cat, t0, time.perf_counter(), args)
+
+
+def traced(name: str = None, cat: str = "ui"):
+    """
+    装饰器版本的 span，name 默认为函数的 __qualname__。
+    可直接用于槽函数：与 Qt 一样，多出的信号参数（如 clicked 的 checked）会被丢弃。
+    """
+    def decorator(fn):
+        label = name or fn.__qualname__
+        params = inspect.signature(fn).parameters.values()
+        if any(p.kind == p.VAR_POSITIONAL for p in params):
+            max_args = None
+        else:
+            max_args = sum(1 for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            # PySide inspects the wrapper's (*a) signature and forwards every signal argument
+            if max_args is not None:
+                a = a[:max_args]
+            if not _enabled:
+                return fn(*a, **kw)
+            with span(label, cat):
+                return fn(*a, **kw)
+        return wrapper
+    return decorator
+
+
+def export(path: str) -> int:
+    """写出 Chrome trace-event JSON，返回事件数。"""
+    trace = events()
+    pid = os.getpid()
+    meta = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": tname}}
+        for tid, tname in list(_threads.items())
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": meta + trace, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(trace)
+
+
+def enable_from_env():
+    """PPOMS_TRACE 指定输出文件时开启跟踪并返回该路径，否则返回 None。"""
+    path = os.environ.get("PPOMS_TRACE")
+    if path:
+        enable()
+    return path or None
+
+
+class EventLoopMonitor(QObject):
+    """
+    每 interval_ms 触发一次的心跳定时器；某次心跳比预期晚到 threshold_ms 以上，
+    说明事件循环在这段时间内被占用，记为一个 "event loop blocked" 区间。
+    """
+
+    def __init__(self, parent=None, interval_ms: int = HEARTBEAT_MS, threshold_ms: int = BLOCK_THRESHOLD_MS):
+        super().__init__(parent)
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.blocked_count = 0
+        self._last = 0.0
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        self._last = time.perf_counter()
+        if not self._timer.isActive():
+            self._timer.start(self.interval_ms)
+
+    def stop(self):
+        self._timer.stop()
+
+    def is_running(self) -> bool:
+        return self._timer.isActive()
+
+    def _tick(self):
+        now = time.perf_counter()
+        expected = self._last + self.interval_ms / 1000.0
+        late_ms = (now - expected) * 1000
+        if late_ms >= self.threshold_ms:
+            self.blocked_count += 1
+            complete("event loop blocked", "loop", expected, now, {"blocked_ms": round(late_ms, 1)})
+        self._last = now
@@ -227,6 +227,7 @@ class DataManagerWidget(QWidget):
             # We assume no other process is locking the DB.
             # In a real heavy app we might need to close connections first, but here connections are short-lived per function.
             shutil.copyfile(source_path, database.DB_PATH)
+            database.forget_schema_check()
             
             QMessageBox.information(self, "成功", "数据还原成功！\n\n为了确保数据正常加载，请重启软件。")
             self.load_backups() # refresh list to show safety backup
@@ -13,9 +13,14 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QComboBox,
     QFileDialog,
+    QProgressDialog,
+    QApplication,
 )
 from PySide6.QtCore import Qt
-import pandas as pd
+from reference_data import get_reference_data
+from row_heights import RowHeightCache
+from detail_sequence import DetailSequenceAllocator, parse_seq
+import tracing
 
 
 HEADERS = [
@@ -47,6 +52,7 @@ class DetailWidget(QWidget):
         self.category_code = category_code
         self.main_number = main_number
         self.next_detail_no_fn = next_detail_no_fn
+        self.detail_seq = DetailSequenceAllocator(yymm, category_code, next_detail_no_fn)
         splitter = QSplitter(Qt.Vertical)
         root = QVBoxLayout(self)
         root.addWidget(splitter)
@@ -120,20 +126,15 @@ class DetailWidget(QWidget):
         self.table.setHorizontalHeaderLabels(HEADERS)
         self.table.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
         
-        # Configure Table for Auto-Wrap and Auto-Row-Height
+        # Auto-wrap; row heights come from RowHeightCache instead of ResizeToContents
         self.table.setWordWrap(True)
-        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.row_heights = RowHeightCache(self.table)
         
         header = self.table.horizontalHeader()
         for i in range(self.table.columnCount()):
             header.setSectionResizeMode(i, QHeaderView.Interactive)
-        header.sectionResized.connect(self.on_header_resized)
-        from PySide6.QtCore import QTimer
-        self._resize_timer = QTimer(self)
-        self._resize_timer.setSingleShot(True)
-        self._resize_timer.setInterval(300)
-        self._pending_resize = None
         self.apply_saved_widths()
+        header.sectionResized.connect(self.on_header_resized)
         
         # Top Actions (Add/Del Row) moved here
         self.add_btn = QPushButton("添加行")
@@ -209,25 +210,17 @@ class DetailWidget(QWidget):
             it.setToolTip("请输入有效数字")
 
     def apply_saved_widths(self):
-        import database
-        widths = database.get_detail_column_widths()
+        from layout_store import get_layout_store
+        widths = get_layout_store().get_widths("detail")
         for col, w in widths.items():
             if 0 <= col < self.table.columnCount() and int(w) > 20:
                 self.table.setColumnWidth(col, int(w))
 
     def on_header_resized(self, logicalIndex: int, oldSize: int, newSize: int):
-        self._pending_resize = (int(logicalIndex), int(newSize))
-        self._resize_timer.timeout.connect(self._flush_resize)
-        self._resize_timer.start()
-
-    def _flush_resize(self):
-        if not self._pending_resize:
-            return
-        col, w = self._pending_resize
-        self._pending_resize = None
-        import database
-        database.set_detail_column_width(col, w)
-        database.set_layout_version("detail", "v1")
+        from layout_store import get_layout_store
+        store = get_layout_store()
+        store.set_width("detail", logicalIndex, newSize)
+        store.set_version("detail", "v1")
 
     def set_header_info(self, info: dict):
         self.h_number.setText(str(info.get("number", "")))
@@ -242,55 +235,8 @@ class DetailWidget(QWidget):
         r = 0 
         self.table.insertRow(r)
         
-        # IMPORTANT: When adding a new row, we must pass the current yymm and category_code
-        # to generate the correct sequence number prefix (e.g., 2601MPJ-1).
-        # However, `next_detail_no_fn` relies on `database.next_detail_number` which queries DB.
-        # If we add multiple rows in UI without saving, they won't be in DB yet.
-        # So `next_detail_number` will return the SAME number for all new rows until saved.
-        # This is a known issue with "stateless" auto-increment in UI.
-        # To fix this, we need to count how many "unsaved" rows are already in the table that match the prefix.
-        
-        # But for now, let's just generate it. The user might need to save to get unique IDs if we rely strictly on DB.
-        # OR we can try to be smart:
-        # Get base seq from DB
-        # Add count of existing rows in table that have the same prefix and look like new rows?
-        # A simpler approach for the User Experience:
-        # Just call the function. If it returns duplicate, we might need to handle it.
-        # Wait, `next_detail_no_fn` is `database.next_detail_number`.
-        
-        # Let's try to parse the max sequence currently VISIBLE in the table as well, 
-        # because the user might have added rows but not saved them.
-        
-        db_seq_str = self.next_detail_no_fn(self.yymm, self.category_code)
-        # db_seq_str format: "2601MPJ-5"
-        
-        # Check current table for max sequence
-        max_table_seq = 0
-        prefix = f"{self.yymm}{self.category_code}-"
-        
-        for i in range(self.table.rowCount()):
-            # skip the row we just inserted (it's empty or 0)
-            if i == r: continue
-            
-            item = self.table.item(i, 0)
-            if item:
-                txt = item.text()
-                if txt.startswith(prefix):
-                    try:
-                        n = int(txt.split("-")[-1])
-                        if n > max_table_seq:
-                            max_table_seq = n
-                    except:
-                        pass
-        
-        # Parse DB seq
-        try:
-            db_n = int(db_seq_str.split("-")[-1])
-        except:
-            db_n = 0
-            
-        final_n = max(db_n, max_table_seq + 1)
-        final_seq = f"{prefix}{final_n}"
+        # Numbers come from the allocator, so unsaved rows never collide with each other
+        final_seq = self.detail_seq.next()
         
         self.table.setItem(r, 0, QTableWidgetItem(final_seq))
         
@@ -310,8 +256,7 @@ class DetailWidget(QWidget):
         self.table.setItem(r, 10, QTableWidgetItem(progress_val))
         self._ensure_total_item(r)
 
-        import database
-        purchasers = database.fetch_purchasers()
+        purchasers = get_reference_data().get("purchasers")
         combo = QComboBox()
         combo.setEditable(True)
         combo.addItems(["未分配"] + purchasers)
@@ -357,8 +302,18 @@ class DetailWidget(QWidget):
             for r in range(rng.topRow(), rng.bottomRow() + 1):
                 rows_to_del.add(r)
         
+        released = []
         for r in sorted(rows_to_del, reverse=True):
+            it = self.table.item(r, 0)
+            if it is not None:
+                released.append(it.text())
             self.table.removeRow(r)
+        # Give back trailing numbers so re-adding reuses them, as next_detail_number does after a save
+        for dn in sorted(released, key=lambda d: -(self._seq_of(d) or 0)):
+            self.detail_seq.release(dn)
+
+    def _seq_of(self, detail_no: str):
+        return parse_seq(detail_no, self.detail_seq.prefix)
 
     def _display_value(self, r: int, c: int):
         w = self.table.cellWidget(r, c)
@@ -432,8 +387,30 @@ class DetailWidget(QWidget):
             ]
             rows_to_save.append((seq, data))
 
-        # 3. Save to DB in one transaction (Delete old + Insert new)
-        database.save_order_details_transaction(self.main_number, rows_to_save)
+        # 3. Save to DB in one transaction (Delete old + Insert new).
+        # Numbers another client saved meanwhile are renumbered and the save retried.
+        original_nos = [seq for seq, _ in rows_to_save]
+        for _ in range(3):
+            conflicts = database.save_order_details_transaction(self.main_number, rows_to_save)
+            if not conflicts:
+                break
+            self.detail_seq.reseed()
+            taken = set(conflicts)
+            rows_to_save = [(self.detail_seq.next() if seq in taken else seq, data) for seq, data in rows_to_save]
+        else:
+            QMessageBox.warning(self, "提示", "序号冲突，保存失败，请稍后重试")
+            return False
+        # Compare each row's saved number with its original one, so a row renumbered
+        # twice (A -> B -> C) ends up showing C
+        renumbered = [(a, b) for a, (b, _) in zip(original_nos, rows_to_save) if a != b]
+        if renumbered:
+            last = self.table.rowCount() - 1
+            for i, (seq, _) in enumerate(rows_to_save):
+                it = self.table.item(last - i, 0)  # rows_to_save runs bottom-up
+                if it is not None:
+                    it.setText(seq)
+            QMessageBox.information(self, "提示", "以下序号已被其他用户占用，已重新编号：\n" +
+                                    "\n".join(f"{a} → {b}" for a, b in renumbered))
         
         import database as _db
         _db.recalc_detail_counter(self.yymm, self.category_code)
@@ -459,104 +436,123 @@ class DetailWidget(QWidget):
                     purchasers.add(p)
             if purchasers:
                 import database
-                for p in purchasers:
-                    database.update_release_status(self.main_number, p, "已发放")
+                database.update_release_statuses([(self.main_number, p) for p in sorted(purchasers)], "已发放")
             QMessageBox.information(self, "发放", "已更新到计划发放模块并标记为已发放")
 
     def import_excel(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "选择Excel文件", "", "Excel Files (*.xlsx *.xls)")
         if not file_path:
             return
+        progress = QProgressDialog("正在导入...", "取消", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_progress(done, total):
+            if total:
+                progress.setMaximum(total)
+                progress.setValue(min(done, total))
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        state = None
         try:
-            df = pd.read_excel(file_path)
-            self._import_from_dataframe(df)
+            import excel_import
+            batches = excel_import.iter_sheet_batches(
+                file_path, excel_import.DETAIL_COLUMNS, required=excel_import.DETAIL_REQUIRED, on_progress=on_progress
+            )
+            try:
+                for df in batches:
+                    if state is None:
+                        state = self._begin_import()
+                    self._import_batch(df, state)
+            except excel_import.MissingColumnsError as e:
+                progress.close()
+                self._warn_missing_columns(e.missing)
+                return
+            except excel_import.ImportCancelled:
+                # Remove the rows this import added so nothing half-imported stays in the table
+                if state is not None:
+                    for _ in range(state["success"]):
+                        self.table.removeRow(0)
+                    self.detail_seq.rewind(state["seq_mark"])
+                progress.close()
+                QMessageBox.information(self, "提示", "已取消导入")
+                return
+            progress.close()
+            self._finish_import(state or self._begin_import())
         except Exception as e:
+            progress.close()
             QMessageBox.critical(self, "错误", f"导入失败: {str(e)}")
+        finally:
+            self._loading = False
 
-    def _import_from_dataframe(self, df: pd.DataFrame):
-        self._loading = True
-        required_cols = [
-            "采购标的",
-            "规格型号",
-            "采购数量",
-            "单位",
-            "单价(元)",
-            "采购方式",
-            "采购途径",
-            "计划发放",
-        ]
-        missing = [c for c in required_cols if c not in df.columns]
+    def _warn_missing_columns(self, missing):
+        try:
+            from export import write_detail_import_template
+            path = "docs/detail_import_template.xlsx"
+            write_detail_import_template(path, purchasers_hint=True)
+            QMessageBox.warning(self, "提示", f"Excel需包含列: {', '.join(missing)}\n已生成模板: {path}")
+        except Exception:
+            QMessageBox.warning(self, "提示", f"Excel需包含列: {', '.join(missing)}")
+
+    def _import_from_dataframe(self, df):
+        from excel_import import DETAIL_COLUMNS, DETAIL_REQUIRED
+        missing = [c for c in DETAIL_REQUIRED if c not in df.columns]
         if missing:
-            try:
-                from export import write_detail_import_template
-                path = "docs/detail_import_template.xlsx"
-                write_detail_import_template(path, purchasers_hint=True)
-                QMessageBox.warning(self, "提示", f"Excel需包含列: {', '.join(missing)}\n已生成模板: {path}")
-            except Exception:
-                QMessageBox.warning(self, "提示", f"Excel需包含列: {', '.join(missing)}")
+            self._warn_missing_columns(missing)
             return
-
-        import database
-        purchasers = database.fetch_purchasers()
-        prefix = f"{self.yymm}{self.category_code}-"
-
-        max_table_seq = 0
-        for i in range(self.table.rowCount()):
-            it = self.table.item(i, 0)
-            if it:
-                txt = it.text()
-                if txt.startswith(prefix):
-                    try:
-                        n = int(txt.split("-")[-1])
-                        if n > max_table_seq:
-                            max_table_seq = n
-                    except:
-                        pass
-
-        db_seq_str = self.next_detail_no_fn(self.yymm, self.category_code)
+        df = df.reindex(columns=list(DETAIL_COLUMNS)).rename(columns=DETAIL_COLUMNS).reset_index(drop=True)
+        state = self._begin_import()
         try:
-            db_n = int(db_seq_str.split("-")[-1])
-            start_seq = max(db_n, max_table_seq + 1)
-        except:
-            start_seq = 1
+            self._import_batch(df, state)
+        finally:
+            self._loading = False
+        self._finish_import(state)
 
+    def _begin_import(self):
+        """导入开始前的公共状态：采购员列表、导入前的序号位置（取消时回退）与计数。"""
+        self._loading = True
+        return {
+            "purchasers": get_reference_data().get("purchasers"),
+            "seq_mark": self.detail_seq.last,
+            "errors": [],
+            "success": 0,
+            "truncated_remarks": 0,
+        }
+
+    def _import_batch(self, df, state):
+        """
+        df: 列为 excel_import.DETAIL_COLUMNS 字段名，index 为数据行序号。
+        新行按 Excel 顺序排在本次导入已插入行之后（表格顶部），序号依次由 detail_seq 分配。
+        """
         from calc import calc_total, _parse_non_negative
         MAX_REMARK_LEN = 500
-        errors = []
-        success = 0
-        truncated_remarks = 0
-
-        for i in range(len(df) - 1, -1, -1):
-            row = df.iloc[i]
-
-            item_name = str(row.get("采购标的", "")).strip()
-            spec_model = str(row.get("规格型号", "")).strip()
-            qty_text = str(row.get("采购数量", "")).strip()
-            unit_text = str(row.get("单位", "")).strip()
-            price_text = str(row.get("单价(元)", "")).strip()
-            method_text = str(row.get("采购方式", "")).strip()
-            channel_text = str(row.get("采购途径", "")).strip()
-            plan_release = str(row.get("计划发放", "")).strip()
-            remark_text_raw = row.get("备注", "")
+        purchasers = state["purchasers"]
+        errors = state["errors"]
+
+        def text(row, key):
+            v = row.get(key, "")
             try:
-                remark_text = str(remark_text_raw)
-                remark_text = remark_text.strip()
+                v = str(v).strip()
             except Exception:
-                remark_text = ""
-
-            if item_name == "nan": item_name = ""
-            if spec_model == "nan": spec_model = ""
-            if qty_text == "nan": qty_text = ""
-            if unit_text == "nan": unit_text = ""
-            if price_text == "nan": price_text = ""
-            if method_text == "nan": method_text = ""
-            if channel_text == "nan": channel_text = ""
-            if plan_release == "nan" or plan_release == "未分配": plan_release = ""
-            if remark_text == "nan": remark_text = ""
+                return ""
+            return "" if v == "nan" else v
+
+        for i, row in zip(df.index, df.to_dict("records")):
+            item_name = text(row, "item_name")
+            spec_model = text(row, "spec_model")
+            qty_text = text(row, "qty")
+            unit_text = text(row, "unit")
+            price_text = text(row, "price")
+            method_text = text(row, "method")
+            channel_text = text(row, "channel")
+            plan_release = text(row, "plan_release")
+            remark_text = text(row, "remark")
+            if plan_release == "未分配": plan_release = ""
 
             if len(remark_text) > MAX_REMARK_LEN:
                 remark_text = remark_text[:MAX_REMARK_LEN]
-                truncated_remarks += 1
+                state["truncated_remarks"] += 1
 
             qty_val = _parse_non_negative(qty_text)
             price_val = _parse_non_negative(price_text)
@@ -576,10 +572,9 @@ class DetailWidget(QWidget):
                 errors.append(f"第{i+1}行 计划发放人员不存在: {plan_release}")
                 continue
 
-            r = 0
+            r = state["success"]
             self.table.insertRow(r)
-            current_seq_num = start_seq + i
-            seq = f"{prefix}{current_seq_num}"
+            seq = self.detail_seq.next()
             self.table.setItem(r, 0, QTableWidgetItem(seq))
             self.table.setItem(r, 1, QTableWidgetItem(item_name))
             self.table.setItem(r, 2, QTableWidgetItem(spec_model))
@@ -626,9 +621,13 @@ class DetailWidget(QWidget):
 
             self._ensure_total_item(r)
             self._update_total_cell(r)
-            success += 1
+            state["success"] += 1
 
+    def _finish_import(self, state):
         self._loading = False
+        errors = state["errors"]
+        success = state["success"]
+        truncated_remarks = state["truncated_remarks"]
         if errors:
             msg = "\n".join(errors[:10])
             extra = f"\n备注有 {truncated_remarks} 条被截断至500字符" if truncated_remarks > 0 else ""
@@ -640,6 +639,8 @@ class DetailWidget(QWidget):
     def on_item_changed(self, item):
         if getattr(self, "_loading", False):
             return
+        if item.column() == 0:
+            self.detail_seq.observe(item.text())
         
         # Column 1 is "Item Name" (采购标的)
         if item.column() == 1:
@@ -673,63 +674,67 @@ class DetailWidget(QWidget):
         if item.column() in (3, 5):
             self._update_total_cell(item.row())
 
+    @tracing.traced("DetailWidget.load_rows")
     def load_rows(self):
         self._loading = True
         import database
         self.table.setRowCount(0)
-        rows = database.fetch_order_details(self.main_number)
-        purchasers = database.fetch_purchasers()
+        with tracing.span("DetailWidget.load_rows.sql") as args:
+            rows = database.fetch_order_details(self.main_number)
+            args["rows"] = len(rows)
+        purchasers = get_reference_data().get("purchasers")
         
         # Sort rows in reverse order by id (detail_no is not guaranteed sequential if deleted)
         # Or simply insert at 0 in the loop to reverse order
         # fetch_order_details returns ordered by id ASC
         
-        for row in rows:
-            # Insert at 0 to reverse order (newest at top if rows are chronological)
-            # Actually, fetch_order_details returns [id ASC]. 
-            # If we want "newest added" at top, and "newest added" means higher ID...
-            # Then iterating ASC and inserting at 0 will put highest ID at top (reverse order).
-            r = 0
-            self.table.insertRow(r)
-            # row: (detail_no, item_name, purchase_item, spec_model, purchase_cycle, stock_count,
-            #       purchase_qty, unit, unit_price, budget_wan, purchase_method, purchase_channel,
-            #       plan_time, demand_unit, plan_release, progress_req, supplier, inquiry_price,
-            #       tax_rate, actual_status, purchase_body, add_adjust, remark)
-            self.table.setItem(r, 0, QTableWidgetItem(str(row[0])))
-            mapping = [
-                (1, row[2]),  # 采购标的
-                (2, row[3]),  # 规格型号
-                (3, row[6]),  # 采购数量
-                (4, row[7]),  # 单位
-                (5, row[8]),  # 单价(元)
-                (6, row[9]),  # 采购预算(万元)
-                # (7, row[10]), # 采购方式 (Handled by combo)
-                (8, row[11]), # 采购途径
-                # (9, row[14]), # 计划发放 (handled separately)
-                (10, row[15]),# 进度要求
-                (11, row[17]),# 询价(报价)
-                (12, row[18]),# 税率
-                (13, row[4]), # 采购周期
-                (14, row[22]),# 备注
-            ]
-            for c, val in mapping:
-                self.table.setItem(r, c, QTableWidgetItem(str(val if val is not None else "")))
+        with tracing.span("DetailWidget.load_rows.fill"):
+            for row in rows:
+                # Insert at 0 to reverse order (newest at top if rows are chronological)
+                # Actually, fetch_order_details returns [id ASC]. 
+                # If we want "newest added" at top, and "newest added" means higher ID...
+                # Then iterating ASC and inserting at 0 will put highest ID at top (reverse order).
+                r = 0
+                self.table.insertRow(r)
+                # row: (detail_no, item_name, purchase_item, spec_model, purchase_cycle, stock_count,
+                #       purchase_qty, unit, unit_price, budget_wan, purchase_method, purchase_channel,
+                #       plan_time, demand_unit, plan_release, progress_req, supplier, inquiry_price,
+                #       tax_rate, actual_status, purchase_body, add_adjust, remark)
+                self.table.setItem(r, 0, QTableWidgetItem(str(row[0])))
+                mapping = [
+                    (1, row[2]),  # 采购标的
+                    (2, row[3]),  # 规格型号
+                    (3, row[6]),  # 采购数量
+                    (4, row[7]),  # 单位
+                    (5, row[8]),  # 单价(元)
+                    (6, row[9]),  # 采购预算(万元)
+                    # (7, row[10]), # 采购方式 (Handled by combo)
+                    (8, row[11]), # 采购途径
+                    # (9, row[14]), # 计划发放 (handled separately)
+                    (10, row[15]),# 进度要求
+                    (11, row[17]),# 询价(报价)
+                    (12, row[18]),# 税率
+                    (13, row[4]), # 采购周期
+                    (14, row[22]),# 备注
+                ]
+                for c, val in mapping:
+                    self.table.setItem(r, c, QTableWidgetItem(str(val if val is not None else "")))
             
-            # Purchase Method (Column 7)
-            method_val = str(row[10]) if row[10] else ""
-            method_combo = QComboBox()
-            method_combo.addItems(ALLOWED_METHODS)
-            method_combo.setEditable(True)
-            method_combo.setCurrentText(method_val)
-            method_combo.currentTextChanged.connect(lambda text, cb=method_combo: self.on_method_changed(cb, text))
-            self.table.setCellWidget(r, 7, method_combo)
-
-            # Plan Release (Column 9)
-            plan_release_val = str(row[14]) if row[14] else ""
-            combo = QComboBox()
-            combo.setEditable(True)
-            combo.addItems(["未分配"] + purchasers)
-            combo.setCurrentText(plan_release_val if plan_release_val else "未分配")
-            self.table.setCellWidget(r, 9, combo)
-            self._update_total_cell(r)
+                # Purchase Method (Column 7)
+                method_val = str(row[10]) if row[10] else ""
+                method_combo = QComboBox()
+                method_combo.addItems(ALLOWED_METHODS)
+                method_combo.setEditable(True)
+                method_combo.setCurrentText(method_val)
+                method_combo.currentTextChanged.connect(lambda text, cb=method_combo: self.on_method_changed(cb, text))
+                self.table.setCellWidget(r, 7, method_combo)
+
+                # Plan Release (Column 9)
+                plan_release_val = str(row[14]) if row[14] else ""
+                combo = QComboBox()
+                combo.setEditable(True)
+                combo.addItems(["未分配"] + purchasers)
+                combo.setCurrentText(plan_release_val if plan_release_val else "未分配")
+                self.table.setCellWidget(r, 9, combo)
+                self._update_total_cell(r)
         self._loading = False
@@ -0,0 +1,112 @@
+import os
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QDoubleSpinBox, QPushButton,
+    QTabWidget, QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView
+)
+from PySide6.QtCore import Qt, QUrl
+from PySide6.QtGui import QDesktopServices
+import db_profile
+
+COLUMNS = [
+    ("name", "名称"), ("count", "次数"), ("total_ms", "累计(ms)"), ("avg_ms", "平均(ms)"),
+    ("p50_ms", "p50"), ("p95_ms", "p95"), ("p99_ms", "p99"), ("max_ms", "最大"),
+    ("avg_rows", "平均行数"), ("callers", "调用方"),
+]
+TABS = [("func", "database 函数"), ("sql", "SQL 语句"), ("connect", "打开连接")]
+
+
+class DiagnosticsDialog(QDialog):
+    """database 调用耗时统计面板；数据来自 db_profile，点击“刷新”时重新读取。"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("性能诊断")
+        self.resize(1100, 600)
+
+        layout = QVBoxLayout(self)
+        toolbar = QHBoxLayout()
+        self.chk_enabled = QCheckBox("启用统计")
+        self.chk_enabled.setChecked(db_profile.is_enabled())
+        self.chk_enabled.toggled.connect(self.set_enabled)
+        toolbar.addWidget(self.chk_enabled)
+
+        toolbar.addWidget(QLabel("慢查询阈值(ms):"))
+        self.spin_slow = QDoubleSpinBox()
+        self.spin_slow.setRange(0, 60000)
+        self.spin_slow.setDecimals(0)
+        self.spin_slow.setValue(db_profile.slow_ms())
+        self.spin_slow.valueChanged.connect(self.set_slow_ms)
+        toolbar.addWidget(self.spin_slow)
+
+        btn_refresh = QPushButton("刷新")
+        btn_refresh.clicked.connect(self.refresh)
+        toolbar.addWidget(btn_refresh)
+        btn_reset = QPushButton("清空")
+        btn_reset.clicked.connect(self.reset)
+        toolbar.addWidget(btn_reset)
+        btn_log = QPushButton("打开慢查询日志")
+        btn_log.clicked.connect(self.open_slow_log)
+        toolbar.addWidget(btn_log)
+        toolbar.addStretch()
+        layout.addLayout(toolbar)
+
+        self.tabs = QTabWidget()
+        self.tables = {}
+        for kind, title in TABS:
+            table = QTableWidget(0, len(COLUMNS))
+            table.setHorizontalHeaderLabels([t for _, t in COLUMNS])
+            table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            table.setSelectionBehavior(QAbstractItemView.SelectRows)
+            table.setAlternatingRowColors(True)
+            table.setWordWrap(False)
+            table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+            self.tables[kind] = table
+            self.tabs.addTab(table, title)
+        layout.addWidget(self.tabs)
+
+        self.lbl_status = QLabel("")
+        layout.addWidget(self.lbl_status)
+        self.refresh()
+
+    def set_enabled(self, checked):
+        if checked:
+            db_profile.enable(slow_ms=self.spin_slow.value())
+        else:
+            db_profile.disable()
+        self.refresh()
+
+    def set_slow_ms(self, value):
+        if db_profile.is_enabled():
+            db_profile.enable(slow_ms=value)
+
+    def reset(self):
+        db_profile.reset()
+        self.refresh()
+
+    def open_slow_log(self):
+        path = db_profile.slow_log_path()
+        if os.path.exists(path):
+            QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+        else:
+            self.lbl_status.setText(f"尚无慢查询记录: {path}")
+
+    def refresh(self):
+        for kind, table in self.tables.items():
+            rows = db_profile.stats(kind)
+            table.setUpdatesEnabled(False)
+            table.setRowCount(len(rows))
+            for r, rec in enumerate(rows):
+                for c, (key, _) in enumerate(COLUMNS):
+                    val = rec[key]
+                    if key == "callers":
+                        item = QTableWidgetItem(", ".join(val))
+                    elif key == "name":
+                        item = QTableWidgetItem(val)
+                        item.setToolTip(val)
+                    else:
+                        item = QTableWidgetItem(str(val))
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    table.setItem(r, c, item)
+            table.setUpdatesEnabled(True)
+        state = "已启用" if db_profile.is_enabled() else "未启用"
+        self.lbl_status.setText(f"统计{state}，慢查询日志: {db_profile.slow_log_path()}")
@@ -14,9 +14,11 @@ from PySide6.QtWidgets import (
     QListWidget,
     QSplitter,
     QFrame,
+    QMessageBox,
 )
 from PySide6.QtCore import QDate, Qt, QTimer
 from PySide6.QtWidgets import QHeaderView, QAbstractItemView
+from reference_data import get_reference_data
 
 
 class MainForm(QWidget):
@@ -165,12 +167,8 @@ class MainForm(QWidget):
         header.setStretchLastSection(True)
         # for i in range(7):
         #     header.setSectionResizeMode(i, QHeaderView.Stretch)
-        header.sectionResized.connect(self.on_header_resized)
-        self._resize_timer = QTimer(self)
-        self._resize_timer.setSingleShot(True)
-        self._resize_timer.setInterval(300)
-        self._pending_resize = None
         self.apply_saved_widths()
+        header.sectionResized.connect(self.on_header_resized)
         self.table.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         splitter.addWidget(self.table)
         splitter.setStretchFactor(0, 0)
@@ -219,25 +217,17 @@ class MainForm(QWidget):
         self.search_month.setCurrentText(current_search_month)
 
     def apply_saved_widths(self):
-        import database
-        widths = database.get_main_column_widths()
+        from layout_store import get_layout_store
+        widths = get_layout_store().get_widths("main")
         for col, w in widths.items():
             if 0 <= col < self.table.columnCount() and int(w) > 20:
                 self.table.setColumnWidth(col, int(w))
 
     def on_header_resized(self, logicalIndex: int, oldSize: int, newSize: int):
-        self._pending_resize = (int(logicalIndex), int(newSize))
-        self._resize_timer.timeout.connect(self._flush_resize)
-        self._resize_timer.start()
-
-    def _flush_resize(self):
-        if not self._pending_resize:
-            return
-        col, w = self._pending_resize
-        self._pending_resize = None
-        import database
-        database.set_main_column_width(col, w)
-        database.set_layout_version("main", "v1")
+        from layout_store import get_layout_store
+        store = get_layout_store()
+        store.set_width("main", logicalIndex, newSize)
+        store.set_version("main", "v1")
 
 
 class EditOrderDialog(QDialog):
@@ -265,7 +255,7 @@ class EditOrderDialog(QDialog):
         layout.addWidget(QLabel("需求单位:"), 2, 0)
         self.combo_unit = QComboBox()
         import database
-        self.combo_unit.addItems(database.fetch_units())
+        self.combo_unit.addItems(get_reference_data().get("units"))
         self.combo_unit.setCurrentText(current_info['unit'])
         layout.addWidget(self.combo_unit, 2, 1)
         
@@ -284,7 +274,7 @@ class EditOrderDialog(QDialog):
         # Month
         layout.addWidget(QLabel("计划月份:"), 4, 0)
         self.combo_month = QComboBox()
-        self.combo_month.addItems(database.fetch_plan_months())
+        self.combo_month.addItems(get_reference_data().get("plan_months"))
         self.combo_month.setCurrentText(current_info['yymm'])
         layout.addWidget(self.combo_month, 4, 1)
         
@@ -368,12 +358,16 @@ class ChangeDateDialog(QDialog):
         return self.date_edit.date().toString("yyyy-MM-dd")
 
 class SettingsDialog(QDialog):
-    def __init__(self, fetch_units_fn, add_unit_fn, rename_unit_fn):
+    def __init__(self, fetch_units_fn, add_unit_fn, rename_unit_fn, preview_rename_fn=None, builtin_names=()):
         super().__init__()
         self.setWindowTitle("设置")
         self.fetch_units_fn = fetch_units_fn
         self.add_unit_fn = add_unit_fn
         self.rename_unit_fn = rename_unit_fn
+        # Optional dry run: (old, new) -> rename_reference(..., dry_run=True) result
+        self.preview_rename_fn = preview_rename_fn
+        # Entries the program relies on by name; shown but not renamable
+        self.builtin_names = set(builtin_names)
         lay = QVBoxLayout(self)
         self.list = QListWidget()
         self.input = QLineEdit()
@@ -390,8 +384,12 @@ class SettingsDialog(QDialog):
         self.btn_add.clicked.connect(self.add_unit)
         self.btn_rename.clicked.connect(self.rename_unit)
         self.btn_close.clicked.connect(self.accept)
+        self.list.currentItemChanged.connect(self.on_current_changed)
         self.reload()
 
+    def on_current_changed(self, current, previous=None):
+        self.btn_rename.setEnabled(current is not None and current.text() not in self.builtin_names)
+
     def reload(self):
         self.list.clear()
         for name in self.fetch_units_fn():
@@ -405,9 +403,19 @@ class SettingsDialog(QDialog):
 
     def rename_unit(self):
         item = self.list.currentItem()
-        if not item:
+        if not item or item.text() in self.builtin_names:
             return
         new_name = self.input.text().strip()
+        if self.preview_rename_fn and new_name:
+            preview = self.preview_rename_fn(item.text(), new_name)
+            if not preview["success"]:
+                QMessageBox.warning(self, "重命名", preview["msg"])
+                return
+            if preview["total"] > 0:
+                lines = "\n".join(f"{k}: {v} 行" for k, v in preview["counts"].items() if v)
+                msg = f"将同步更新以下已有数据（共 {preview['total']} 行）：\n{lines}\n\n确认重命名？"
+                if QMessageBox.question(self, "重命名", msg, QMessageBox.Yes | QMessageBox.No) != QMessageBox.Yes:
+                    return
         if self.rename_unit_fn(item.text(), new_name):
             self.reload()
             self.input.clear()
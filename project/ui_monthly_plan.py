@@ -1,17 +1,18 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, 
     QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, 
-    QMessageBox, QFileDialog, QProgressBar, QAbstractItemView
+    QMessageBox, QFileDialog, QProgressBar, QAbstractItemView, QProgressDialog, QApplication
 )
 from PySide6.QtCore import Qt
-import pandas as pd
 import database
+from reference_data import get_reference_data
 
 class MonthlyPlanWidget(QWidget):
     def __init__(self):
         super().__init__()
         self.setup_ui()
         self.load_months()
+        get_reference_data().changed.connect(self.on_reference_changed)
         
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -44,6 +45,10 @@ class MonthlyPlanWidget(QWidget):
         btn_save = QPushButton("保存变更")
         btn_save.clicked.connect(self.save_all)
         toolbar.addWidget(btn_save)
+
+        btn_rollup = QPushButton("多月汇总")
+        btn_rollup.clicked.connect(self.show_rollup)
+        toolbar.addWidget(btn_rollup)
         
         toolbar.addStretch()
         layout.addLayout(toolbar)
@@ -71,6 +76,7 @@ class MonthlyPlanWidget(QWidget):
         self.table.setColumnHidden(0, True) # Hide ID
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.setAlternatingRowColors(True)
+        self.table.itemChanged.connect(self.on_item_changed)
         
         layout.addWidget(self.table)
         
@@ -78,11 +84,23 @@ class MonthlyPlanWidget(QWidget):
 
     def load_months(self):
         self.combo_month.clear()
-        months = database.fetch_plan_months()
+        months = get_reference_data().get("plan_months")
         self.combo_month.addItems(months)
         if months:
             self.combo_month.setCurrentIndex(0)
             self.load_data() # Explicitly load for first time
+
+    def on_reference_changed(self, kind):
+        if kind != "plan_months":
+            return
+        current = self.combo_month.currentText()
+        self.combo_month.blockSignals(True)
+        self.combo_month.clear()
+        self.combo_month.addItems(get_reference_data().get("plan_months"))
+        self.combo_month.setCurrentText(current)
+        self.combo_month.blockSignals(False)
+        if self.combo_month.currentText() != current:
+            self.load_data()
             
     def load_data(self):
         self._loading = True
@@ -147,6 +165,28 @@ class MonthlyPlanWidget(QWidget):
         item = QTableWidgetItem(str(text) if text is not None else "")
         self.table.setItem(row, col, item)
 
+    # Dirty rows are flagged on the hidden ID item, so the flag follows the row on insert/remove
+    def mark_dirty(self, row):
+        if self._loading or row < 0:
+            return
+        it = self.table.item(row, 0)
+        if it is not None:
+            it.setData(Qt.UserRole, True)
+
+    def is_dirty(self, row):
+        it = self.table.item(row, 0)
+        return bool(it is not None and it.data(Qt.UserRole))
+
+    def on_item_changed(self, item):
+        if item.column() != 0:
+            self.mark_dirty(item.row())
+
+    def on_dept_changed(self, combo):
+        for r in range(self.table.rowCount()):
+            if self.table.cellWidget(r, 4) is combo:
+                self.mark_dirty(r)
+                break
+
     def create_dept_combo(self, current_text=""):
         combo = QComboBox()
         combo.setEditable(True) # Allow custom input if needed, or strictly select? Usually strictly select but user might want flexibility
@@ -154,8 +194,9 @@ class MonthlyPlanWidget(QWidget):
         # But if the current value is not in the list, we should probably add it or allow it.
         # Let's make it editable for flexibility, or strictly selection. 
         # Requirement says "pick from settings-units", usually implies strict selection but editable is safer for existing data.
-        combo.addItems(database.fetch_units())
+        combo.addItems(get_reference_data().get("units"))
         combo.setCurrentText(current_text)
+        combo.currentTextChanged.connect(lambda _text, c=combo: self.on_dept_changed(c))
         return combo
 
     def save_all(self):
@@ -168,8 +209,12 @@ class MonthlyPlanWidget(QWidget):
             it = self.table.item(r, c)
             return it.text().strip() if it else ""
             
+        rows = []
         for r in range(self.table.rowCount()):
             row_id = safe_text(r, 0)
+            # Existing rows are written only when edited; new rows always
+            if row_id and not self.is_dirty(r):
+                continue
             item_name = safe_text(r, 1)
             spec = safe_text(r, 2)
             unit = safe_text(r, 3)
@@ -197,12 +242,13 @@ class MonthlyPlanWidget(QWidget):
             if not item_name and not spec:
                 continue
 
-            if not row_id: # New row
-                database.save_monthly_plan(None, month, item_name, spec, unit, plan_qty, plan_budget, dept, remarks)
-            else:
-                database.save_monthly_plan(int(row_id), month, item_name, spec, unit, plan_qty, plan_budget, dept, remarks)
-                
-        QMessageBox.information(self, "成功", "保存成功")
+            rows.append((int(row_id) if row_id else None, month, item_name, spec, unit, plan_qty, plan_budget, dept, remarks))
+
+        if not rows:
+            QMessageBox.information(self, "提示", "没有需要保存的变更")
+            return
+        res = database.upsert_monthly_plans(rows)
+        QMessageBox.information(self, "成功", f"保存成功（更新 {res['updated']} 行，新增 {res['inserted']} 行）")
         self.load_data()
 
     def add_row(self):
@@ -234,61 +280,73 @@ class MonthlyPlanWidget(QWidget):
         else:
             self.table.removeRow(r)
 
+    def show_rollup(self):
+        # pandas is only loaded when the rollup is opened
+        from ui_plan_rollup import PlanRollupDialog
+        dlg = PlanRollupDialog(self)
+        year = self.combo_month.currentText()[:2]
+        if year:
+            dlg.combo_year.setCurrentText(year)
+        dlg.load_data()
+        dlg.exec()
+
     def import_excel(self):
         path, _ = QFileDialog.getOpenFileName(self, "选择Excel文件", "", "Excel Files (*.xlsx *.xls)")
         if not path:
             return
             
+        month = self.combo_month.currentText()
+        if not month:
+            QMessageBox.warning(self, "提示", "请先选择计划月份")
+            return
+
+        progress = QProgressDialog("正在导入...", "取消", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_progress(done, total):
+            if total:
+                progress.setMaximum(total)
+                progress.setValue(min(done, total))
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+
         try:
-            df = pd.read_excel(path)
-            # Normalize column names (strip spaces)
-            df.columns = df.columns.str.strip()
-            
-            if "标的名称" not in df.columns:
-                QMessageBox.critical(self, "错误", "Excel中必须包含列：标的名称")
+            import excel_import
+            error_parts = []
+
+            def batches():
+                for df in excel_import.iter_sheet_batches(path, excel_import.MONTHLY_PLAN_COLUMNS,
+                                                          required=["标的名称"], on_progress=on_progress):
+                    rows, errors = excel_import.prepare_monthly_plans(df, month)
+                    error_parts.append(errors)
+                    yield rows
+
+            # Rows are streamed into one transaction; cancel or failure rolls it back
+            try:
+                inserted = database.import_monthly_plans_batches(batches())
+            except excel_import.ImportCancelled:
+                progress.close()
+                QMessageBox.information(self, "提示", "已取消导入，未写入任何数据")
                 return
-            
-            month = self.combo_month.currentText()
-            if not month:
-                QMessageBox.warning(self, "提示", "请先选择计划月份")
+            except ValueError as e:
+                progress.close()
+                QMessageBox.critical(self, "错误", str(e))
                 return
+            progress.close()
+            errors = excel_import.concat_errors(error_parts)
 
-            rows_to_insert = []
-            
-            for _, row in df.iterrows():
-                item_name = str(row.get("标的名称", "")).strip()
-                if not item_name or str(item_name).lower() == 'nan': continue
-                
-                spec = str(row.get("规格型号", ""))
-                if str(spec).lower() == 'nan': spec = ""
-                
-                unit = str(row.get("单位", ""))
-                if str(unit).lower() == 'nan': unit = ""
-                
-                try:
-                    qty = float(row.get("计划数量", 0))
-                except:
-                    qty = 0
-                
-                try:
-                    budget = float(row.get("计划预算", 0))
-                except:
-                    budget = 0
-                    
-                dept = str(row.get("需求部门", ""))
-                if str(dept).lower() == 'nan': dept = ""
-                
-                rem = str(row.get("备注", ""))
-                if str(rem).lower() == 'nan': rem = ""
-                
-                rows_to_insert.append((month, item_name, spec, unit, qty, budget, dept, rem))
-                
-            if rows_to_insert:
-                database.import_monthly_plans(rows_to_insert)
-                QMessageBox.information(self, "成功", f"成功导入 {len(rows_to_insert)} 条数据")
+            if inserted:
+                msg = f"成功导入 {inserted} 条数据"
+                if not errors.empty:
+                    msg += f"，{errors['行号'].nunique()} 行未导入：\n" + excel_import.format_errors(errors)
+                QMessageBox.information(self, "成功", msg)
                 self.load_data()
+            elif not errors.empty:
+                QMessageBox.warning(self, "提示", "未导入任何数据：\n" + excel_import.format_errors(errors))
             else:
                 QMessageBox.information(self, "提示", "未找到有效数据")
                 
         except Exception as e:
+            progress.close()
             QMessageBox.critical(self, "错误", f"导入失败: {str(e)}")
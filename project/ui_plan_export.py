@@ -5,8 +5,9 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 import database
-from export import OrderExporter
-from print import OrderPrinter
+import export_source
+import tracing
+from reference_data import get_reference_data
 
 class PlanExportWidget(QWidget):
     def __init__(self):
@@ -81,11 +82,7 @@ class PlanExportWidget(QWidget):
 
         # Table
         # Columns for export preview (updated per requirements)
-        self.columns = [
-            "序号", "主单编号", "需求单位", "采购标的", "规格型号",
-            "单位", "采购数量", "预算(万)",
-            "采购方式", "采购渠道", "计划发放", "询价金额", "备注"
-        ]
+        self.columns = list(export_source.PLAN_EXPORT_COLUMNS)
         
         self.table = QTableWidget()
         self.table.setColumnCount(len(self.columns))
@@ -103,14 +100,21 @@ class PlanExportWidget(QWidget):
         layout.addWidget(self.table)
         
         self.current_rows_data = [] # Store raw data for export
+        self._months_version = None
 
     def load_months(self):
+        # Only rebuild the combo when the plan months actually changed
+        ref = get_reference_data()
+        if self._months_version == ref.version("plan_months") and self.combo_month.count() > 0:
+            return
+        self._months_version = ref.version("plan_months")
         self.combo_month.clear()
-        months = database.fetch_plan_months()
+        months = ref.get("plan_months")
         self.combo_month.addItems(months)
         if months:
             self.combo_month.setCurrentIndex(0)
 
+    @tracing.traced("PlanExportWidget.load_data")
     def load_data(self):
         month = self.combo_month.currentText()
         if not month:
@@ -122,11 +126,13 @@ class PlanExportWidget(QWidget):
         # 9:od.unit, 10:od.purchase_qty, 11:od.budget_wan, 12:od.purchase_method, 13:od.purchase_channel,
         # 14:od.plan_release, 15:od.inquiry_price, 16:od.supplier, 17:od.remark, 18:od.plan_time
         
-        raw_data = database.fetch_monthly_details_for_export(month)
+        with tracing.span("PlanExportWidget.load_data.sql") as args:
+            raw_data = database.fetch_monthly_details_for_export(month)
+            args["rows"] = len(raw_data)
         self.current_rows_data = raw_data
         
         # Load units for filter
-        units = database.fetch_units()
+        units = get_reference_data().get("units")
         self.combo_unit.blockSignals(True)
         self.combo_unit.clear()
         self.combo_unit.addItem("全部")
@@ -151,14 +157,8 @@ class PlanExportWidget(QWidget):
             "purchaser": "所有"
         }
         
-        rows = []
-        for r in range(self.table.rowCount()):
-            row_data = []
-            for c in range(self.table.columnCount()):
-                it = self.table.item(r, c)
-                row_data.append(it.text() if it else "")
-            rows.append(row_data)
-            
+        # Rows come straight from the database with the active filter, not from the table cells
+        rows = export_source.iter_plan_export_rows(self.current_filter())
         return header_info, rows
 
     def export_excel(self):
@@ -175,6 +175,7 @@ class PlanExportWidget(QWidget):
         header_info, rows = self._prepare_export_data()
         
         try:
+            from export import OrderExporter
             exporter = OrderExporter(header_info, self.columns, rows, title=f"{month} 采购计划明细")
             exporter.export(file_path)
             QMessageBox.information(self, "成功", f"导出成功:\n{file_path}")
@@ -245,80 +246,34 @@ class PlanExportWidget(QWidget):
             mm = month[2:]
             title_month = f"20{yy}年{int(mm)}月份"
             
+        from print import OrderPrinter
         printer = OrderPrinter(header_info, print_columns, rows)
         # Customize title
         printer.title = f"{title_month}民品采购计划表"
         printer.show_preview()
 
+    def current_filter(self) -> dict:
+        return {
+            "month": self.combo_month.currentText(),
+            "seq": self.filter_seq.text(),
+            "item": self.filter_item.text(),
+            "order": self.filter_order.text(),
+            "unit": self.combo_unit.currentText() if self.combo_unit.count() > 0 else "全部",
+            "units": set(self._unit_multi_selected),
+        }
+
+    @tracing.traced("PlanExportWidget.apply_filters")
     def apply_filters(self):
         # Filter current_rows_data and render table
-        seq_text = self.filter_seq.text().strip() if hasattr(self, 'filter_seq') else ""
-        item_kw = self.filter_item.text().strip() if hasattr(self, 'filter_item') else ""
-        order_kw = self.filter_order.text().strip() if hasattr(self, 'filter_order') else ""
-        unit_sel = self.combo_unit.currentText() if hasattr(self, 'combo_unit') and self.combo_unit.count()>0 else "全部"
-        unit_set = self._unit_multi_selected if hasattr(self, '_unit_multi_selected') else set()
-
-        def match_seq(detail_no: str) -> bool:
-            if not seq_text:
-                return True
-            import re
-            m = re.match(r"^(\d+)\s*-\s*(\d+)$", seq_text)
-            if m:
-                try:
-                    lo = int(m.group(1)); hi = int(m.group(2))
-                    suf_m = re.search(r"-(\d+)$", detail_no or "")
-                    if not suf_m:
-                        return False
-                    n = int(suf_m.group(1))
-                    return lo <= n <= hi
-                except:
-                    return False
-            return seq_text in (detail_no or "")
-
-        def match_item(purchase_item: str) -> bool:
-            if not item_kw:
-                return True
-            return item_kw in (purchase_item or "")
-
-        def match_order(order_number: str) -> bool:
-            if not order_kw:
-                return True
-            return order_kw in (order_number or "")
-
-        def match_unit(unit_val: str) -> bool:
-            if unit_set:
-                return unit_val in unit_set
-            if unit_sel and unit_sel != "全部":
-                return unit_val == unit_sel
-            return True
-
-        rows = []
-        for row in self.current_rows_data:
-            detail_no = str(row[5] or "")
-            purchase_item = str(row[7] or "")
-            order_number = str(row[0] or "")
-            unit_val = str(row[3] or "")
-            if match_seq(detail_no) and match_item(purchase_item) and match_order(order_number) and match_unit(unit_val):
-                rows.append(row)
+        with tracing.span("PlanExportWidget.apply_filters.shape") as args:
+            rows = list(export_source.iter_plan_export_rows(self.current_filter(), self.current_rows_data))
+            args["rows"] = len(rows)
 
-        self.table.setRowCount(len(rows))
-        for r, row in enumerate(rows):
-            # Map to new columns:
-            # 0 序号(detail_no), 1 主单编号(o.number), 2 需求单位(o.unit), 3 采购标的(purchase_item), 4 规格型号(spec_model)
-            # 5 单位, 6 采购数量, 7 预算(万), 8 采购方式, 9 采购渠道, 10 计划发放, 11 询价金额, 12 备注
-            self.table.setItem(r, 0, QTableWidgetItem(str(row[5] or "")))
-            self.table.setItem(r, 1, QTableWidgetItem(str(row[0] or "")))
-            self.table.setItem(r, 2, QTableWidgetItem(str(row[3] or "")))
-            self.table.setItem(r, 3, QTableWidgetItem(str(row[7] or "")))
-            self.table.setItem(r, 4, QTableWidgetItem(str(row[8] or "")))
-            self.table.setItem(r, 5, QTableWidgetItem(str(row[9] or "")))
-            self.table.setItem(r, 6, QTableWidgetItem(str(row[10] or "")))
-            self.table.setItem(r, 7, QTableWidgetItem(str(row[11] or "")))
-            self.table.setItem(r, 8, QTableWidgetItem(str(row[12] or "")))
-            self.table.setItem(r, 9, QTableWidgetItem(str(row[13] or "")))
-            self.table.setItem(r, 10, QTableWidgetItem(str(row[14] or "")))
-            self.table.setItem(r, 11, QTableWidgetItem(str(row[15] or "")))
-            self.table.setItem(r, 12, QTableWidgetItem(str(row[17] or "")))
+        with tracing.span("PlanExportWidget.apply_filters.fill"):
+            self.table.setRowCount(len(rows))
+            for r, row in enumerate(rows):
+                for c, text in enumerate(row):
+                    self.table.setItem(r, c, QTableWidgetItem(text))
 
     def _open_unit_multi_dialog(self):
         # Simple multi-select dialog for units
@@ -328,8 +283,7 @@ class PlanExportWidget(QWidget):
         v = QVBoxLayout(dlg)
         lst = QListWidget()
         lst.setSelectionMode(QAbstractItemView.NoSelection)
-        import database
-        units = database.fetch_units()
+        units = get_reference_data().get("units")
         for u in units:
             it = QListWidgetItem(u)
             it.setFlags(it.flags() | Qt.ItemIsUserCheckable)
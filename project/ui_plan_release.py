@@ -18,11 +18,17 @@ from PySide6.QtWidgets import (
     QMessageBox,
 )
 from PySide6.QtCore import Qt, Signal, QTimer
+import tracing
+
+# More changed orders than this: reload the list instead of patching row by row
+ROW_REFRESH_LIMIT = 200
 
 class PlanReleaseForm(QWidget):
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
+        self._loaded = False
+        self._filters = {}
         layout = QVBoxLayout(self)
         
         # Tab Widget
@@ -80,6 +86,10 @@ class PlanReleaseForm(QWidget):
         self.btn_search = QPushButton("搜索")
         self.btn_search.setObjectName("primary")
         self.btn_search.clicked.connect(self.load_data)
+
+        self.btn_release_selected = QPushButton("发放所选")
+        self.btn_release_selected.setObjectName("primary")
+        self.btn_release_selected.clicked.connect(self.release_selected)
         
         # Layout filters evenly
         filter_layout.addWidget(self.search_number, 0, 0)
@@ -88,6 +98,7 @@ class PlanReleaseForm(QWidget):
         filter_layout.addWidget(self.search_month, 0, 3)
         filter_layout.addWidget(self.search_unit, 0, 4)
         filter_layout.addWidget(self.btn_search, 0, 5)
+        filter_layout.addWidget(self.btn_release_selected, 0, 6)
         
         layout.addWidget(filter_frame)
         
@@ -105,19 +116,15 @@ class PlanReleaseForm(QWidget):
         ])
         self.table.setAlternatingRowColors(True)
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.verticalHeader().setVisible(False)
         
         header = self.table.horizontalHeader()
         header.setStretchLastSection(True)
         header.setSectionResizeMode(QHeaderView.Interactive)
-        header.sectionResized.connect(self.on_header_resized)
-        self._resize_timer = QTimer(self)
-        self._resize_timer.setSingleShot(True)
-        self._resize_timer.setInterval(300)
-        self._resize_timer.timeout.connect(self._flush_resize)
-        self._pending_resize = None
         self.apply_saved_widths()
+        header.sectionResized.connect(self.on_header_resized)
         
         layout.addWidget(self.table)
         
@@ -132,27 +139,17 @@ class PlanReleaseForm(QWidget):
         )
 
     def apply_saved_widths(self):
-        import database
-        widths = database.get_plan_release_column_widths()
+        from layout_store import get_layout_store
+        widths = get_layout_store().get_widths("plan_release")
         for col, w in widths.items():
             if 0 <= col < self.table.columnCount() and int(w) > 20:
                 self.table.setColumnWidth(col, int(w))
 
     def on_header_resized(self, logicalIndex: int, oldSize: int, newSize: int):
-        self._pending_resize = (int(logicalIndex), int(newSize))
-        self._resize_timer.start()
-
-    def _flush_resize(self):
-        if not self._pending_resize:
-            return
-        col, w = self._pending_resize
-        self._pending_resize = None
-        try:
-            import database
-            database.set_plan_release_column_width(col, w)
-            database.set_layout_version("plan_release", "v1")
-        except Exception:
-            pass
+        from layout_store import get_layout_store
+        store = get_layout_store()
+        store.set_width("plan_release", logicalIndex, newSize)
+        store.set_version("plan_release", "v1")
 
     def setup_print_template_tab(self):
         from ui_print_template import PrintTemplateWidget
@@ -176,27 +173,90 @@ class PlanReleaseForm(QWidget):
 
         
     def showEvent(self, event):
-        self.load_data()
+        # Later visits are refreshed by MainWindow (on data change, or on every visit without change notifications)
+        if not self._loaded:
+            self.load_data()
         super().showEvent(event)
         
+    @tracing.traced("PlanReleaseForm.load_data")
     def load_data(self):
         import database
         self.table.setRowCount(0)
+        self._loaded = True
+        self._filters = {
+            "number_filter": self.search_number.text().strip(),
+            "purchaser_filter": self.search_purchaser.text().strip(),
+            "task_filter": self.search_task.text().strip(),
+            "month_filter": self.search_month.text().strip(),
+            "unit_filter": self.search_unit.text().strip(),
+        }
         
-        rows = database.fetch_release_orders(
-            number_filter=self.search_number.text().strip(),
-            purchaser_filter=self.search_purchaser.text().strip(),
-            task_filter=self.search_task.text().strip(),
-            month_filter=self.search_month.text().strip(),
-            unit_filter=self.search_unit.text().strip(),
-        )
-        
-        for row in rows:
-            r = self.table.rowCount()
-            self.table.insertRow(r)
-            # row: release_date, source_order_number, purchaser, task_name, unit, yymm, record_count, status
-            for i, val in enumerate(row):
-                self.table.setItem(r, i, QTableWidgetItem(str(val)))
+        with tracing.span("PlanReleaseForm.load_data.sql") as args:
+            rows = database.fetch_release_orders(**self._filters)
+            args["rows"] = len(rows)
+        
+        with tracing.span("PlanReleaseForm.load_data.fill"):
+            for row in rows:
+                r = self.table.rowCount()
+                self.table.insertRow(r)
+                # row: release_date, source_order_number, purchaser, task_name, unit, yymm, record_count, status
+                for i, val in enumerate(row):
+                    self.table.setItem(r, i, QTableWidgetItem(str(val)))
+
+    @tracing.traced("PlanReleaseForm.refresh_orders")
+    def refresh_orders(self, numbers):
+        """只重新读取 numbers 这些主单的发放行；某主单的行数变化时整表重新加载。"""
+        import database
+        if not self._loaded:
+            return
+        if len(numbers) > ROW_REFRESH_LIMIT:
+            self.load_data()
+            return
+        positions = {}
+        for r in range(self.table.rowCount()):
+            item = self.table.item(r, 1)
+            if item is not None:
+                positions.setdefault(item.text(), []).append(r)
+        fresh_by_number = database.fetch_release_orders_by_numbers(numbers, **self._filters)
+        for number in numbers:
+            fresh = fresh_by_number.get(number, [])
+            rows = positions.get(number, [])
+            if len(fresh) != len(rows):
+                self.load_data()
+                return
+            for r, row in zip(rows, fresh):
+                for i, val in enumerate(row):
+                    item = self.table.item(r, i)
+                    if item is None:
+                        self.table.setItem(r, i, QTableWidgetItem(str(val)))
+                    elif item.text() != str(val):
+                        item.setText(str(val))
+
+    def selected_pairs(self):
+        """选中行中尚未发放的 (主单编号, 采购员)，按表格顺序。"""
+        pairs = []
+        for r in sorted({idx.row() for idx in self.table.selectedIndexes()}):
+            status = self.table.item(r, 7)
+            if status is not None and status.text() == "已发放":
+                continue
+            pairs.append((self.table.item(r, 1).text(), self.table.item(r, 2).text()))
+        return pairs
+
+    def release_selected(self):
+        import database
+        if not self.table.selectionModel().hasSelection():
+            QMessageBox.warning(self, "提示", "请先选择要发放的记录")
+            return
+        pairs = self.selected_pairs()
+        if not pairs:
+            QMessageBox.information(self, "提示", "所选记录均已发放")
+            return
+        reply = QMessageBox.question(self, "确认发放", f"确定要将选中的 {len(pairs)} 条记录标记为已发放吗？", QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        updated = database.update_release_statuses(pairs, "已发放")
+        QMessageBox.information(self, "成功", f"已发放 {updated} 条记录")
+        self.load_data()
 
     def open_detail(self, index):
         row = index.row()
@@ -305,11 +365,8 @@ class ReleaseDetailWidget(QWidget):
         layout.addWidget(top_container)
 
         # Table
-        cols = [
-            "序号", "采购标的", "规格型号", "采购数量", "单位", 
-            "单价(元)", "总价(元)", "采购方式", "采购途径", 
-            "计划发放", "进度要求", "询价(报价)", "税率", "备注"
-        ]
+        from export_source import RELEASE_COLUMNS
+        cols = RELEASE_COLUMNS
         self.table = QTableWidget(0, len(cols))
         self.table.setHorizontalHeaderLabels(cols)
         self.table.setAlternatingRowColors(True)
@@ -346,17 +403,16 @@ class ReleaseDetailWidget(QWidget):
         self.btn_print.clicked.connect(self.print_order)
 
     def load_data(self):
-        import database
+        from export_source import iter_release_rows
         self.table.setRowCount(0)
-        rows = database.fetch_release_details(self.order_number, self.purchaser)
         
-        for row in rows:
+        for row in iter_release_rows(self.order_number, self.purchaser):
             # Append to end (FIFO) to match DB order (Ascending ID)
             r = self.table.rowCount()
             self.table.insertRow(r)
             # row contains all mapped columns in order from fetch_release_details
             for i, val in enumerate(row):
-                self.table.setItem(r, i, QTableWidgetItem(str(val if val is not None else "")))
+                self.table.setItem(r, i, QTableWidgetItem(val))
                 
     def confirm_release(self):
         import database
@@ -389,20 +445,10 @@ class ReleaseDetailWidget(QWidget):
             header_info["date"] = info[3]
             header_info["task_name"] = info[4]
             
-        # 2. Gather Columns
-        columns = []
-        for c in range(self.table.columnCount()):
-            item = self.table.horizontalHeaderItem(c)
-            columns.append(item.text() if item else "")
-            
-        # 3. Gather Rows
-        rows = []
-        for r in range(self.table.rowCount()):
-            row_data = []
-            for c in range(self.table.columnCount()):
-                it = self.table.item(r, c)
-                row_data.append(it.text() if it else "")
-            rows.append(row_data)
+        # 2. Columns and rows straight from the database
+        from export_source import RELEASE_COLUMNS, iter_release_rows
+        columns = list(RELEASE_COLUMNS)
+        rows = iter_release_rows(self.order_number, self.purchaser)
             
         # 4. Print
         # Load dynamic config
@@ -0,0 +1,116 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QAbstractItemView, QMessageBox, QFileDialog
+)
+from PySide6.QtCore import Qt
+import plan_rollup
+from reference_data import get_reference_data
+
+
+class PlanRollupDialog(QDialog):
+    """月度计划季度/年度汇总：一次查询取回所选区间全部月份，切换汇总维度只在内存中重算。"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("计划执行汇总")
+        self.resize(1000, 600)
+        self._detail = None
+        self._summary = None
+        self._columns = []
+
+        layout = QVBoxLayout(self)
+        toolbar = QHBoxLayout()
+
+        toolbar.addWidget(QLabel("年份:"))
+        self.combo_year = QComboBox()
+        self.combo_year.setFixedWidth(80)
+        years = sorted({m[:2] for m in get_reference_data().get("plan_months") if len(m) == 4}, reverse=True)
+        self.combo_year.addItems(years)
+        toolbar.addWidget(self.combo_year)
+
+        toolbar.addWidget(QLabel("区间:"))
+        self.combo_period = QComboBox()
+        self.combo_period.addItems(list(plan_rollup.PERIODS))
+        toolbar.addWidget(self.combo_period)
+
+        toolbar.addWidget(QLabel("汇总维度:"))
+        self.combo_grouping = QComboBox()
+        self.combo_grouping.addItems(list(plan_rollup.GROUPINGS))
+        self.combo_grouping.currentTextChanged.connect(self.show_summary)
+        toolbar.addWidget(self.combo_grouping)
+
+        btn_query = QPushButton("查询")
+        btn_query.clicked.connect(self.load_data)
+        toolbar.addWidget(btn_query)
+
+        btn_export = QPushButton("导出Excel")
+        btn_export.clicked.connect(self.export_excel)
+        toolbar.addWidget(btn_export)
+
+        toolbar.addStretch()
+        self.lbl_total = QLabel("")
+        toolbar.addWidget(self.lbl_total)
+        layout.addLayout(toolbar)
+
+        self.table = QTableWidget()
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setAlternatingRowColors(True)
+        layout.addWidget(self.table)
+
+    def selected_months(self):
+        year = self.combo_year.currentText()
+        if not year:
+            return []
+        return plan_rollup.period_months(year, self.combo_period.currentText())
+
+    def load_data(self):
+        months = self.selected_months()
+        if not months:
+            QMessageBox.warning(self, "提示", "没有可汇总的计划月份")
+            return
+        self._detail = plan_rollup.load_rollup(months)
+        self.show_summary()
+
+    def show_summary(self):
+        if self._detail is None:
+            return
+        summary = plan_rollup.summarize(self._detail, self.combo_grouping.currentText())
+        self._summary = summary
+        self._columns = list(summary.columns)
+
+        self.table.setUpdatesEnabled(False)
+        self.table.clear()
+        self.table.setColumnCount(len(self._columns))
+        self.table.setHorizontalHeaderLabels([plan_rollup.COLUMN_TITLES[c] for c in self._columns])
+        self.table.setRowCount(len(summary))
+        numeric = set(plan_rollup.VALUE_FIELDS) | {"progress"}
+        for r, rec in enumerate(summary.itertuples(index=False)):
+            for c, (col, val) in enumerate(zip(self._columns, rec)):
+                if col in numeric:
+                    item = QTableWidgetItem(f"{val:,.2f}")
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                else:
+                    item = QTableWidgetItem(str(val))
+                self.table.setItem(r, c, item)
+        self.table.setUpdatesEnabled(True)
+
+        months = sorted(self._detail["plan_month"].unique())
+        total = plan_rollup.totals(self._detail)
+        self.lbl_total.setText(
+            f"月份 {len(months)} 个，汇总 {len(summary)} 行，"
+            f"计划预算 {total['plan_budget']:,.2f} 万，执行金额 {total['exec_amt']:,.2f}"
+        )
+
+    def export_excel(self):
+        if self._summary is None or self._summary.empty:
+            return
+        default_name = f"计划执行汇总_{self.combo_year.currentText()}_{self.combo_period.currentText()}.xlsx"
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出Excel", default_name, "Excel Files (*.xlsx)")
+        if not file_path:
+            return
+        try:
+            self._summary.rename(columns=plan_rollup.COLUMN_TITLES).to_excel(file_path, index=False)
+            QMessageBox.information(self, "成功", f"导出成功:\n{file_path}")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
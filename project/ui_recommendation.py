@@ -1,11 +1,11 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
-    QPushButton, QHeaderView, QLabel, QMessageBox, QFileDialog, QAbstractItemView, QFrame, QComboBox, QProgressDialog
+    QPushButton, QHeaderView, QLabel, QMessageBox, QFileDialog, QAbstractItemView, QFrame, QComboBox, QProgressDialog, QApplication
 )
 from PySide6.QtCore import Qt, QThread, Signal
 import database
-import pandas as pd
 import os
+from reference_data import get_reference_data
 
 class RecommendationWidget(QWidget):
     def __init__(self):
@@ -82,7 +82,7 @@ class RecommendationWidget(QWidget):
 
     def load_data(self):
         rows = database.fetch_recommendations()
-        purchasers = database.fetch_purchasers()
+        purchasers = get_reference_data().get("purchasers")
         self.table.setRowCount(0)
         for i, row in enumerate(rows):
             # row: id, item_name, plan_release, weight, is_active
@@ -139,7 +139,7 @@ class RecommendationWidget(QWidget):
         self.table.item(r, 0).setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
         
         # 计划发放 - Dropdown
-        purchasers = database.fetch_purchasers()
+        purchasers = get_reference_data().get("purchasers")
         combo_release = QComboBox()
         combo_release.addItems(purchasers)
         self.table.setCellWidget(r, 2, combo_release)
@@ -239,42 +239,28 @@ class RecommendationWidget(QWidget):
         class Worker(QThread):
             progress = Signal(int, int)
             finished_stats = Signal(dict)
-            failed_items = Signal(list)
             def run(self_inner):
-                items = database.get_released_items_for_recommendation()
-                total = len(items)
-                batch = 200
-                inserted = 0
-                skipped = 0
-                failed = 0
-                failures = []
-                for i in range(0, total, batch):
-                    if self_inner.isInterruptionRequested():
-                        break
-                    part = items[i:i+batch]
-                    r = database.insert_recommendations_batch(part)
-                    inserted += r.get("inserted", 0)
-                    skipped += r.get("skipped", 0)
-                    failed += r.get("failed", 0)
-                    if r.get("failures"):
-                        failures.extend(r.get("failures"))
-                    self_inner.progress.emit(min(i+batch, total), total)
-                from datetime import datetime
-                start_time = ""
-                end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                if self_inner.isInterruptionRequested():
+                    return
+                # One set-based statement; progress is all-or-nothing
+                self_inner.progress.emit(0, 1)
+                stats = database.sync_recommendations_from_releases()
+                stats["reweighted"] = 0
+                if not stats["failed"]:
+                    try:
+                        reweighted = database.recompute_recommendation_weights(since=stats["since"])
+                        stats["reweighted"] = reweighted["updated"]
+                    except Exception as e:
+                        stats["failures"].append(f"权重更新失败: {e}")
+                self_inner.progress.emit(1, 1)
                 try:
-                    details = "\n".join(failures)
-                    database.save_sync_log(start_time, end_time, total, inserted, skipped, failed, details)
+                    details = "\n".join(stats["failures"])
+                    database.save_sync_log(stats["start_time"], stats["end_time"], stats["total"],
+                                           stats["inserted"], stats["skipped"], stats["failed"], details,
+                                           release_watermark=stats["watermark"])
                 except Exception:
                     pass
-                self_inner.finished_stats.emit({
-                    "total": total,
-                    "inserted": inserted,
-                    "skipped": skipped,
-                    "failed": failed,
-                    "failures": failures
-                })
-                self_inner.failed_items.emit(items if failures else [])
+                self_inner.finished_stats.emit(stats)
         self._sync_worker = Worker()
         def on_progress(done, total):
             if total == 0:
@@ -284,7 +270,7 @@ class RecommendationWidget(QWidget):
                 self._sync_progress.setValue(val)
         def on_finished(stats):
             self._sync_progress.reset()
-            msg = f"总计: {stats['total']}\n新增: {stats['inserted']}\n跳过: {stats['skipped']}\n失败: {stats['failed']}"
+            msg = f"总计: {stats['total']}\n新增: {stats['inserted']}\n跳过: {stats['skipped']}\n失败: {stats['failed']}\n权重更新: {stats.get('reweighted', 0)}"
             box = QMessageBox(self)
             box.setWindowTitle("同步完成")
             box.setText(msg)
@@ -311,83 +297,98 @@ class RecommendationWidget(QWidget):
         if not file_path:
             return
             
+        progress = QProgressDialog("正在导入...", "取消", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+
+        def on_progress(done, total):
+            if total:
+                progress.setMaximum(total)
+                progress.setValue(min(done, total))
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+
+        start_row = self.table.rowCount()
         try:
-            df = pd.read_excel(file_path)
+            import excel_import
             # Expect columns: "采购标的", "计划发放", "权重"
             # Optional: "采购方式", "采购途径"
-            # Map standard names
-            column_map = {
-                "采购标的": "item_name",
-                "计划发放": "plan_release",
-                "权重": "weight",
-                "采购方式": "purchase_method",
-                "采购途径": "purchase_channel"
-            }
-            
-            # Simple validation
-            found_cols = [c for c in column_map.keys() if c in df.columns]
-            if not found_cols:
-                QMessageBox.warning(self, "提示", f"Excel需包含以下列名之一: {', '.join(column_map.keys())}")
+            purchasers = get_reference_data().get("purchasers")
+            error_parts = []
+            try:
+                for df in excel_import.iter_sheet_batches(file_path, excel_import.RECOMMENDATION_COLUMNS, on_progress=on_progress):
+                    records, errors = excel_import.prepare_recommendations(df)
+                    error_parts.append(errors)
+                    self._append_records(records, purchasers)
+            except excel_import.ImportCancelled:
+                # Drop what this import appended so the table is as before
+                self.table.setRowCount(start_row)
+                progress.close()
+                QMessageBox.information(self, "提示", "已取消导入")
+                return
+            except ValueError as e:
+                progress.close()
+                QMessageBox.warning(self, "提示", str(e))
                 return
+            progress.close()
+            errors = excel_import.concat_errors(error_parts)
 
-            # Append to table
-            start_row = self.table.rowCount()
-            purchasers = database.fetch_purchasers()
-            
-            for i, (_, row) in enumerate(df.iterrows()):
-                r = start_row + i
-                self.table.insertRow(r)
-                
-                # 序号
-                self.table.setItem(r, 0, QTableWidgetItem(str(r + 1)))
-                self.table.item(r, 0).setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-                
-                item_name = str(row.get("采购标的", ""))
-                if item_name == "nan": item_name = ""
-                
-                plan_release = str(row.get("计划发放", ""))
-                if plan_release == "nan": plan_release = ""
-                
-                weight = str(row.get("权重", ""))
-                if weight == "nan": weight = "0"
-                
-                p_method = str(row.get("采购方式", ""))
-                if p_method == "nan": p_method = ""
-                
-                p_channel = str(row.get("采购途径", ""))
-                if p_channel == "nan": p_channel = ""
-                
-                self.table.setItem(r, 1, QTableWidgetItem(item_name))
-                
-                # 计划发放 - Dropdown
-                combo_release = QComboBox()
-                combo_release.addItems(purchasers)
-                combo_release.setCurrentText(plan_release)
-                if plan_release and plan_release not in purchasers:
-                    combo_release.addItem(plan_release)
-                    combo_release.setCurrentText(plan_release)
-                self.table.setCellWidget(r, 2, combo_release)
-                
-                # 采购方式 - Dropdown
-                combo_method = QComboBox()
-                combo_method.addItems(["", "询比采购", "公开招标", "集中采购", "框架协议"])
-                combo_method.setEditable(True)
-                combo_method.setCurrentText(p_method)
-                combo_method.currentTextChanged.connect(lambda text, r=r: self.on_method_changed(r, text))
-                self.table.setCellWidget(r, 3, combo_method)
-                
-                # 采购途径
-                self.table.setItem(r, 4, QTableWidgetItem(p_channel))
-                
-                self.table.setItem(r, 5, QTableWidgetItem(weight))
-                
-                # is_active default "是"
-                combo = QComboBox()
-                combo.addItems(["是", "否"])
-                combo.setCurrentText("是")
-                self.table.setCellWidget(r, 6, combo)
-                
-            QMessageBox.information(self, "成功", "导入完成，请检查并保存")
+            msg = "导入完成，请检查并保存"
+            if not errors.empty:
+                msg += f"\n{errors['行号'].nunique()} 行未导入：\n" + excel_import.format_errors(errors)
+            QMessageBox.information(self, "成功", msg)
             
         except Exception as e:
+            self.table.setUpdatesEnabled(True)
+            progress.close()
             QMessageBox.critical(self, "错误", f"导入失败: {str(e)}")
+
+    def _append_records(self, records, purchasers):
+        start_row = self.table.rowCount()
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(start_row + len(records))
+        
+        for i, rec in enumerate(records):
+            r = start_row + i
+            
+            # 序号
+            self.table.setItem(r, 0, QTableWidgetItem(str(r + 1)))
+            self.table.item(r, 0).setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
+            
+            item_name = rec["item_name"]
+            plan_release = rec["plan_release"]
+            weight = rec["weight"]
+            p_method = rec["purchase_method"]
+            p_channel = rec["purchase_channel"]
+            
+            self.table.setItem(r, 1, QTableWidgetItem(item_name))
+            
+            # 计划发放 - Dropdown
+            combo_release = QComboBox()
+            combo_release.addItems(purchasers)
+            combo_release.setCurrentText(plan_release)
+            if plan_release and plan_release not in purchasers:
+                combo_release.addItem(plan_release)
+                combo_release.setCurrentText(plan_release)
+            self.table.setCellWidget(r, 2, combo_release)
+            
+            # 采购方式 - Dropdown
+            combo_method = QComboBox()
+            combo_method.addItems(["", "询比采购", "公开招标", "集中采购", "框架协议"])
+            combo_method.setEditable(True)
+            combo_method.setCurrentText(p_method)
+            combo_method.currentTextChanged.connect(lambda text, r=r: self.on_method_changed(r, text))
+            self.table.setCellWidget(r, 3, combo_method)
+            
+            # 采购途径
+            self.table.setItem(r, 4, QTableWidgetItem(p_channel))
+            
+            self.table.setItem(r, 5, QTableWidgetItem(weight))
+            
+            # is_active default "是"
+            combo = QComboBox()
+            combo.addItems(["是", "否"])
+            combo.setCurrentText("是")
+            self.table.setCellWidget(r, 6, combo)
+            
+        self.table.setUpdatesEnabled(True)